@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark Suite
+Times the data path behind every screen against generated databases
+
+Each scenario runs the same queries and aggregation the screen's loader
+runs, without the GUI, with the query cache emptied before every run. For
+each scale it reports median and p95 latency, queries per run and peak
+Python memory. Results can be saved as a JSON baseline and compared with
+a previous run; scenarios slower than the threshold are flagged and make
+the exit status non-zero.
+    
+    python benchmark.py --scales 1 10 --output baseline.json
+    python benchmark.py --scales 1 10 --compare baseline.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import logging
+import platform
+import argparse
+import statistics
+import tracemalloc
+from datetime import datetime, date
+import sqlalchemy
+from database.db_manager import get_db_manager
+from database import queries, dashboard, diagnostics
+from database.cache import query_cache
+from database.synthetic import DEFAULT_SEED, generate
+from auth import AuthService
+
+logger = logging.getLogger(__name__)
+
+# Generated databases are kept here and reused between runs
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_data')
+
+DEFAULT_SCALES = [1]
+DEFAULT_DAYS = 365
+DEFAULT_REPEAT = 15
+
+# A run this much slower than the baseline median is a regression...
+DEFAULT_THRESHOLD = 0.2
+# ...unless it is within this many milliseconds (timer noise)
+MIN_DELTA_MS = 1.0
+
+BENCH_USER = 'bench'
+BENCH_PASSWORD = 'bench-password'
+
+
+def _today():
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _in_session(query):
+    """Scenario running a query in a session scope, as the section loaders do"""
+    def run(db_manager):
+        with db_manager.session_scope() as session:
+            return query(session)
+    return run
+
+
+def _login(db_manager):
+    return AuthService.authenticate(BENCH_USER, BENCH_PASSWORD)
+
+
+def _backup(db_manager):
+    path = db_manager.db_path + '.bench-backup'
+    try:
+        db_manager.backup(path)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# name: (scenario, most runs); the snapshot also feeds the cafe daily
+# report, the salon report and the inventory report
+SCENARIOS = {
+    'cafe.active_orders': (_in_session(queries.active_orders_page), None),
+    'cafe.menu': (_in_session(queries.cafe_menu_page), None),
+    'salon.appointments': (_in_session(lambda session: queries.appointments_page(session, _today())), None),
+    'inventory.products': (_in_session(queries.products_page), None),
+    'inventory.low_stock': (_in_session(queries.low_stock_page), None),
+    'reports.overview': (_in_session(dashboard.read_snapshot), None),
+    'reports.sales': (_in_session(lambda session: queries.sales_summary(session, _today().replace(day=1))), None),
+    'reports.financial': (_in_session(queries.period_totals), None),
+    'login': (_login, 5),
+    'backup': (_backup, 3),
+}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def scale_key(scale):
+    """Key of a scale in the results, e.g. '10x'"""
+    return f"{scale:g}x"
+
+
+def prepare_database(scale, seed=DEFAULT_SEED, days=DEFAULT_DAYS, data_dir=DATA_DIR):
+    """
+    Get a generated database for a scale, generating it on first use
+    
+    Databases are named after their parameters and today's date (the
+    screens look at today's data), so they are reused for a day.
+    
+    Returns:
+        str: Database file path
+    """
+    end = date.today()
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench_{scale:g}x_s{seed}_d{days}_{end:%Y%m%d}.sqlite")
+    if os.path.exists(path):
+        return path
+    
+    temp_path = path + '.part'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    
+    logger.warning(f"Generating {scale_key(scale)} benchmark database...")
+    db_manager = get_db_manager()
+    db_manager.initialize(f'sqlite:///{temp_path}')
+    try:
+        generate(db_manager.engine, scale, seed, days, end)
+        AuthService.create_user(BENCH_USER, BENCH_PASSWORD, "Benchmark")
+    finally:
+        db_manager.dispose()
+    os.replace(temp_path, path)
+    return path
+
+
+def measure(name, scenario, db_manager, repeat):
+    """
+    Time one scenario
+    
+    Returns:
+        dict: median_ms, p95_ms, min_ms, runs, queries and peak_kb
+    """
+    # One untimed run warms the page cache and SQLAlchemy's statement cache
+    scenario(db_manager)
+    
+    timings = []
+    query_counts = []
+    for _ in range(repeat):
+        query_cache.invalidate()
+        dashboard.invalidate()
+        started = time.perf_counter()
+        with diagnostics.action(f"bench.{name}") as run:
+            scenario(db_manager)
+        timings.append((time.perf_counter() - started) * 1000)
+        query_counts.append(run.queries)
+    
+    # Memory is traced in a separate run; tracing slows everything down
+    query_cache.invalidate()
+    tracemalloc.start()
+    try:
+        scenario(db_manager)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'min_ms': round(min(timings), 3),
+        'runs': repeat,
+        'queries': max(query_counts),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED, days=DEFAULT_DAYS,
+                   data_dir=DATA_DIR, only=None, report=None):
+    """
+    Run every scenario at every scale
+    
+    Args:
+        scales (list): Scale factors
+        repeat (int): Timed runs per scenario (some scenarios cap this)
+        seed (int): Data generator seed
+        days (int): Days of generated history
+        data_dir (str): Where generated databases are kept
+        only (list): Scenario names to run (default: all)
+        report (callable): report(scale_key, name, result) after each scenario
+    
+    Returns:
+        dict: JSON-serializable results with run metadata
+    """
+    results = {}
+    db_manager = get_db_manager()
+    
+    # Slow-query logging would only add noise here
+    slow_ms, diagnostics.query_stats.slow_ms = diagnostics.query_stats.slow_ms, float('inf')
+    try:
+        for scale in scales:
+            path = prepare_database(scale, seed, days, data_dir)
+            db_manager.initialize(f'sqlite:///{path}')
+            try:
+                scale_results = results[scale_key(scale)] = {}
+                for name, (scenario, max_runs) in SCENARIOS.items():
+                    if only and name not in only:
+                        continue
+                    runs = min(repeat, max_runs) if max_runs else repeat
+                    scale_results[name] = measure(name, scenario, db_manager, runs)
+                    if report:
+                        report(scale_key(scale), name, scale_results[name])
+            finally:
+                db_manager.dispose()
+    finally:
+        diagnostics.query_stats.slow_ms = slow_ms
+    
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'platform': platform.platform(),
+            'seed': seed,
+            'days': days,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """
+    Find scenarios that got slower or run more queries than in a baseline
+    
+    Args:
+        baseline (dict): Earlier run_benchmarks() output
+        current (dict): New run_benchmarks() output
+        threshold (float): Allowed slowdown of the median, as a fraction
+        min_delta_ms (float): Slowdowns smaller than this are ignored
+    
+    Returns:
+        list: Regression messages
+    """
+    regressions = []
+    for scale, scenarios in current['results'].items():
+        for name, result in scenarios.items():
+            old = baseline.get('results', {}).get(scale, {}).get(name)
+            if old is None:
+                continue
+            slower = result['median_ms'] - old['median_ms']
+            if slower > min_delta_ms and result['median_ms'] > old['median_ms'] * (1 + threshold):
+                regressions.append(
+                    f"{scale} {name}: median {old['median_ms']:.1f} → {result['median_ms']:.1f} ms "
+                    f"(+{slower / old['median_ms'] * 100:.0f}%)"
+                )
+            if result['queries'] > old['queries']:
+                regressions.append(f"{scale} {name}: {old['queries']} → {result['queries']} queries")
+    return regressions
+
+
+def _print_result(scale, name, result):
+    print(
+        f"{scale:>6} {name:<22} median {result['median_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+        f"{result['queries']:3d} queries  peak {result['peak_kb']:9.1f} KB"
+    )
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the data path of every screen")
+    parser.add_argument('--scales', type=float, nargs='+', default=DEFAULT_SCALES,
+                        help="Scale factors of the generated databases (branch-years)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Timed runs per scenario")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Data generator seed")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="Days of generated history")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Where generated databases are kept")
+    parser.add_argument('--only', nargs='+', choices=list(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument('--output', help="Save results as a JSON baseline")
+    parser.add_argument('--compare', help="Flag regressions against a saved baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed median slowdown as a fraction (default 0.2)")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    
+    results = run_benchmarks(
+        args.scales, args.repeat, args.seed, args.days, args.data_dir, args.only, report=_print_result
+    )
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✓ Results saved to {args.output}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"✗ {len(regressions)} regression(s) against {args.compare}:")
+            for message in regressions:
+                print(f"  - {message}")
+            return 1
+        print(f"✓ No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
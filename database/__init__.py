@@ -7,10 +7,12 @@ SQLAlchemy models and database utilities
 
 from .models import Base, User, Customer, Employee, Product, Service, Invoice, InvoiceItem
 from .models import Appointment, Order, OrderItem, GamingSession, Supplier, Expense, Campaign, SmsMessage
+from .models import DailyRollup
 from .db_manager import DatabaseManager, get_session
 
 __all__ = [
     'Base', 'User', 'Customer', 'Employee', 'Product', 'Service', 'Invoice', 'InvoiceItem',
     'Appointment', 'Order', 'OrderItem', 'GamingSession', 'Supplier', 'Expense', 'Campaign', 'SmsMessage',
+    'DailyRollup',
     'DatabaseManager', 'get_session'
 ]
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backup Archives
+Compressed, checksummed backups taken on a schedule and rotated
+
+An archive is a gzip-compressed tar file holding manifest.json, a
+consistent copy of the database taken with the backup API and copies of
+its history files under history/. The manifest records the schema
+version, the row count of every table and the SHA-256 of every file;
+extracting an archive checks the hashes before the copies are used.
+Old archives are pruned grandfather-father-son style: the newest archive
+of each of the last hours, days, weeks and months is kept.
+
+Take or check an archive from the command line:
+    python -m database.archive create [--db-url sqlite:///path/to/kagan_db.sqlite]
+    python -m database.archive verify path/to/archive.tar.gz
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import zlib
+import sqlite3
+import hashlib
+import logging
+import tarfile
+import argparse
+from datetime import datetime, timedelta
+from . import history
+from .backup import BackupError, backup_database, integrity_check
+from .profiles import load_settings, save_settings
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = 'kagan_'
+ARCHIVE_SUFFIX = '.tar.gz'
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+
+MANIFEST_NAME = 'manifest.json'
+DATABASE_NAME = 'kagan_db.sqlite'
+ARCHIVE_FORMAT = 1
+
+# gzip level: 6 compresses SQLite pages nearly as well as 9 at a fraction of the time
+COMPRESS_LEVEL = 6
+
+# Newest archive kept per hour/day/week/month, for this many of each
+RETENTION = {
+    'hourly': 24,
+    'daily': 7,
+    'weekly': 4,
+    'monthly': 12,
+}
+
+# Schedule names and their labels in the settings tab
+SCHEDULES = ['off', 'hourly', 'daily', 'day-close']
+SCHEDULE_LABELS = {
+    'off': 'خاموش',
+    'hourly': 'هر ساعت',
+    'daily': 'روزانه',
+    'day-close': 'پایان روز',
+}
+DEFAULT_SCHEDULE = 'off'
+
+# Hour the business day closes, for the 'day-close' schedule
+DAY_CLOSE_HOUR = 23
+
+_CHUNK = 1024 * 1024
+
+
+def get_backup_schedule():
+    """
+    Get the saved backup schedule
+    
+    Returns:
+        str: Schedule name
+    """
+    name = load_settings().get('backup_schedule', DEFAULT_SCHEDULE)
+    return name if name in SCHEDULES else DEFAULT_SCHEDULE
+
+
+def set_backup_schedule(name):
+    """
+    Persist the backup schedule choice
+    
+    Args:
+        name (str): Schedule name
+    
+    Raises:
+        ValueError: If the schedule name is unknown
+    """
+    if name not in SCHEDULES:
+        raise ValueError(f"Unknown backup schedule: {name}")
+    
+    settings = load_settings()
+    settings['backup_schedule'] = name
+    save_settings(settings)
+
+
+def default_archive_dir(db_path):
+    """Archive directory used for a database file: backups/ next to it"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'backups')
+
+
+def file_sha256(path):
+    """SHA-256 of a file as a hex string"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def describe_database(path):
+    """
+    Read the manifest details of a database file
+    
+    Args:
+        path (str): Database file
+    
+    Returns:
+        dict: schema_version and row_counts per table
+    """
+    conn = sqlite3.connect(path)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        row_counts = {
+            table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables
+        }
+        schema_version = 0
+        if 'schema_version' in tables:
+            row = conn.execute("SELECT version FROM schema_version").fetchone()
+            schema_version = row[0] if row else 0
+    finally:
+        conn.close()
+    return {'schema_version': schema_version, 'row_counts': row_counts}
+
+
+def archive_name(taken_at):
+    """File name of an archive taken at a given time"""
+    return f"{ARCHIVE_PREFIX}{taken_at.strftime(TIMESTAMP_FORMAT)}{ARCHIVE_SUFFIX}"
+
+
+def list_archives(archive_dir):
+    """
+    Find the archives in a directory
+    
+    Args:
+        archive_dir (str): Archive directory
+    
+    Returns:
+        list: (taken_at, path) tuples, newest first
+    """
+    if not os.path.isdir(archive_dir):
+        return []
+    
+    archives = []
+    for name in os.listdir(archive_dir):
+        if not (name.startswith(ARCHIVE_PREFIX) and name.endswith(ARCHIVE_SUFFIX)):
+            continue
+        stamp = name[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)]
+        try:
+            taken_at = datetime.strptime(stamp, TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        archives.append((taken_at, os.path.join(archive_dir, name)))
+    archives.sort(reverse=True)
+    return archives
+
+
+def create_archive(source_path, archive_dir, taken_at=None, progress=None):
+    """
+    Back up a live database into a new compressed archive
+    
+    Blocks until done; run it on a worker thread.
+    
+    Args:
+        source_path (str): Live database file
+        archive_dir (str): Directory to write the archive to
+        taken_at (datetime): Time recorded in the name and manifest (default: now)
+        progress (callable): progress(copied_pages, total_pages) while copying
+    
+    Returns:
+        str: Path of the archive
+    """
+    taken_at = (taken_at or datetime.now()).replace(microsecond=0)
+    os.makedirs(archive_dir, exist_ok=True)
+    archive_path = os.path.join(archive_dir, archive_name(taken_at))
+    snapshot_path = archive_path + '.db'
+    history_dir = history.backup_history_dir(snapshot_path)
+    temp_path = archive_path + '.part'
+    
+    try:
+        # The database first: a row moved between the two copies would be in both, never in neither
+        with history.job_lock:
+            backup_database(source_path, snapshot_path, progress)
+            history_paths = history.backup_history(source_path, history_dir)
+        
+        manifest = {
+            'format': ARCHIVE_FORMAT,
+            'created_at': taken_at.isoformat(),
+            'database': DATABASE_NAME,
+            'size': os.path.getsize(snapshot_path),
+            'sha256': file_sha256(snapshot_path),
+            **describe_database(snapshot_path),
+            'history': {os.path.basename(path): file_sha256(path) for path in history_paths},
+        }
+        manifest_data = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+        
+        with tarfile.open(temp_path, 'w:gz', compresslevel=COMPRESS_LEVEL) as tar:
+            # Manifest first, so reading it does not decompress the database
+            info = tarfile.TarInfo(MANIFEST_NAME)
+            info.size = len(manifest_data)
+            info.mtime = int(taken_at.timestamp())
+            tar.addfile(info, io.BytesIO(manifest_data))
+            tar.add(snapshot_path, arcname=DATABASE_NAME)
+            for path in history_paths:
+                tar.add(path, arcname=f"{history.HISTORY_DIR_NAME}/{os.path.basename(path)}")
+        
+        os.replace(temp_path, archive_path)
+    finally:
+        for path in (snapshot_path, temp_path):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(history_dir, ignore_errors=True)
+    
+    logger.info(f"Backup archive written to {archive_path} ({os.path.getsize(archive_path)} bytes)")
+    return archive_path
+
+
+def read_manifest(archive_path):
+    """
+    Read the manifest of an archive
+    
+    Args:
+        archive_path (str): Archive file
+    
+    Returns:
+        dict: Manifest
+    
+    Raises:
+        BackupError: If the file is not a backup archive
+    """
+    try:
+        with tarfile.open(archive_path, 'r:gz') as tar:
+            member = tar.next()
+            if member is None or member.name != MANIFEST_NAME:
+                raise BackupError(f"Not a backup archive: {archive_path}")
+            return json.load(tar.extractfile(member))
+    except (tarfile.TarError, OSError, ValueError, zlib.error) as e:
+        raise BackupError(f"Unreadable backup archive {archive_path}: {e}")
+
+
+def _extract_file(tar, archive_path, member_name, sha256, dest_path):
+    """Extract one database file of an archive, moving it to dest_path once its hash and integrity check pass"""
+    temp_path = dest_path + '.part'
+    digest = hashlib.sha256()
+    try:
+        source = tar.extractfile(tar.getmember(member_name))
+        with open(temp_path, 'wb') as dest:
+            for chunk in iter(lambda: source.read(_CHUNK), b''):
+                digest.update(chunk)
+                dest.write(chunk)
+        
+        if digest.hexdigest() != sha256:
+            raise BackupError(f"Checksum mismatch in backup archive {archive_path}")
+        
+        result = integrity_check(temp_path)
+        if result != 'ok':
+            raise BackupError(f"Backup archive failed integrity check: {result}")
+        
+        os.replace(temp_path, dest_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def extract_archive(archive_path, dest_path, history_dir=None):
+    """
+    Extract the database of an archive, verifying it on the way
+    
+    The file is only moved to dest_path once its SHA-256 matches the
+    manifest and it passes the integrity check. The history files are
+    checked the same way and written to history_dir, which ends up
+    missing if the archive has none.
+    
+    Args:
+        archive_path (str): Archive file
+        dest_path (str): Database file to write
+        history_dir (str): Directory to write the history files to (default: not extracted)
+    
+    Returns:
+        dict: Manifest of the archive
+    
+    Raises:
+        BackupError: If the archive is damaged or does not match its manifest
+    """
+    manifest = read_manifest(archive_path)
+    history_files = manifest.get('history', {})
+    
+    extracted = False
+    try:
+        with tarfile.open(archive_path, 'r:gz') as tar:
+            _extract_file(tar, archive_path, manifest['database'], manifest['sha256'], dest_path)
+            if history_dir is not None:
+                shutil.rmtree(history_dir, ignore_errors=True)
+                if history_files:
+                    os.makedirs(history_dir)
+                for name, sha256 in history_files.items():
+                    # Names come from the manifest; never write outside history_dir
+                    name = os.path.basename(name)
+                    _extract_file(tar, archive_path, f"{history.HISTORY_DIR_NAME}/{name}", sha256,
+                                  os.path.join(history_dir, name))
+        extracted = True
+    except (tarfile.TarError, KeyError, OSError, EOFError, zlib.error) as e:
+        raise BackupError(f"Unreadable backup archive {archive_path}: {e}")
+    finally:
+        if not extracted and history_dir is not None:
+            shutil.rmtree(history_dir, ignore_errors=True)
+    
+    return manifest
+
+
+def verify_archive(archive_path):
+    """
+    Check an archive, history files included, without keeping the extracted copies
+    
+    Args:
+        archive_path (str): Archive file
+    
+    Returns:
+        dict: Manifest of the archive
+    
+    Raises:
+        BackupError: If the archive is damaged or does not match its manifest
+    """
+    check_path = archive_path + '.verify'
+    check_history = history.backup_history_dir(check_path)
+    try:
+        return extract_archive(archive_path, check_path, check_history)
+    finally:
+        if os.path.exists(check_path):
+            os.remove(check_path)
+        shutil.rmtree(check_history, ignore_errors=True)
+
+
+# Bucket of each retention tier an archive time falls in
+_TIERS = {
+    'hourly': lambda t: (t.date(), t.hour),
+    'daily': lambda t: t.date(),
+    'weekly': lambda t: t.isocalendar()[:2],
+    'monthly': lambda t: (t.year, t.month),
+}
+
+
+def select_kept(times, policy=RETENTION):
+    """
+    Pick the archive times to keep under a grandfather-father-son policy
+    
+    For each tier, the newest archive in each of the most recent buckets
+    (hours, days, weeks, months) is kept.
+    
+    Args:
+        times (iterable): Archive times
+        policy (dict): Buckets kept per tier
+    
+    Returns:
+        set: Times to keep
+    """
+    newest_first = sorted(times, reverse=True)
+    kept = set()
+    for tier, count in policy.items():
+        buckets = set()
+        for taken_at in newest_first:
+            bucket = _TIERS[tier](taken_at)
+            if bucket in buckets:
+                continue
+            if len(buckets) >= count:
+                break
+            buckets.add(bucket)
+            kept.add(taken_at)
+    return kept
+
+
+def rotate(archive_dir, policy=RETENTION):
+    """
+    Delete archives the retention policy no longer keeps
+    
+    Args:
+        archive_dir (str): Archive directory
+        policy (dict): Buckets kept per tier
+    
+    Returns:
+        list: Paths of the deleted archives
+    """
+    archives = list_archives(archive_dir)
+    kept = select_kept([taken_at for taken_at, _path in archives], policy)
+    
+    removed = []
+    for taken_at, path in archives:
+        if taken_at not in kept:
+            os.remove(path)
+            removed.append(path)
+    if removed:
+        logger.info(f"Rotated out {len(removed)} old backup archive(s)")
+    return removed
+
+
+def period_start(schedule, now):
+    """
+    Start of the schedule period containing a time
+    
+    A backup is due when the newest archive is older than this.
+    
+    Args:
+        schedule (str): Schedule name other than 'off'
+        now (datetime): Current time
+    
+    Returns:
+        datetime: Period start
+    """
+    if schedule == 'hourly':
+        return now.replace(minute=0, second=0, microsecond=0)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if schedule == 'daily':
+        return midnight
+    if schedule == 'day-close':
+        close = midnight + timedelta(hours=DAY_CLOSE_HOUR)
+        # A close missed while the app was not running is caught up next day
+        return close if now >= close else close - timedelta(days=1)
+    raise ValueError(f"Unknown backup schedule: {schedule}")
+
+
+class BackupScheduler:
+    """
+    Takes archives of one database on the saved schedule
+    
+    Call run_if_due() periodically from a worker thread; it is cheap when
+    no backup is due.
+    
+    Args:
+        source_path (str): Live database file
+        archive_dir (str): Archive directory (default: backups/ next to the database)
+        policy (dict): Retention policy
+    """
+    
+    def __init__(self, source_path, archive_dir=None, policy=RETENTION):
+        self.source_path = source_path
+        self.archive_dir = archive_dir or default_archive_dir(source_path)
+        self.policy = policy
+        self._last = None
+    
+    def last_archive_time(self):
+        """Time of the newest archive, None if there is none"""
+        if self._last is None:
+            archives = list_archives(self.archive_dir)
+            self._last = archives[0][0] if archives else None
+        return self._last
+    
+    def is_due(self, now=None, schedule=None):
+        """
+        Check whether the schedule calls for a new archive
+        
+        Args:
+            now (datetime): Current time (default: now)
+            schedule (str): Schedule name (default: the saved one)
+        
+        Returns:
+            bool: True if a backup should be taken
+        """
+        schedule = schedule or get_backup_schedule()
+        if schedule == 'off':
+            return False
+        last = self.last_archive_time()
+        return last is None or last < period_start(schedule, now or datetime.now())
+    
+    def run(self, now=None):
+        """
+        Take an archive and prune old ones
+        
+        Args:
+            now (datetime): Time of the archive (default: now)
+        
+        Returns:
+            str: Path of the new archive
+        """
+        path = create_archive(self.source_path, self.archive_dir, now)
+        self._last = None
+        rotate(self.archive_dir, self.policy)
+        return path
+    
+    def run_if_due(self, now=None):
+        """
+        Take an archive if one is due
+        
+        Returns:
+            str: Path of the new archive, None if none was due
+        """
+        if not self.is_due(now):
+            return None
+        return self.run(now)
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Create or check Kagan backup archives")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    create = subparsers.add_parser('create', help="Archive the database and rotate old archives")
+    create.add_argument('--db-url', help="Database URL (defaults to kagan_db.sqlite)")
+    create.add_argument('--dir', help="Archive directory (defaults to backups/ next to the database)")
+    
+    verify = subparsers.add_parser('verify', help="Check an archive against its manifest")
+    verify.add_argument('archive')
+    
+    args = parser.parse_args(argv)
+    
+    from utils import setup_logging
+    setup_logging()
+    
+    if args.command == 'verify':
+        try:
+            manifest = verify_archive(args.archive)
+        except BackupError as e:
+            print(f"✗ {e}")
+            return 1
+        rows = sum(manifest['row_counts'].values())
+        print(f"✓ Archive OK: schema version {manifest['schema_version']}, {rows} rows")
+        return 0
+    
+    from .db_manager import DatabaseManager
+    
+    db_manager = DatabaseManager()
+    db_manager.initialize(args.db_url)
+    scheduler = BackupScheduler(db_manager.db_path, args.dir)
+    print(f"✓ Archive written to {scheduler.run()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
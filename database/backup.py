@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Online Backup
+Consistent copies of a live SQLite database through the backup API
+
+The copy is made page batch by page batch with sqlite3.Connection.backup.
+Between batches the source is unlocked, so the application keeps writing
+while a backup runs; if it writes, SQLite restarts the copy so the result
+is always a single consistent snapshot. On a busy database the copy could
+restart forever, so after MAX_RESTARTS restarts it is taken with VACUUM
+INTO instead: one read transaction, which in WAL mode does not hold up the
+writers. The copy is written to a temporary file, checked with PRAGMA
+integrity_check and only then moved into place.
+"""
+
+import os
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pages copied per step; with the default 4 KiB page size about 1 MiB
+PAGES_PER_STEP = 256
+
+# Pause between steps so writers get the database in between (seconds)
+STEP_SLEEP = 0.005
+
+# Copies restarted by other connections' writes before VACUUM INTO takes over
+MAX_RESTARTS = 3
+
+
+class BackupError(Exception):
+    """Raised when a backup or restore cannot be completed"""
+
+
+class _Restarting(Exception):
+    """Stops a backup API copy that keeps starting over"""
+
+
+def integrity_check(path):
+    """
+    Run PRAGMA integrity_check on a database file
+    
+    Args:
+        path (str): Database file
+    
+    Returns:
+        str: 'ok', or the problems SQLite reported
+    """
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return '\n'.join(row[0] for row in rows)
+
+
+def copy_database(source_path, dest_path, progress=None, pages_per_step=PAGES_PER_STEP,
+                  max_restarts=MAX_RESTARTS):
+    """
+    Copy a (possibly live) database file with the backup API
+    
+    Args:
+        source_path (str): Database to copy
+        dest_path (str): File to create or overwrite
+        progress (callable): progress(copied_pages, total_pages) after each step
+        pages_per_step (int): Pages copied per step
+        max_restarts (int): Restarts caused by writes before copying with VACUUM INTO
+    
+    Returns:
+        int: Times the backup API copy restarted
+    """
+    restarts = 0
+    last_copied = last_total = 0
+    
+    def report(status, remaining, total):
+        nonlocal restarts, last_copied, last_total
+        copied = total - remaining
+        # Another connection wrote: the copy went back to the first page
+        if copied <= last_copied:
+            restarts += 1
+            if restarts > max_restarts:
+                raise _Restarting()
+        last_copied, last_total = copied, total
+        if progress is not None:
+            progress(copied, total)
+    
+    source = sqlite3.connect(source_path)
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            source.backup(dest, pages=pages_per_step, progress=report, sleep=STEP_SLEEP)
+        except _Restarting:
+            dest.close()
+            os.remove(dest_path)
+            logger.warning(f"Backup of {source_path} restarted {max_restarts} times, copying with VACUUM INTO")
+            source.execute("VACUUM INTO ?", (dest_path,))
+            if progress is not None:
+                progress(last_total, last_total)
+        finally:
+            dest.close()
+    finally:
+        source.close()
+    return restarts
+
+
+def backup_database(source_path, dest_path, progress=None, pages_per_step=PAGES_PER_STEP):
+    """
+    Make a verified backup of a live database
+    
+    Blocks until done; run it on a worker thread.
+    
+    Args:
+        source_path (str): Live database file
+        dest_path (str): Backup file to write
+        progress (callable): progress(copied_pages, total_pages) after each step
+        pages_per_step (int): Pages copied per step
+    
+    Returns:
+        str: dest_path
+    
+    Raises:
+        BackupError: If the copy fails its integrity check
+    """
+    temp_path = dest_path + '.part'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    
+    try:
+        copy_database(source_path, temp_path, progress, pages_per_step)
+        
+        result = integrity_check(temp_path)
+        if result != 'ok':
+            raise BackupError(f"Backup failed integrity check: {result}")
+        
+        os.replace(temp_path, dest_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    logger.info(f"Backup written to {dest_path} ({os.path.getsize(dest_path)} bytes)")
+    return dest_path
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bulk Order Writes
+Orders, their items and the matching stock decrements in a few statements
+
+Adding orders one ORM object at a time costs a flush per order (to get its
+id) and a round trip per row. write_orders() validates a whole batch up
+front, then writes the stock changes, the orders and the items with one
+executemany statement each, so a batch costs the same number of round trips
+whether it holds one order or a month of paper tickets. Nothing of an
+invalid batch is written.
+"""
+
+import logging
+from datetime import datetime
+from sqlalchemy import insert, update, select, func, bindparam, text
+from .models import Order, OrderItem, Product, Customer, ORDER_STATUSES
+from . import rollup, catalog
+
+logger = logging.getLogger(__name__)
+
+
+class OrderValidationError(ValueError):
+    """
+    Raised when an order of a batch is invalid
+    
+    Args:
+        index (int): Position of the order in the batch
+        message (str): What is wrong with it
+    """
+    
+    def __init__(self, index, message):
+        super().__init__(f"Order {index + 1}: {message}")
+        self.index = index
+
+
+def _positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _validate(orders, products, customer_ids):
+    """
+    Check a batch and build its rows
+    
+    Returns:
+        tuple: (order rows, item rows per order, quantity taken per product id)
+    """
+    order_rows = []
+    item_rows = []
+    taken = {}
+    now = datetime.utcnow()
+    
+    for index, order in enumerate(orders):
+        status = order.get('status', 'pending')
+        if status not in ORDER_STATUSES:
+            raise OrderValidationError(index, f"unknown status {status!r}")
+        
+        customer_id = order.get('customer_id')
+        if customer_id is not None and customer_id not in customer_ids:
+            raise OrderValidationError(index, f"customer {customer_id} does not exist")
+        
+        items = order.get('items') or []
+        if not items:
+            raise OrderValidationError(index, "an order needs at least one item")
+        
+        rows = []
+        total = 0
+        for item in items:
+            product = products.get(item.get('product_id'))
+            if product is None or not product.is_active:
+                raise OrderValidationError(index, f"product {item.get('product_id')} is not on sale")
+            
+            quantity = item.get('quantity')
+            if not _positive_int(quantity):
+                raise OrderValidationError(index, f"invalid quantity {quantity!r} for {product.name}")
+            
+            price = item.get('price', product.price)
+            if price is None or price < 0:
+                raise OrderValidationError(index, f"invalid price {price!r} for {product.name}")
+            
+            subtotal = price * quantity
+            rows.append({'product_id': product.id, 'quantity': quantity, 'price': price, 'subtotal': subtotal})
+            taken[product.id] = taken.get(product.id, 0) + quantity
+            total += subtotal
+        
+        created_at = order.get('created_at') or now
+        order_rows.append({
+            'customer_id': customer_id,
+            'table_number': order.get('table_number'),
+            'status': status,
+            'total_amount': total,
+            'notes': order.get('notes'),
+            'created_at': created_at,
+            'updated_at': created_at,
+        })
+        item_rows.append(rows)
+    
+    return order_rows, item_rows, taken
+
+
+def _take_write_lock(session):
+    """Make the session's transaction SQLite's writer before it reads anything"""
+    connection = session.connection()
+    if connection.dialect.name != 'sqlite':
+        return
+    # pysqlite only opens a transaction on the first write; one already
+    # open has written, so it holds the lock
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _next_id(session, table):
+    """
+    First id of a table no row has had, not even one since moved to history
+    
+    Args:
+        session: Session holding the write lock
+        table: Table with an integer id
+    
+    Returns:
+        int: Id to use
+    """
+    used = session.scalar(select(func.max(table.c.id))) or 0
+    if session.connection().dialect.name == 'sqlite':
+        # AUTOINCREMENT's counter remembers ids whose rows are gone
+        handed_out = session.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {'name': table.name})
+        used = max(used, handed_out or 0)
+    return used + 1
+
+
+def write_orders(session, orders):
+    """
+    Insert a batch of orders with their items and take the items out of stock
+    
+    Runs in the caller's transaction. Order totals and item subtotals are
+    computed from the items; an item without a price is sold at the
+    product's current price. Written tables reach the query cache, catalog,
+    dashboard and change tracker through the session's hooks, and the
+    rollup days of the orders are recomputed when the session commits.
+    
+    Args:
+        session: Session from DatabaseManager
+        orders (list): Dicts with 'items' (dicts with product_id, quantity
+            and optionally price) and optionally customer_id, table_number,
+            status, notes and created_at
+    
+    Returns:
+        list: Ids of the new orders, in batch order
+    
+    Raises:
+        OrderValidationError: If any order is invalid
+    """
+    if not orders:
+        return []
+    
+    # Nothing another connection commits can slip in between the reads
+    # below (products, the last order id) and the writes
+    _take_write_lock(session)
+    
+    product_ids = {item.get('product_id') for order in orders for item in (order.get('items') or [])}
+    customer_ids = {order['customer_id'] for order in orders if order.get('customer_id') is not None}
+    products = {
+        product.id: product
+        for product in session.scalars(select(Product).where(Product.id.in_(product_ids)))
+    }
+    existing_customers = set(
+        session.scalars(select(Customer.id).where(Customer.id.in_(customer_ids)))
+    ) if customer_ids else set()
+    
+    order_rows, item_rows, taken = _validate(orders, products, existing_customers)
+    
+    # Stock is decremented relative to the stored level, in one executemany
+    products_table = Product.__table__
+    session.execute(
+        update(products_table)
+        .where(products_table.c.id == bindparam('product_id'))
+        .values(stock_quantity=func.coalesce(products_table.c.stock_quantity, 0) - bindparam('taken'))
+        .execution_options(**{catalog.ROWS_NOTED: True}),
+        [{'product_id': product_id, 'taken': quantity} for product_id, quantity in taken.items()]
+    )
+    # Read the new levels back into the session and the catalog
+    session.execute(
+        select(Product).where(Product.id.in_(taken)).execution_options(populate_existing=True)
+    ).scalars().all()
+    catalog.note_rows(session, [products[product_id] for product_id in taken])
+    
+    # Ids are assigned here rather than read back with RETURNING: SQLite
+    # cannot return the ids of a multi-row INSERT in parameter order, which
+    # would make SQLAlchemy fall back to one INSERT per order
+    first_id = _next_id(session, Order.__table__)
+    order_ids = list(range(first_id, first_id + len(order_rows)))
+    session.execute(insert(Order.__table__), [
+        dict(row, id=order_id) for order_id, row in zip(order_ids, order_rows)
+    ])
+    session.execute(insert(OrderItem.__table__), [
+        dict(row, order_id=order_id)
+        for order_id, rows in zip(order_ids, item_rows)
+        for row in rows
+    ])
+    
+    rollup.note_days(session, {row['created_at'].date() for row in order_rows})
+    logger.info(f"Bulk wrote {len(order_ids)} orders with {sum(map(len, item_rows))} items")
+    return order_ids
+
+
+def create_orders(orders):
+    """
+    Write a batch of orders in a transaction of its own
+    
+    Args:
+        orders (list): Orders as accepted by write_orders()
+    
+    Returns:
+        list: Ids of the new orders
+    """
+    from .db_manager import get_db_manager
+    
+    with get_db_manager().session_scope() as session:
+        return write_orders(session, orders)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Result Cache
+Results of read-only SELECTs, reused until a commit touches their tables
+
+Entries are keyed by the compiled statement and its parameters and tagged
+with the tables the statement reads. Sessions created by DatabaseManager
+record the tables written by each flush (and by ORM-enabled INSERT, UPDATE
+and DELETE statements) and drop the matching entries once the transaction
+commits. Writes made outside those sessions must call invalidate().
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from sqlalchemy import Table, event, inspect
+from sqlalchemy.sql.util import find_tables
+
+# Limits of the shared cache
+MAX_ENTRIES = 512
+MAX_BYTES = 32 * 1024 * 1024
+
+# session.info key holding the tables written since the last commit
+WRITTEN_TABLES_KEY = 'cache_written_tables'
+
+
+def _estimate_size(rows):
+    """Rough memory footprint of a result in bytes"""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+def statement_tables(statement):
+    """
+    Names of the tables a statement reads, including joins, subqueries and CTEs
+    
+    Args:
+        statement: SQLAlchemy Core statement
+    
+    Returns:
+        frozenset: Table names
+    """
+    return frozenset(
+        table.name for table in find_tables(statement, include_aliases=True)
+        if isinstance(table, Table)
+    )
+
+
+class QueryCache:
+    """
+    LRU cache of SELECT results with table-based invalidation
+    
+    Args:
+        max_entries (int): Most results kept
+        max_bytes (int): Approximate memory cap for all results
+    """
+    
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (rows, tables, size)
+        self._table_versions = {}
+        self._bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def fetch(self, session, statement):
+        """
+        Execute a SELECT through the cache
+        
+        Sessions holding uncommitted writes bypass the cache, since their
+        results may include changes other sessions cannot see.
+        
+        Args:
+            session: Database session
+            statement: Core or ORM-enabled select() of columns
+        
+        Returns:
+            list: Result rows
+        """
+        if session.info.get(WRITTEN_TABLES_KEY) or session.new or session.dirty or session.deleted:
+            return session.execute(statement).all()
+        
+        compiled = statement.compile(dialect=session.get_bind().dialect)
+        key = (str(compiled), repr(sorted(compiled.params.items())))
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[0])
+            self.misses += 1
+            tables = statement_tables(statement)
+            versions = {table: self._table_versions.get(table, 0) for table in tables}
+        
+        rows = session.execute(statement).all()
+        
+        with self._lock:
+            # A commit that landed while we were reading makes the result stale
+            if all(self._table_versions.get(table, 0) == version for table, version in versions.items()):
+                self._store(key, rows, tables)
+        return list(rows)
+    
+    def fetch_query(self, query):
+        """
+        Execute an ORM Query through the cache
+        
+        Queries selecting whole entities are run directly, since ORM
+        objects belong to the session that loaded them.
+        
+        Args:
+            query: ORM Query
+        
+        Returns:
+            list: Result rows
+        """
+        if any(description['expr'] is description['entity'] for description in query.column_descriptions):
+            return query.all()
+        return self.fetch(query.session, query.statement)
+    
+    def _store(self, key, rows, tables):
+        size = _estimate_size(rows)
+        if size > self.max_bytes:
+            return
+        
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[key] = (rows, tables, size)
+        self._bytes += size
+        
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _key, (_rows, _tables, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+    
+    def invalidate(self, tables=None):
+        """
+        Drop cached results
+        
+        Args:
+            tables (iterable): Names of changed tables, None to drop everything
+        """
+        with self._lock:
+            if tables is None:
+                for table in self._table_versions:
+                    self._table_versions[table] += 1
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                return
+            
+            tables = set(tables)
+            for table in tables:
+                self._table_versions[table] = self._table_versions.get(table, 0) + 1
+            
+            stale = [key for key, entry in self._entries.items() if entry[1] & tables]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[2]
+            self.invalidations += len(stale)
+    
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        self.invalidate()
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+    
+    def stats(self):
+        """
+        Get cache counters
+        
+        Returns:
+            dict: entries, bytes, hits, misses, hit_rate, evictions, invalidations
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+# Shared by every session of the application
+query_cache = QueryCache()
+
+
+def _written(session):
+    return session.info.setdefault(WRITTEN_TABLES_KEY, set())
+
+
+def _note_flush(session, flush_context):
+    """after_flush: remember the tables written by this flush"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        _written(session).update(table.name for table in inspect(obj).mapper.tables)
+
+
+def _note_dml(orm_execute_state):
+    """do_orm_execute: remember the table of INSERT/UPDATE/DELETE statements"""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _written(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+
+def _after_commit(session):
+    tables = session.info.pop(WRITTEN_TABLES_KEY, None)
+    if tables:
+        query_cache.invalidate(tables)
+
+
+def _discard(session, transaction):
+    """after_transaction_end: forget writes of a rolled back transaction"""
+    if transaction.parent is None:
+        session.info.pop(WRITTEN_TABLES_KEY, None)
+
+
+def install(session_factory):
+    """
+    Invalidate cached results when sessions of a factory commit writes
+    
+    Args:
+        session_factory: sessionmaker to attach the hooks to
+    """
+    event.listen(session_factory, 'after_flush', _note_flush)
+    event.listen(session_factory, 'do_orm_execute', _note_dml)
+    event.listen(session_factory, 'after_commit', _after_commit)
+    event.listen(session_factory, 'after_transaction_end', _discard)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reference Data Catalog
+In-memory copy of products, services, employees and customers
+
+The catalog is loaded once and then kept in sync from the changes that
+sessions created by DatabaseManager commit, so menus, pickers and lookups
+never query these tables again. Every applied change raises the catalog
+version; a screen that remembers the version it drew can skip redrawing
+while the version is unchanged.
+"""
+
+import threading
+from collections import namedtuple
+from sqlalchemy import event, inspect
+from .models import Product, Service, Employee, Customer
+from .phones import PhoneIndex, normalize_phone
+
+ProductRef = namedtuple(
+    'ProductRef',
+    ['id', 'name', 'category', 'price', 'stock_quantity', 'min_stock_level', 'unit']
+)
+ServiceRef = namedtuple('ServiceRef', ['id', 'name', 'price', 'duration'])
+EmployeeRef = namedtuple('EmployeeRef', ['id', 'name', 'position', 'phone'])
+CustomerRef = namedtuple('CustomerRef', ['id', 'name', 'phone', 'phone_normalized'])
+
+# model: (row type, attribute to group by, whether only active rows are kept)
+REFERENCE_MODELS = {
+    Product: (ProductRef, 'category', True),
+    Service: (ServiceRef, None, True),
+    Employee: (EmployeeRef, 'position', True),
+    Customer: (CustomerRef, None, False),
+}
+
+# session.info keys
+CHANGES_KEY = 'catalog_changes'
+RELOAD_KEY = 'catalog_reload'
+
+# Execution option of bulk statements whose rows the writer hands to note_rows()
+ROWS_NOTED = 'catalog_rows_noted'
+
+
+class _Table:
+    """Rows of one model: by id, plus name-sorted, grouped and phone views built on demand"""
+    
+    def __init__(self, group_by):
+        self.group_by = group_by
+        self.by_id = {}
+        self._sorted = None
+        self._groups = None
+        self._phones = None
+    
+    def put(self, row):
+        old = self.by_id.get(row.id)
+        self.by_id[row.id] = row
+        self._sorted = self._groups = None
+        if self._phones is not None:
+            # Kept up to date in place; rebuilding it would stall the next keystroke
+            if old is not None:
+                self._phones.discard(old.phone_normalized, old.id)
+            self._phones.add(row.phone_normalized, row.id)
+    
+    def remove(self, row_id):
+        old = self.by_id.pop(row_id, None)
+        if old is not None:
+            self._sorted = self._groups = None
+            if self._phones is not None:
+                self._phones.discard(old.phone_normalized, row_id)
+    
+    def sorted(self):
+        if self._sorted is None:
+            self._sorted = sorted(self.by_id.values(), key=lambda row: (row.name or '', row.id))
+        return self._sorted
+    
+    def groups(self):
+        if self._groups is None:
+            groups = {}
+            for row in self.sorted():
+                groups.setdefault(getattr(row, self.group_by), []).append(row)
+            self._groups = groups
+        return self._groups
+    
+    def phones(self):
+        if self._phones is None:
+            self._phones = PhoneIndex((row.phone_normalized, row.id) for row in self.by_id.values())
+        return self._phones
+
+
+class ReferenceCatalog:
+    """Thread-safe in-memory reference tables with a change version"""
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._tables = None
+        self._version = 0
+    
+    @property
+    def version(self):
+        """Number that grows whenever catalog content changes"""
+        return self._version
+    
+    @property
+    def loaded(self):
+        return self._tables is not None
+    
+    def ensure_loaded(self, session):
+        """
+        Load all reference tables unless already loaded
+        
+        Args:
+            session: Database session
+        
+        Returns:
+            ReferenceCatalog: self, for chaining
+        """
+        if self._tables is None:
+            self.load(session)
+        return self
+    
+    def load(self, session):
+        """
+        (Re)load every reference table, one projection query per model
+        
+        Args:
+            session: Database session
+        """
+        while True:
+            started_at = self._version
+            tables = {}
+            for model, (row_type, group_by, active_only) in REFERENCE_MODELS.items():
+                query = session.query(*[getattr(model, field) for field in row_type._fields])
+                if active_only:
+                    query = query.filter(model.is_active == True)
+                
+                table = _Table(group_by)
+                for row in query:
+                    table.put(row_type._make(row))
+                tables[model] = table
+            
+            with self._lock:
+                # Read again if a commit was applied while we were reading
+                if self._version == started_at:
+                    self._tables = tables
+                    self._version += 1
+                    return
+                session.rollback()
+    
+    def reset(self):
+        """Forget all data; the next ensure_loaded() reads the database again"""
+        with self._lock:
+            self._tables = None
+            self._version += 1
+    
+    def apply(self, changes):
+        """
+        Apply committed changes
+        
+        Args:
+            changes (list): (model, row id, row or None for a removal) tuples
+        """
+        with self._lock:
+            self._version += 1
+            if self._tables is None:
+                return
+            for model, row_id, row in changes:
+                if row is None:
+                    self._tables[model].remove(row_id)
+                else:
+                    self._tables[model].put(row)
+    
+    def _table(self, model):
+        if self._tables is None:
+            raise RuntimeError("Reference catalog not loaded. Call ensure_loaded() first.")
+        return self._tables[model]
+    
+    def get(self, model, row_id):
+        """
+        Look up one row by id
+        
+        Args:
+            model: Product, Service, Employee or Customer
+            row_id (int): Primary key
+        
+        Returns:
+            namedtuple: The row, or None
+        """
+        with self._lock:
+            return self._table(model).by_id.get(row_id)
+    
+    def by_name(self, model):
+        """
+        All rows of a model ordered by name
+        
+        Returns:
+            list: Rows (do not modify)
+        """
+        with self._lock:
+            return self._table(model).sorted()
+    
+    def by_group(self, model, group):
+        """
+        Rows of a model in one group (product category, employee position), ordered by name
+        
+        Returns:
+            list: Rows (do not modify)
+        """
+        with self._lock:
+            return self._table(model).groups().get(group, [])
+    
+    def by_phone_prefix(self, typed, limit=10):
+        """
+        Customers whose phone starts with what has been typed so far
+        
+        Any digits and separators may be typed; "۰۹۱۲" matches "+98912...".
+        Meant to be called after every keystroke of a caller-ID or
+        customer-picker field.
+        
+        Args:
+            typed (str): Partial phone number
+            limit (int): Most customers returned
+        
+        Returns:
+            list: CustomerRef rows, ordered by phone
+        """
+        prefix = normalize_phone(typed)
+        with self._lock:
+            table = self._table(Customer)
+            return [table.by_id[row_id] for row_id in table.phones().prefix(prefix, limit)]
+    
+    def by_phone(self, phone):
+        """
+        Customers with a phone number, however it is written
+        
+        Args:
+            phone (str): Phone number
+        
+        Returns:
+            list: CustomerRef rows (more than one means duplicates)
+        """
+        normalized = normalize_phone(phone)
+        with self._lock:
+            table = self._table(Customer)
+            return [table.by_id[row_id] for row_id in table.phones().exact(normalized)]
+
+
+# Shared by every section of the application
+catalog = ReferenceCatalog()
+
+
+def _row_for(obj, model):
+    """Catalog row for a flushed object, None if it should not be listed"""
+    row_type, _group_by, active_only = REFERENCE_MODELS[model]
+    if active_only and not obj.is_active:
+        return None
+    return row_type._make(getattr(obj, field) for field in row_type._fields)
+
+
+def _note_flush(session, flush_context):
+    """after_flush: record reference rows changed by this flush"""
+    changes = session.info.setdefault(CHANGES_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        model = type(obj)
+        if model in REFERENCE_MODELS:
+            changes.append((model, obj.id, _row_for(obj, model)))
+    for obj in session.deleted:
+        model = type(obj)
+        if model in REFERENCE_MODELS:
+            changes.append((model, inspect(obj).identity[0], None))
+
+
+def note_rows(session, objects):
+    """
+    Have the catalog apply reference rows written without the unit of work
+    
+    Writers that change reference tables with Core statements pass the
+    refreshed objects here and mark the statements with the ROWS_NOTED
+    execution option; the rows are applied on commit instead of a reload.
+    
+    Args:
+        session: Session the rows were written in
+        objects (iterable): Loaded objects holding the new values
+    """
+    changes = session.info.setdefault(CHANGES_KEY, [])
+    for obj in objects:
+        model = type(obj)
+        changes.append((model, obj.id, _row_for(obj, model)))
+
+
+def _note_dml(orm_execute_state):
+    """do_orm_execute: bulk UPDATE/DELETE on a reference table forces a reload"""
+    if orm_execute_state.execution_options.get(ROWS_NOTED):
+        return
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = orm_execute_state.statement.table
+        if any(model.__table__ is table for model in REFERENCE_MODELS):
+            orm_execute_state.session.info[RELOAD_KEY] = True
+
+
+def _after_commit(session):
+    changes = session.info.pop(CHANGES_KEY, None)
+    if session.info.pop(RELOAD_KEY, False):
+        catalog.reset()
+    elif changes:
+        catalog.apply(changes)
+
+
+def _discard(session, transaction):
+    """after_transaction_end: forget changes of a rolled back transaction"""
+    if transaction.parent is None:
+        session.info.pop(CHANGES_KEY, None)
+        session.info.pop(RELOAD_KEY, None)
+
+
+def install(session_factory):
+    """
+    Keep the catalog in sync with commits of sessions from a factory
+    
+    Args:
+        session_factory: sessionmaker to attach the hooks to
+    """
+    event.listen(session_factory, 'after_flush', _note_flush)
+    event.listen(session_factory, 'do_orm_execute', _note_dml)
+    event.listen(session_factory, 'after_commit', _after_commit)
+    event.listen(session_factory, 'after_transaction_end', _discard)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Change Detection
+Tells which tables changed since the last poll, cheaply
+
+Commits made by this process are counted per table from the writes the
+sessions of DatabaseManager record. Commits by anything else (a second
+terminal, a script) are noticed through SQLite's PRAGMA data_version,
+which changes on a connection whenever another connection commits. Such
+a change cannot be traced to tables, so it reports every table and drops
+the in-memory caches.
+
+Local commits move data_version too, and it only says that something
+changed, not how often. So each local commit reads it just before
+committing, while its transaction holds SQLite's write lock and nobody
+else can commit, and again right after. A change between those checks
+is the commit's own; any other change came from outside.
+"""
+
+import threading
+from sqlalchemy import event
+from .models import Base
+from .cache import WRITTEN_TABLES_KEY, query_cache
+from .catalog import catalog
+from . import dashboard
+
+# Reported when another process changed the database
+ALL_TABLES = frozenset(Base.metadata.tables)
+
+# session.info key: the committing transaction was checked by begin_commit()
+CHECKED_KEY = 'changes_checked'
+
+
+class ChangeTracker:
+    """Per-table commit counters plus a data_version watch on one connection"""
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._counters = {}
+        # Local commits not checked against data_version
+        self._local_commits = 0
+        # Checked commits between begin_commit() and end_commit()
+        self._checking = 0
+        # An outside change was seen by begin_commit() since the last poll
+        self._outside = False
+        
+        # State of the last poll
+        self._engine = None
+        self._connection = None
+        self._data_version = None
+        self._seen_counters = {}
+        self._seen_local_commits = 0
+    
+    def record_commit(self, tables, checked=False):
+        """
+        Count a commit by this process
+        
+        Args:
+            tables (iterable): Names of the tables it wrote
+            checked (bool): begin_commit() and end_commit() already account
+                for its data_version change
+        """
+        with self._lock:
+            for table in tables:
+                self._counters[table] = self._counters.get(table, 0) + 1
+            if not checked:
+                self._local_commits += 1
+    
+    def begin_commit(self, engine):
+        """
+        Note data_version right before a local commit
+        
+        Must be called while the committing transaction holds the write
+        lock, so every change seen here happened before the commit; one no
+        local commit explains came from outside.
+        
+        Args:
+            engine: Engine of the committing session
+        
+        Returns:
+            bool: True if the commit is checked; end_commit() must follow
+        """
+        with self._lock:
+            if engine is not self._engine or self._connection is None:
+                return False
+            data_version = self._read_data_version(engine)
+            if (
+                self._data_version is not None
+                and data_version != self._data_version
+                and not self._checking
+                and self._local_commits == self._seen_local_commits
+            ):
+                self._outside = True
+            self._data_version = data_version
+            self._checking += 1
+            return True
+    
+    def end_commit(self):
+        """Take in the data_version change of a checked commit (none after a rollback)"""
+        with self._lock:
+            self._checking -= 1
+            if self._connection is not None:
+                self._data_version = self._read_data_version(self._engine)
+    
+    def counter(self, table):
+        """Number of local commits that wrote a table"""
+        return self._counters.get(table, 0)
+    
+    def _read_data_version(self, engine):
+        if engine.dialect.name != 'sqlite':
+            return None
+        if engine is not self._engine:
+            self.reset()
+            self._engine = engine
+            self._connection = engine.raw_connection()
+        cursor = self._connection.cursor()
+        try:
+            cursor.execute("PRAGMA data_version")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    
+    def poll(self, engine):
+        """
+        Get the tables changed since the previous poll
+        
+        In the steady state this costs one PRAGMA on a connection kept open
+        for the purpose. Call it from one thread only.
+        
+        Args:
+            engine: SQLAlchemy engine of the database
+        
+        Returns:
+            frozenset: Changed table names (ALL_TABLES after an outside change)
+        """
+        with self._lock:
+            data_version = self._read_data_version(engine)
+            counters = dict(self._counters)
+            local_commits = self._local_commits
+            
+            changed = frozenset(
+                table for table, count in counters.items() if count != self._seen_counters.get(table, 0)
+            )
+            
+            # Checked commits have taken in their own changes; one left
+            # over is from outside unless an unchecked commit explains it
+            outside = self._outside or (
+                self._data_version is not None
+                and data_version != self._data_version
+                and not self._checking
+                and local_commits == self._seen_local_commits
+            )
+            
+            self._outside = False
+            self._data_version = data_version
+            self._seen_counters = counters
+            self._seen_local_commits = local_commits
+        
+        if outside:
+            query_cache.invalidate()
+            catalog.reset()
+            dashboard.invalidate()
+            return ALL_TABLES
+        return changed
+    
+    def reset(self):
+        """Close the watch connection (e.g. before the database file is replaced)"""
+        if self._connection is not None:
+            self._connection.close()
+        self._engine = None
+        self._connection = None
+        self._data_version = None
+        self._outside = False
+
+
+# Shared by the whole application
+change_tracker = ChangeTracker()
+
+
+def _check_commit(session):
+    """before_commit: note data_version while the transaction holds the write lock"""
+    session.flush()
+    if session.info.get(WRITTEN_TABLES_KEY) and change_tracker.begin_commit(session.get_bind()):
+        session.info[CHECKED_KEY] = True
+
+
+def _count_commit(session):
+    """after_commit: count the tables the transaction wrote"""
+    tables = session.info.get(WRITTEN_TABLES_KEY)
+    if tables:
+        change_tracker.record_commit(tables, checked=session.info.get(CHECKED_KEY, False))
+
+
+def _end_check(session, transaction):
+    """after_transaction_end: finish the check begun in before_commit"""
+    if transaction.parent is None and session.info.pop(CHECKED_KEY, False):
+        change_tracker.end_commit()
+
+
+def install(session_factory):
+    """
+    Count the commits of sessions from a factory
+    
+    Must see the written tables before the query cache clears them, so the
+    after_commit listener is inserted at the front. The before_commit check
+    runs after the other listeners have flushed their writes.
+    
+    Args:
+        session_factory: sessionmaker to attach the hooks to
+    """
+    event.listen(session_factory, 'before_commit', _check_commit)
+    event.listen(session_factory, 'after_commit', _count_commit, insert=True)
+    event.listen(session_factory, 'after_transaction_end', _end_check)
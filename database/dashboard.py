@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dashboard Snapshot
+Every KPI shown on the report cards, read in one statement and shared
+
+The overview tab, the cafe daily report, the salon report and the inventory
+report all show figures from the same snapshot. It is computed by a single
+SELECT over a few one-row CTEs, so the numbers are consistent with each
+other, and kept for a few seconds so tabs rendering together reuse it.
+"""
+
+import time
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, func, case, true
+from .models import DailyRollup, Customer, Order, Product
+
+# Seconds a snapshot is reused before it is read again
+SNAPSHOT_TTL = 5.0
+
+DashboardSnapshot = namedtuple('DashboardSnapshot', [
+    'taken_at',
+    # Cafe, today
+    'orders_today', 'order_total_today', 'paid_orders_today', 'sales_today',
+    # Paid order revenue since seven days ago
+    'weekly_revenue',
+    # Salon: today's appointments, and all from today on
+    'appointments_today', 'completed_appointments_today', 'upcoming_appointments',
+    'customers_today',
+    'active_orders',
+    # Inventory
+    'product_count', 'low_stock', 'stock_value',
+])
+
+_lock = threading.Lock()
+_cached = None  # (bind, monotonic time, snapshot)
+
+
+def _snapshot_statement(today):
+    """Build the combined KPI query for a business day"""
+    week_ago = today - timedelta(days=7)
+    day = DailyRollup.day
+    is_today = day == today.date()
+    
+    def today_sum(column):
+        return func.coalesce(func.sum(case((is_today, column), else_=0)), 0)
+    
+    # Rollup rows of the last week and every future day
+    rollup = select(
+        today_sum(DailyRollup.order_count).label('orders_today'),
+        today_sum(DailyRollup.order_total).label('order_total_today'),
+        today_sum(DailyRollup.paid_order_count).label('paid_orders_today'),
+        today_sum(DailyRollup.paid_revenue).label('sales_today'),
+        func.coalesce(func.sum(DailyRollup.paid_revenue), 0).label('weekly_revenue'),
+        today_sum(DailyRollup.appointment_count).label('appointments_today'),
+        today_sum(DailyRollup.completed_appointments).label('completed_appointments_today'),
+        func.coalesce(func.sum(case((day >= today.date(), DailyRollup.appointment_count), else_=0)), 0)
+        .label('upcoming_appointments'),
+    ).where(day >= week_ago.date()).cte('rollup')
+    
+    customers = select(
+        func.count(Customer.id).label('customers_today')
+    ).where(Customer.created_at >= today).cte('new_customers')
+    
+    orders = select(
+        func.count(Order.id).label('active_orders')
+    ).where(Order.active_filter()).cte('active')
+    
+    products = select(
+        func.count(Product.id).label('product_count'),
+        func.coalesce(func.sum(case((Product.stock_quantity <= Product.min_stock_level, 1), else_=0)), 0)
+        .label('low_stock'),
+        func.coalesce(func.sum(Product.price * Product.stock_quantity), 0).label('stock_value'),
+    ).where(Product.is_active == True).cte('stock')
+    
+    # Each CTE yields exactly one row, so the cross join does too
+    return select(
+        *rollup.c, *customers.c, *orders.c, *products.c
+    ).select_from(
+        rollup.join(customers, true()).join(orders, true()).join(products, true())
+    )
+
+
+def read_snapshot(session):
+    """
+    Read a fresh snapshot from the database
+    
+    Args:
+        session: Database session
+    
+    Returns:
+        DashboardSnapshot: Current KPIs
+    """
+    now = datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    row = session.execute(_snapshot_statement(today)).one()
+    return DashboardSnapshot(now, *row)
+
+
+def get_snapshot(session, max_age=SNAPSHOT_TTL):
+    """
+    Get the dashboard snapshot, reusing one read within the last max_age seconds
+    
+    Safe to call from several loader threads at once; only one of them reads.
+    
+    Args:
+        session: Database session
+        max_age (float): Oldest acceptable snapshot in seconds
+    
+    Returns:
+        DashboardSnapshot: Current KPIs
+    """
+    global _cached
+    bind = session.get_bind()
+    
+    with _lock:
+        if _cached is not None:
+            cached_bind, taken, snapshot = _cached
+            if (cached_bind is bind and time.monotonic() - taken < max_age
+                    and snapshot.taken_at.date() == datetime.now().date()):
+                return snapshot
+        
+        snapshot = read_snapshot(session)
+        _cached = (bind, time.monotonic(), snapshot)
+        return snapshot
+
+
+def invalidate():
+    """Drop the shared snapshot so the next caller reads a fresh one"""
+    global _cached
+    with _lock:
+        _cached = None
+
+
+def _note_flush(session, flush_context):
+    session.info['dashboard_stale'] = True
+
+
+def _after_commit(session):
+    if session.info.pop('dashboard_stale', False):
+        invalidate()
+
+
+def _after_rollback(session):
+    session.info.pop('dashboard_stale', None)
+
+
+def install(session_factory):
+    """
+    Drop the snapshot whenever a session of the factory commits changes
+    
+    Args:
+        session_factory: sessionmaker to attach the hooks to
+    """
+    event.listen(session_factory, 'after_flush', _note_flush)
+    event.listen(session_factory, 'after_commit', _after_commit)
+    event.listen(session_factory, 'after_rollback', _after_rollback)
@@ -6,14 +6,27 @@ Handles database connections, initialization, and session management
 """
 
 import os
+import time
+import shutil
 import logging
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, scoped_session
 from contextlib import contextmanager
 from .models import Base
+from .profiles import PERFORMANCE_PROFILES, get_active_profile, apply_pragmas
+from .migrate import upgrade, create_missing_indexes
+from . import rollup, dashboard, cache, catalog, changes, diagnostics, nplusone, history
+from .cache import query_cache
+from .changes import change_tracker, ALL_TABLES
+from .backup import backup_database, BackupError
+from .archive import ARCHIVE_SUFFIX, extract_archive
 
 logger = logging.getLogger(__name__)
 
+# Longest wait for open session scopes to finish before a restore gives up (seconds)
+QUIESCE_TIMEOUT = 10.0
+
 
 class DatabaseManager:
     """Database manager singleton"""
@@ -21,18 +34,25 @@ class DatabaseManager:
     _instance = None
     _engine = None
     _session_factory = None
+    _profile = None
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseManager, cls).__new__(cls)
+            # session_scope() callers are counted so a restore can wait them out
+            cls._instance._gate = threading.Condition()
+            cls._instance._active_scopes = 0
+            cls._instance._restoring = False
         return cls._instance
     
-    def initialize(self, db_url=None):
+    def initialize(self, db_url=None, profile=None, migrate=True):
         """
         Initialize the database connection
         
         Args:
             db_url (str): Database URL. Defaults to SQLite in current directory
+            profile (str): Performance profile name. Defaults to the saved choice
+            migrate (bool): Apply pending schema migrations
         """
         if db_url is None:
             # Default to SQLite database in current directory
@@ -48,15 +68,144 @@ class DatabaseManager:
             pool_pre_ping=True  # Verify connections before using
         )
         
-        # Create session factory
-        self._session_factory = scoped_session(
-            sessionmaker(bind=self._engine, expire_on_commit=False)
-        )
+        # Time every statement (see Settings → Diagnostics)
+        diagnostics.install(self._engine)
         
-        # Create all tables
-        Base.metadata.create_all(self._engine)
+        # Apply the performance profile to every new SQLite connection
+        if self._engine.dialect.name == 'sqlite':
+            self._profile = profile or get_active_profile()
+            event.listen(self._engine, 'connect', self._on_connect)
+            settings = ', '.join(f"{k}={v}" for k, v in PERFORMANCE_PROFILES[self._profile].items())
+            logger.info(f"Database performance profile: {self._profile} ({settings})")
+        
+        # Attach the per-year history files and their *_all views (after the
+        # PRAGMAs, so the live file is in WAL mode first)
+        if self.db_path is not None:
+            history.install(self._engine)
+        
+        # Create session factory; its sessions keep the report rollup, the
+        # dashboard snapshot, the query cache and the reference catalog current
+        session_factory = sessionmaker(bind=self._engine, expire_on_commit=False)
+        rollup.install(session_factory)
+        dashboard.install(session_factory)
+        cache.install(session_factory)
+        catalog.install(session_factory)
+        changes.install(session_factory)
+        nplusone.install(session_factory)
+        self._session_factory = scoped_session(session_factory)
+        query_cache.clear()
+        catalog.catalog.reset()
+        change_tracker.reset()
+        
+        # Bring the schema up to date (a single-row read when already current)
+        if migrate:
+            upgrade(self._engine)
         logger.info("Database initialized successfully")
     
+    def ensure_indexes(self):
+        """
+        Create any declared index missing from an existing database
+        
+        create_all() skips tables that already exist, so indexes added to the
+        models later would never reach older database files. Each index is
+        created in place; no table is rebuilt.
+        
+        Returns:
+            list: Names of the indexes that were created
+        """
+        if self._engine is None:
+            raise RuntimeError("Database not initialized. Call initialize() first.")
+        return create_missing_indexes(self._engine)
+    
+    def _on_connect(self, dbapi_connection, connection_record):
+        """Apply the active profile's PRAGMAs to a new connection"""
+        apply_pragmas(dbapi_connection, self._profile)
+    
+    @property
+    def engine(self):
+        """The SQLAlchemy engine"""
+        return self._engine
+    
+    @property
+    def profile(self):
+        """Name of the active performance profile"""
+        return self._profile
+    
+    @property
+    def db_path(self):
+        """
+        Filesystem path of the SQLite database file
+        
+        Returns:
+            str: Absolute path, or None for in-memory and non-SQLite databases
+        """
+        if self._engine is None or self._engine.dialect.name != 'sqlite':
+            return None
+        database = self._engine.url.database
+        if not database or database == ':memory:':
+            return None
+        return os.path.abspath(database)
+    
+    def set_profile(self, name):
+        """
+        Switch the performance profile at runtime
+        
+        Pooled connections are discarded so every connection opened from now
+        on gets the new PRAGMAs.
+        
+        Args:
+            name (str): Profile name
+        """
+        if name not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown database profile: {name}")
+        self._profile = name
+        if self._engine is not None:
+            self._engine.dispose()
+        logger.info(f"Database performance profile changed to: {name}")
+    
+    def checkpoint(self):
+        """
+        Fold the WAL file back into the main database file
+        
+        After this the main file alone is a complete copy of the data, which
+        file-level backups rely on.
+        """
+        if self._engine is None or self._engine.dialect.name != 'sqlite':
+            return
+        with self._engine.connect() as conn:
+            conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    
+    def backup(self, dest_path, progress=None):
+        """
+        Write a consistent, verified copy of the live database
+        
+        Uses the SQLite backup API, so the application keeps working while
+        the copy is made. The history files are copied next to it, into
+        dest_path + '-history'. Blocks until done; run it on a worker thread.
+        
+        Args:
+            dest_path (str): Backup file to write
+            progress (callable): progress(copied_pages, total_pages) after each step
+        
+        Returns:
+            str: dest_path
+        """
+        if self.db_path is None:
+            raise BackupError("Only file-based SQLite databases can be backed up")
+        # No batch is moved between the two copies
+        with history.job_lock:
+            backup_database(self.db_path, dest_path, progress)
+            history.backup_history(self.db_path, history.backup_history_dir(dest_path))
+        return dest_path
+    
+    def dispose(self):
+        """Close all pooled connections (e.g. before replacing the database file)"""
+        change_tracker.reset()
+        if self._session_factory:
+            self._session_factory.remove()
+        if self._engine is not None:
+            self._engine.dispose()
+    
     def get_session(self):
         """
         Get a database session
@@ -82,16 +231,113 @@ class DatabaseManager:
             with db_manager.session_scope() as session:
                 session.add(object)
         """
-        session = self.get_session()
+        # Wait out a restore in progress
+        with self._gate:
+            while self._restoring:
+                self._gate.wait()
+            self._active_scopes += 1
+        
         try:
-            yield session
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            logger.error(f"Database error: {e}")
-            raise
+            session = self.get_session()
+            try:
+                yield session
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Database error: {e}")
+                raise
+            finally:
+                session.close()
         finally:
-            session.close()
+            with self._gate:
+                self._active_scopes -= 1
+                self._gate.notify_all()
+    
+    @property
+    def restoring(self):
+        """True while restore() has the database closed"""
+        return self._restoring
+    
+    @contextmanager
+    def _quiesced(self, timeout=QUIESCE_TIMEOUT):
+        """Hold new session scopes back and wait for running ones to end"""
+        deadline = time.monotonic() + timeout
+        with self._gate:
+            self._restoring = True
+            try:
+                while self._active_scopes:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise BackupError("Database is still in use, try the restore again")
+                    self._gate.wait(remaining)
+            except BaseException:
+                self._restoring = False
+                self._gate.notify_all()
+                raise
+        
+        try:
+            yield
+        finally:
+            with self._gate:
+                self._restoring = False
+                self._gate.notify_all()
+    
+    def restore(self, backup_path, progress=None):
+        """
+        Replace the live database with a backup, without restarting
+        
+        The backup is first staged next to the database and verified (an
+        archive against its manifest checksum, a plain file with the backup
+        API and an integrity check), along with the history files it was
+        taken with. Then session scopes are drained, the pool is closed, the
+        staged file is renamed over the database, the current history files
+        are set aside for the staged ones (none if the backup has none),
+        pending migrations run and the manager is initialized again. Caches
+        start empty and the next change poll reports every table, so open
+        sections reload. Blocks until done; run it on a worker thread.
+        
+        Args:
+            backup_path (str): Backup file or archive
+            progress (callable): progress(copied_pages, total_pages) while staging a plain file
+        
+        Raises:
+            BackupError: If the backup is damaged or the database stays busy
+        """
+        db_path = self.db_path
+        if db_path is None:
+            raise BackupError("Only file-based SQLite databases can be restored")
+        db_url = self._engine.url.render_as_string(hide_password=False)
+        
+        staged = db_path + '.restore'
+        staged_history = history.backup_history_dir(staged)
+        try:
+            if backup_path.endswith(ARCHIVE_SUFFIX):
+                extract_archive(backup_path, staged, staged_history)
+            else:
+                backup_database(backup_path, staged, progress)
+                history.stage_history(history.backup_history_dir(backup_path), staged_history)
+            
+            started = time.perf_counter()
+            with history.job_lock, self._quiesced():
+                # Fold the WAL in first so dropping it loses nothing
+                self.checkpoint()
+                self.dispose()
+                for suffix in ('-wal', '-shm'):
+                    if os.path.exists(db_path + suffix):
+                        os.remove(db_path + suffix)
+                os.replace(staged, db_path)
+                history.replace_history(db_path, staged_history)
+                
+                self.initialize(db_url, profile=self._profile)
+                dashboard.invalidate()
+            
+            # Every table changed as far as the sections are concerned
+            change_tracker.record_commit(ALL_TABLES)
+            logger.info(f"Database restored from {backup_path} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        finally:
+            if os.path.exists(staged):
+                os.remove(staged)
+            shutil.rmtree(staged_history, ignore_errors=True)
     
     def create_tables(self):
         """Create all database tables"""
@@ -101,10 +347,22 @@ class DatabaseManager:
         logger.info("All tables created")
     
     def drop_tables(self):
-        """Drop all database tables (use with caution!)"""
+        """
+        Drop all database tables (use with caution!)
+        
+        The history files go too (moved aside, see history.replace_history):
+        new rows start again at id 1 and must not meet archived ones.
+        """
         if self._engine is None:
             raise RuntimeError("Database not initialized. Call initialize() first.")
-        Base.metadata.drop_all(self._engine)
+        if self.db_path is not None:
+            with history.job_lock:
+                # Close the connections that have the files attached
+                self.dispose()
+                history.replace_history(self.db_path, None)
+                Base.metadata.drop_all(self._engine)
+        else:
+            Base.metadata.drop_all(self._engine)
         logger.info("All tables dropped")
     
     def reset_database(self):
@@ -129,14 +387,15 @@ def get_session():
     return _db_manager.get_session()
 
 
-def initialize_database(db_url=None):
+def initialize_database(db_url=None, profile=None):
     """
     Initialize the database
     
     Args:
         db_url (str): Database URL. Defaults to SQLite in current directory
+        profile (str): Performance profile name. Defaults to the saved choice
     """
-    _db_manager.initialize(db_url)
+    _db_manager.initialize(db_url, profile)
 
 
 def get_db_manager():
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Query Diagnostics
+Per-statement timings, a slow-query log and query counts per UI action
+
+Every statement the engine runs is timed through the cursor execute
+events. Timings are kept per statement as a latency histogram; statements
+slower than the threshold are logged with their parameters and the
+EXPLAIN QUERY PLAN output. Work done inside action() (every background
+load of a section runs in one) is also added up per action, so a slow
+screen shows up as e.g. "ReportsSection.overview: 6 queries, 41 ms".
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Statements at least this slow are logged with their query plan (ms)
+SLOW_QUERY_MS = 100.0
+SLOW_QUERY_ENV_VAR = 'KAGAN_SLOW_QUERY_MS'
+
+# Upper bounds of the latency histogram buckets (ms); the last bucket is open
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Limits on what is kept in memory
+MAX_STATEMENTS = 500
+SLOW_LOG_SIZE = 100
+MAX_PARAMETERS_TEXT = 500
+
+# Statements beyond MAX_STATEMENTS are counted under this key
+OTHER_STATEMENTS = '(other)'
+
+
+def slow_query_threshold():
+    """
+    Get the slow-query threshold, which the environment variable overrides
+    
+    Returns:
+        float: Threshold in milliseconds
+    """
+    value = os.environ.get(SLOW_QUERY_ENV_VAR)
+    try:
+        return float(value) if value else SLOW_QUERY_MS
+    except ValueError:
+        logger.warning(f"Invalid {SLOW_QUERY_ENV_VAR}={value!r}, using {SLOW_QUERY_MS} ms")
+        return SLOW_QUERY_MS
+
+
+def _bucket(ms):
+    """Index of the histogram bucket for a duration"""
+    for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+        if ms <= bound:
+            return index
+    return len(HISTOGRAM_BOUNDS_MS)
+
+
+def _copy(entry):
+    """Copy of a statement entry that later updates do not change"""
+    return dict(entry, histogram=list(entry['histogram']))
+
+
+class _ActionRun:
+    """Queries of one run of a UI action"""
+    
+    __slots__ = ('name', 'queries', 'db_ms', 'lazy_loads')
+    
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.db_ms = 0.0
+        self.lazy_loads = {}  # (relationship, call site) -> count, see nplusone
+
+
+_current_action = ContextVar('kagan_current_action', default=None)
+
+# Called with each action run that finished without an error
+_action_end_hooks = []
+
+
+def current_action():
+    """The action run the calling code is part of, None outside action()"""
+    return _current_action.get()
+
+
+def on_action_end(callback):
+    """
+    Register a check to run when an action finishes
+    
+    Exceptions raised by the callback propagate out of action().
+    
+    Args:
+        callback (callable): callback(run)
+    """
+    if callback not in _action_end_hooks:
+        _action_end_hooks.append(callback)
+
+
+class QueryStats:
+    """
+    Thread-safe collector of statement timings and action totals
+    
+    Args:
+        slow_ms (float): Slow-query threshold in milliseconds
+    """
+    
+    def __init__(self, slow_ms=None):
+        self.slow_ms = slow_query_threshold() if slow_ms is None else slow_ms
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Forget everything collected so far"""
+        with self._lock:
+            self._statements = {}
+            self._actions = {}
+            self._slow = deque(maxlen=SLOW_LOG_SIZE)
+            self.started_at = datetime.now()
+    
+    def record_query(self, statement, ms):
+        """
+        Add one statement execution
+        
+        Args:
+            statement (str): SQL text
+            ms (float): Duration in milliseconds
+        """
+        with self._lock:
+            entry = self._statements.get(statement)
+            if entry is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    statement = OTHER_STATEMENTS
+                    entry = self._statements.get(statement)
+                if entry is None:
+                    entry = self._statements[statement] = {
+                        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                        'histogram': [0] * (len(HISTOGRAM_BOUNDS_MS) + 1),
+                    }
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['histogram'][_bucket(ms)] += 1
+    
+    def record_slow(self, statement, parameters, ms, plan):
+        """Add an entry to the slow-query log"""
+        action = _current_action.get()
+        with self._lock:
+            self._slow.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'ms': round(ms, 2),
+                'action': action.name if action is not None else None,
+                'statement': statement,
+                'parameters': parameters,
+                'plan': plan,
+            })
+    
+    def record_action(self, run, ms):
+        """
+        Add one finished run of a UI action
+        
+        Args:
+            run (_ActionRun): Queries of the run
+            ms (float): Wall time of the run in milliseconds
+        """
+        with self._lock:
+            entry = self._actions.setdefault(run.name, {
+                'runs': 0, 'queries': 0, 'db_ms': 0.0, 'max_queries': 0, 'max_db_ms': 0.0, 'wall_ms': 0.0,
+            })
+            entry['runs'] += 1
+            entry['queries'] += run.queries
+            entry['db_ms'] += run.db_ms
+            entry['wall_ms'] += ms
+            entry['max_queries'] = max(entry['max_queries'], run.queries)
+            entry['max_db_ms'] = max(entry['max_db_ms'], run.db_ms)
+    
+    def top_statements(self, limit=10):
+        """
+        Statements that took the most total time
+        
+        Returns:
+            list: (statement, stats dict) tuples, slowest first
+        """
+        with self._lock:
+            items = [(statement, _copy(entry)) for statement, entry in self._statements.items()]
+        items.sort(key=lambda item: item[1]['total_ms'], reverse=True)
+        return items[:limit]
+    
+    def top_actions(self, limit=10):
+        """
+        UI actions that spent the most time in the database
+        
+        Returns:
+            list: (action, stats dict) tuples, slowest first
+        """
+        with self._lock:
+            items = [(name, dict(entry)) for name, entry in self._actions.items()]
+        items.sort(key=lambda item: item[1]['db_ms'], reverse=True)
+        return items[:limit]
+    
+    def slow_queries(self):
+        """Slow-query log entries, newest last"""
+        with self._lock:
+            return list(self._slow)
+    
+    def snapshot(self):
+        """
+        Everything collected, as JSON-serializable data
+        
+        Returns:
+            dict: Collection period, histogram bounds, statements, actions and slow queries
+        """
+        with self._lock:
+            statements = {statement: _copy(entry) for statement, entry in self._statements.items()}
+            actions = {name: dict(entry) for name, entry in self._actions.items()}
+            slow = list(self._slow)
+            started_at = self.started_at
+        return {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'slow_query_ms': self.slow_ms,
+            'histogram_bounds_ms': list(HISTOGRAM_BOUNDS_MS),
+            'statements': statements,
+            'actions': actions,
+            'slow_queries': slow,
+        }
+    
+    def export_json(self, path):
+        """
+        Write snapshot() to a JSON file
+        
+        Args:
+            path (str): File to write
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+
+# Shared by every engine of the application
+query_stats = QueryStats()
+
+
+@contextmanager
+def action(name):
+    """
+    Attribute the queries run inside the block to a UI action
+    
+    Args:
+        name (str): Action name, e.g. 'ReportsSection.overview'
+    """
+    run = _ActionRun(name)
+    token = _current_action.set(run)
+    started = time.perf_counter()
+    try:
+        yield run
+    finally:
+        _current_action.reset(token)
+        ms = (time.perf_counter() - started) * 1000
+        query_stats.record_action(run, ms)
+        logger.debug(f"{name}: {run.queries} queries, {run.db_ms:.0f} ms")
+    
+    for hook in _action_end_hooks:
+        hook(run)
+
+
+def _describe_parameters(parameters, executemany):
+    """Short text form of statement parameters; batches show only their first row"""
+    if executemany and parameters:
+        text = f"{len(parameters)} rows, first {parameters[0]!r}"
+    else:
+        text = repr(parameters)
+    return text if len(text) <= MAX_PARAMETERS_TEXT else text[:MAX_PARAMETERS_TEXT] + '...'
+
+
+def _explain(cursor, statement, parameters):
+    """EXPLAIN QUERY PLAN of a statement on the connection that ran it"""
+    explain = cursor.connection.cursor()
+    try:
+        explain.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in explain.fetchall()]
+    except Exception as e:
+        return [f"(no plan: {e})"]
+    finally:
+        explain.close()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._kagan_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_kagan_started', None)
+    if started is None:
+        return
+    ms = (time.perf_counter() - started) * 1000
+    query_stats.record_query(statement, ms)
+    
+    run = _current_action.get()
+    if run is not None:
+        run.queries += 1
+        run.db_ms += ms
+    
+    if ms >= query_stats.slow_ms:
+        plan = None
+        if conn.dialect.name == 'sqlite' and not executemany:
+            plan = _explain(cursor, statement, parameters)
+        described = _describe_parameters(parameters, executemany)
+        query_stats.record_slow(statement, described, ms, plan)
+        logger.warning(
+            f"Slow query ({ms:.0f} ms): {statement} | parameters: {described}"
+            + (f" | plan: {'; '.join(plan)}" if plan else "")
+        )
+
+
+def install(engine):
+    """
+    Time every statement an engine runs
+    
+    Args:
+        engine: SQLAlchemy engine
+    """
+    event.listen(engine, 'before_cursor_execute', _before_execute)
+    event.listen(engine, 'after_cursor_execute', _after_execute)
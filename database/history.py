@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+History Files
+Closed rows older than a horizon, moved out of the live database by year
+
+Paid orders, completed gaming sessions, paid invoices and sent SMS
+messages are only read by the day-to-day screens for a few weeks, but they
+would otherwise stay in kagan_db.sqlite forever. The archival job moves
+them, with their items, into one SQLite file per year under history/ next
+to the database (kagan_db_2024.sqlite, ...). Rows keep their ids; the
+archived tables are AUTOINCREMENT, so new rows never reuse an archived
+row's id, even when the newest rows were archived or deleted.
+
+Every connection of DatabaseManager attaches the history files and gets
+temporary views that read the live and archived rows as one table:
+    orders_all, order_items_all, gaming_sessions_all,
+    invoices_all, invoice_items_all, sms_messages_all
+The daily rollup reads through them, so report totals of archived days
+survive a rebuild. Archived invoices drop out of the search index.
+
+The history files belong to the database: backups and archives copy them
+along with it and a restore puts back the set the backup was taken with,
+setting the current files aside.
+
+Run the job, or list the history files:
+    python -m database.history run [--older-than 180] [--vacuum]
+    python -m database.history status
+"""
+
+import os
+import re
+import sys
+import shutil
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import (
+    MetaData, Table, Column, Index, create_engine, event, inspect, select, distinct, func, text, bindparam
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from .models import Base
+from .backup import backup_database
+from .profiles import load_settings, save_settings
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR_NAME = 'history'
+
+# Archived tables: (date column deciding the year, statuses of closed rows,
+# (item table, its key to the row) or None)
+ARCHIVED = {
+    'orders': ('created_at', ('paid',), ('order_items', 'order_id')),
+    'gaming_sessions': ('start_time', ('completed',), None),
+    'invoices': ('invoice_date', ('paid',), ('invoice_items', 'invoice_id')),
+    'sms_messages': ('created_at', ('sent', 'delivered', 'failed'), None),
+}
+
+# Every table with rows in the history files, items included
+HISTORY_TABLES = tuple(
+    name
+    for table, (_date, _statuses, items) in ARCHIVED.items()
+    for name in ((table, items[0]) if items else (table,))
+)
+
+VIEW_SUFFIX = '_all'
+SCHEMA_PREFIX = 'history_'
+
+# Rows older than this many days are archived unless the settings say otherwise
+DEFAULT_HORIZON_DAYS = 180
+
+# Rows moved per transaction; short transactions keep the cashiers writing
+BATCH_SIZE = 500
+
+# SQLite's default limit on attached databases
+DEFAULT_ATTACH_LIMIT = 10
+
+# Connection info key: years attached to the connection
+ATTACHED_KEY = 'history_years'
+
+# Plain backups keep their history files in a directory next to them
+BACKUP_SUFFIX = '-history'
+
+# Held while rows move and while the files are backed up or replaced, so a
+# backup never catches a batch half moved between the database and its history
+job_lock = threading.Lock()
+
+_FILE_YEAR = re.compile(r'_(\d{4})\.sqlite$')
+
+
+class HistoryError(Exception):
+    """Raised when rows cannot be archived without overwriting archived ones"""
+
+
+def _copy_table(table, metadata):
+    """Copy of a table with its columns and plain indexes, without constraints to other tables"""
+    copy = Table(table.name, metadata, *[
+        Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns
+    ])
+    for index in table.indexes:
+        # Partial indexes cover live rows (e.g. active orders) a history file never holds
+        if index.dialect_options['sqlite']['where'] is None:
+            Index(index.name, *[copy.c[column.name] for column in index.columns])
+    return copy
+
+
+# Schema of a history file
+_history_metadata = MetaData()
+for _name in HISTORY_TABLES:
+    _copy_table(Base.metadata.tables[_name], _history_metadata)
+
+# The views, for queries built with with_history()
+_view_metadata = MetaData()
+_views = {
+    name: Table(name + VIEW_SUFFIX, _view_metadata, *[
+        Column(column.name, column.type) for column in Base.metadata.tables[name].columns
+    ])
+    for name in HISTORY_TABLES
+}
+
+
+def get_horizon_days():
+    """
+    Get the saved archival horizon
+    
+    Returns:
+        int: Closed rows older than this many days are archived
+    """
+    days = load_settings().get('history_horizon_days', DEFAULT_HORIZON_DAYS)
+    return days if isinstance(days, int) and days > 0 else DEFAULT_HORIZON_DAYS
+
+
+def set_horizon_days(days):
+    """
+    Persist the archival horizon
+    
+    Args:
+        days (int): Age in days after which closed rows are archived
+    
+    Raises:
+        ValueError: If days is not a positive number
+    """
+    if not isinstance(days, int) or days <= 0:
+        raise ValueError(f"Invalid archival horizon: {days!r}")
+    
+    settings = load_settings()
+    settings['history_horizon_days'] = days
+    save_settings(settings)
+
+
+def default_history_dir(db_path):
+    """History directory used for a database file: history/ next to it"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), HISTORY_DIR_NAME)
+
+
+def history_path(db_path, year):
+    """Path of the history file of one year"""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(default_history_dir(db_path), f"{stem}_{year}.sqlite")
+
+
+def list_history_files(db_path):
+    """
+    Find the history files of a database
+    
+    Returns:
+        list: (year, path) tuples, oldest year first
+    """
+    directory = default_history_dir(db_path)
+    if not os.path.isdir(directory):
+        return []
+    
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    files = []
+    for name in os.listdir(directory):
+        match = _FILE_YEAR.search(name)
+        if match and name[:match.start()] == stem:
+            files.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(files)
+
+
+def schema_name(year):
+    """Name a history file is attached under"""
+    return f"{SCHEMA_PREFIX}{year}"
+
+
+def prepare_history_file(path):
+    """
+    Create a history file, or add the columns the live tables gained since it was made
+    
+    Args:
+        path (str): History file
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        with engine.begin() as conn:
+            _history_metadata.create_all(conn)
+            inspector = inspect(conn)
+            for table in _history_metadata.sorted_tables:
+                present = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in present:
+                        conn.execute(text(
+                            f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                        ))
+        # Readers of the views never block the archival job
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    finally:
+        engine.dispose()
+
+
+def create_views(cursor, years):
+    """
+    (Re)create the temporary *_all views of a connection
+    
+    Columns a history file lacks read as NULL, so files written before a
+    schema change still line up with the live tables.
+    
+    Args:
+        cursor: sqlite3 cursor
+        years (list): Years attached to the connection
+    """
+    for name in HISTORY_TABLES:
+        columns = [column.name for column in Base.metadata.tables[name].columns]
+        parts = [f"SELECT {', '.join(columns)} FROM main.{name}"]
+        for year in years:
+            schema = schema_name(year)
+            present = {row[1] for row in cursor.execute(f"PRAGMA {schema}.table_info({name})")}
+            if not present:
+                continue
+            select_list = ', '.join(c if c in present else f"NULL AS {c}" for c in columns)
+            parts.append(f"SELECT {select_list} FROM {schema}.{name}")
+        cursor.execute(f"DROP VIEW IF EXISTS temp.{name}{VIEW_SUFFIX}")
+        cursor.execute(f"CREATE TEMP VIEW {name}{VIEW_SUFFIX} AS {' UNION ALL '.join(parts)}")
+
+
+def attach_history(dbapi_connection, db_path):
+    """
+    Attach the history files of a database to a raw connection and create the views
+    
+    One attach slot is left free for the archival job to add a year; if
+    there are more files than slots, the oldest years are left out.
+    
+    Args:
+        dbapi_connection: sqlite3 connection, outside a transaction
+        db_path (str): Live database file
+    
+    Returns:
+        list: Years attached
+    """
+    files = list_history_files(db_path)
+    getlimit = getattr(dbapi_connection, 'getlimit', None)
+    limit = (getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if getlimit else DEFAULT_ATTACH_LIMIT) - 1
+    if len(files) > limit:
+        logger.warning(f"{len(files)} history files but only {limit} can be attached; "
+                       f"years before {files[-limit][0]} are left out of the reports")
+        files = files[-limit:]
+    
+    cursor = dbapi_connection.cursor()
+    try:
+        for year, path in files:
+            cursor.execute(f"ATTACH DATABASE ? AS {schema_name(year)}", (path,))
+        years = [year for year, _path in files]
+        create_views(cursor, years)
+    finally:
+        cursor.close()
+    return years
+
+
+def install(engine):
+    """
+    Attach the history files to every new connection of an engine
+    
+    Args:
+        engine: Engine of a file-based SQLite database
+    """
+    db_path = os.path.abspath(engine.url.database)
+    
+    def on_connect(dbapi_connection, connection_record):
+        connection_record.info[ATTACHED_KEY] = attach_history(dbapi_connection, db_path)
+    
+    event.listen(engine, 'connect', on_connect)
+
+
+def attached_years(bind):
+    """
+    Years whose history files are attached to a connection
+    
+    Args:
+        bind: Session or Connection
+    
+    Returns:
+        list: Years, empty for connections without history
+    """
+    connection = bind.connection() if isinstance(bind, Session) else bind
+    return connection.info.get(ATTACHED_KEY) or []
+
+
+def with_history(bind, model):
+    """
+    Entity reading a model's live and archived rows together
+    
+    Args:
+        bind: Session or Connection the query will run on
+        model: Mapped class of an archived table
+    
+    Returns:
+        The model itself when no history is attached, else an alias of it over its *_all view
+    """
+    if not attached_years(bind):
+        return model
+    return aliased(model, _views[model.__tablename__], adapt_on_names=True)
+
+
+@contextmanager
+def _transaction(conn):
+    """BEGIN IMMEDIATE ... COMMIT on an autocommit connection"""
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.exec_driver_sql("ROLLBACK")
+        raise
+    conn.exec_driver_sql("COMMIT")
+
+
+def _ids_statement(sql):
+    return text(sql).bindparams(bindparam('ids', expanding=True))
+
+
+def _delete_copied(conn, schema, table, items, ids):
+    """
+    Delete the rows of a batch, and their items, whose copy in the history file is current
+    
+    Returns:
+        tuple: (rows deleted, item rows deleted)
+    """
+    # A row edited since the copy stays, to be copied again next run
+    guard = 'updated_at' if 'updated_at' in Base.metadata.tables[table].c else 'status'
+    deleted = conn.execute(_ids_statement(
+        f"DELETE FROM main.{table} WHERE id IN :ids AND EXISTS ("
+        f"SELECT 1 FROM {schema}.{table} AS copy "
+        f"WHERE copy.id = {table}.id AND copy.{guard} IS {table}.{guard})"
+    ), {'ids': ids}).rowcount
+    deleted_items = 0
+    if items:
+        item_table, key = items
+        deleted_items = conn.execute(_ids_statement(
+            f"DELETE FROM main.{item_table} WHERE {key} IN :ids AND NOT EXISTS ("
+            f"SELECT 1 FROM main.{table} AS parent WHERE parent.id = {item_table}.{key}) AND EXISTS ("
+            f"SELECT 1 FROM {schema}.{item_table} AS copy WHERE copy.id = {item_table}.id)"
+        ), {'ids': ids}).rowcount
+    return deleted, deleted_items
+
+
+def _move_batch(conn, schema, table, items, ids):
+    """
+    Move one batch of rows and their items into an attached history file
+    
+    In WAL mode SQLite commits each attached file separately, so one
+    transaction over both files could keep the delete and lose the copy
+    in a crash. The copy is committed first instead, and the delete then
+    removes only the rows whose copy is still current. Rows a crash left
+    copied but not deleted are deleted first on the next run, so the
+    copy is a plain INSERT: an id that is already archived is never
+    overwritten.
+    
+    Raises:
+        HistoryError: If a row of the batch has the id of an archived row
+    
+    Returns:
+        tuple: (rows moved, item rows moved)
+    """
+    with _transaction(conn):
+        recovered, recovered_items = _delete_copied(conn, schema, table, items, ids)
+    
+    columns = ', '.join(column.name for column in Base.metadata.tables[table].columns)
+    try:
+        with _transaction(conn):
+            conn.execute(_ids_statement(
+                f"INSERT INTO {schema}.{table} ({columns}) "
+                f"SELECT {columns} FROM main.{table} WHERE id IN :ids"
+            ), {'ids': ids})
+            if items:
+                item_table, key = items
+                item_columns = ', '.join(column.name for column in Base.metadata.tables[item_table].columns)
+                conn.execute(_ids_statement(
+                    f"INSERT INTO {schema}.{item_table} ({item_columns}) "
+                    f"SELECT {item_columns} FROM main.{item_table} WHERE {key} IN :ids"
+                ), {'ids': ids})
+    except IntegrityError as e:
+        raise HistoryError(
+            f"{table} rows {ids[0]}..{ids[-1]} reuse ids already archived in {schema}; "
+            f"nothing was moved, the archived rows are unchanged"
+        ) from e
+    
+    with _transaction(conn):
+        moved, moved_items = _delete_copied(conn, schema, table, items, ids)
+        # Rows edited since the copy stay live; drop their copies until the next run
+        conn.execute(_ids_statement(
+            f"DELETE FROM {schema}.{table} WHERE id IN :ids AND id IN (SELECT id FROM main.{table})"
+        ), {'ids': ids})
+        if items:
+            conn.execute(_ids_statement(
+                f"DELETE FROM {schema}.{item_table} WHERE {key} IN :ids "
+                f"AND {key} IN (SELECT id FROM main.{table})"
+            ), {'ids': ids})
+    return recovered + moved, recovered_items + moved_items
+
+
+def move_to_history(engine, before=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Move closed rows older than a date into the history files of their year
+    
+    Blocks until done; run it on a worker thread or from the command line.
+    Each batch takes two short write transactions, so the application can
+    keep working meanwhile. Running it again after an interruption is safe.
+    
+    Args:
+        engine: Engine of the live database (from DatabaseManager)
+        before (datetime): Rows dated before this are moved (default: the saved horizon)
+        batch_size (int): Rows per batch
+        progress (callable): progress(table, year, rows moved so far) after each batch
+    
+    Raises:
+        HistoryError: If live rows reuse the ids of archived ones
+    
+    Returns:
+        dict: Rows moved per table, items included
+    """
+    from .cache import query_cache
+    from .changes import change_tracker
+    
+    db_path = os.path.abspath(engine.url.database)
+    if before is None:
+        before = datetime.combine(datetime.now().date() - timedelta(days=get_horizon_days()), datetime.min.time())
+    
+    moved = dict.fromkeys(HISTORY_TABLES, 0)
+    new_files = False
+    with job_lock, engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        attached = conn.info.setdefault(ATTACHED_KEY, [])
+        try:
+            for table, (date_name, statuses, items) in ARCHIVED.items():
+                source = Base.metadata.tables[table]
+                date_column = source.c[date_name]
+                closed = source.c.status.in_(statuses)
+                
+                years = sorted(int(year) for (year,) in conn.execute(
+                    select(distinct(func.strftime('%Y', date_column))).where(closed, date_column < before)
+                ) if year)
+                for year in years:
+                    path = history_path(db_path, year)
+                    new_files |= not os.path.exists(path)
+                    prepare_history_file(path)
+                    if year not in attached:
+                        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema_name(year)}", (path,))
+                        attached.append(year)
+                    
+                    start = datetime(year, 1, 1)
+                    end = min(datetime(year + 1, 1, 1), before)
+                    after = 0
+                    while True:
+                        ids = list(conn.scalars(
+                            select(source.c.id)
+                            .where(closed, date_column >= start, date_column < end, source.c.id > after)
+                            .order_by(source.c.id)
+                            .limit(batch_size)
+                        ))
+                        if not ids:
+                            break
+                        after = ids[-1]
+                        rows, item_rows = _move_batch(conn, schema_name(year), table, items, ids)
+                        moved[table] += rows
+                        if items:
+                            moved[items[0]] += item_rows
+                        if progress:
+                            progress(table, year, moved[table])
+        finally:
+            # The connection's views no longer match its attachments
+            conn.invalidate()
+    
+    # Connections opened from now on attach the new files
+    if new_files:
+        engine.dispose()
+    
+    changed = [table for table, count in moved.items() if count]
+    if changed:
+        query_cache.invalidate(changed)
+        change_tracker.record_commit(changed)
+    logger.info(f"Moved to history (before {before:%Y-%m-%d}): "
+                + (', '.join(f"{table} {count}" for table, count in moved.items() if count) or "nothing"))
+    return moved
+
+
+def history_counts(db_path):
+    """
+    Count the rows of every history file
+    
+    Returns:
+        list: (year, path, {table: rows}) tuples, oldest year first
+    """
+    counts = []
+    for year, path in list_history_files(db_path):
+        conn = sqlite3.connect(path)
+        try:
+            tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            rows = {
+                name: conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                for name in HISTORY_TABLES if name in tables
+            }
+        finally:
+            conn.close()
+        counts.append((year, path, rows))
+    return counts
+
+
+def backup_history_dir(backup_path):
+    """Directory holding the history files of a plain backup file"""
+    return backup_path + BACKUP_SUFFIX
+
+
+def _history_files_in(directory):
+    """History files directly in a directory, whatever database they belong to"""
+    if directory is None or not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if _FILE_YEAR.search(name)
+    )
+
+
+def copy_history_files(paths, dest_dir):
+    """
+    Copy history files into a directory that ends up holding only them
+    
+    Each file is copied with the backup API and checked. The directory is
+    written next to dest_dir first and swapped in when complete; with no
+    files, dest_dir is removed.
+    
+    Args:
+        paths (list): History files to copy
+        dest_dir (str): Directory to write
+    
+    Returns:
+        list: Paths of the copies
+    """
+    temp_dir = dest_dir + '.part'
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    try:
+        if paths:
+            os.makedirs(temp_dir)
+            for path in paths:
+                backup_database(path, os.path.join(temp_dir, os.path.basename(path)))
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        if paths:
+            os.replace(temp_dir, dest_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return [os.path.join(dest_dir, os.path.basename(path)) for path in paths]
+
+
+def backup_history(db_path, dest_dir):
+    """
+    Copy the history files of a live database into a directory
+    
+    Args:
+        db_path (str): Live database file
+        dest_dir (str): Directory to write, replaced if it exists
+    
+    Returns:
+        list: Paths of the copies
+    """
+    return copy_history_files([path for _year, path in list_history_files(db_path)], dest_dir)
+
+
+def stage_history(backup_dir, dest_dir):
+    """
+    Copy the history files kept with a plain backup, ready for replace_history()
+    
+    Args:
+        backup_dir (str): History directory of the backup (may be missing)
+        dest_dir (str): Directory to write
+    
+    Returns:
+        list: Paths of the copies
+    """
+    return copy_history_files(_history_files_in(backup_dir), dest_dir)
+
+
+def replace_history(db_path, staged_dir):
+    """
+    Swap the history files of a database for a staged set
+    
+    The current files are moved into a replaced_<time> directory under
+    history/ rather than deleted. Staged files are renamed after the
+    database, so a backup restores under a different file name too. Call
+    it while no connection to the database is open.
+    
+    Args:
+        db_path (str): Live database file
+        staged_dir (str): Directory of staged history files (None or missing means none)
+    
+    Returns:
+        str: Directory the current files were moved to, None if there were none
+    """
+    directory = default_history_dir(db_path)
+    current = list_history_files(db_path)
+    aside = None
+    if current:
+        aside = os.path.join(directory, f"replaced_{datetime.now():%Y%m%d_%H%M%S_%f}")
+        os.makedirs(aside)
+        for _year, path in current:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.replace(path + suffix, os.path.join(aside, os.path.basename(path) + suffix))
+        logger.info(f"Previous history files moved to {aside}")
+    
+    for path in _history_files_in(staged_dir):
+        year = int(_FILE_YEAR.search(path).group(1))
+        os.makedirs(directory, exist_ok=True)
+        os.replace(path, history_path(db_path, year))
+    return aside
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Move old closed rows into per-year history files")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    run = subparsers.add_parser('run', help="Archive closed rows older than the horizon")
+    run.add_argument('--older-than', type=int, help="Horizon in days (defaults to the saved setting)")
+    run.add_argument('--save', action='store_true', help="Save --older-than as the new default")
+    run.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows per transaction")
+    run.add_argument('--vacuum', action='store_true', help="Shrink the live database file afterwards")
+    
+    status = subparsers.add_parser('status', help="List the history files and their row counts")
+    
+    for subparser in (run, status):
+        subparser.add_argument('--db-url', help="Database URL (defaults to kagan_db.sqlite)")
+    args = parser.parse_args(argv)
+    
+    from utils import setup_logging
+    from .db_manager import DatabaseManager
+    
+    setup_logging()
+    db_manager = DatabaseManager()
+    db_manager.initialize(args.db_url)
+    if db_manager.db_path is None:
+        print("✗ Only file-based SQLite databases have history files")
+        return 1
+    
+    if args.command == 'status':
+        files = history_counts(db_manager.db_path)
+        for year, path, rows in files:
+            print(f"{year}  {path}")
+            for table, count in rows.items():
+                print(f"      {table:<16} {count:>10}")
+        print(f"✓ {len(files)} history file(s), horizon {get_horizon_days()} days")
+        return 0
+    
+    if args.older_than is not None and args.save:
+        set_horizon_days(args.older_than)
+    days = args.older_than or get_horizon_days()
+    before = datetime.combine(datetime.now().date() - timedelta(days=days), datetime.min.time())
+    
+    def report(table, year, count):
+        print(f"  {table} {year}: {count} rows moved", end='\r')
+    
+    try:
+        moved = move_to_history(db_manager.engine, before, args.batch_size, report)
+    except HistoryError as e:
+        print(f"\n✗ {e}")
+        return 1
+    print(f"✓ Moved {sum(moved.values())} rows older than {before:%Y-%m-%d} to history")
+    
+    if args.vacuum:
+        db_manager.dispose()
+        with db_manager.engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        print("✓ Live database compacted")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
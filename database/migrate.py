@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Schema Migrations
+Versioned, ordered schema upgrades tracked in the schema_version table
+
+Run headless before opening the GUI to upgrade a large database:
+    python -m database.migrate [--db-url sqlite:///path/to/kagan_db.sqlite]
+"""
+
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, Integer, DateTime, inspect, select, insert, update, bindparam, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateTable
+from .models import Base
+from . import search
+
+logger = logging.getLogger(__name__)
+
+# Kept outside Base.metadata so create_all/drop_all never touch it
+_version_metadata = MetaData()
+
+schema_version = Table(
+    'schema_version',
+    _version_metadata,
+    Column('version', Integer, nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow),
+)
+
+
+def create_missing_indexes(bind):
+    """
+    Create any index declared in the models that the database lacks
+    
+    Args:
+        bind: Engine or Connection
+    
+    Returns:
+        list: Names of the indexes that were created
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            # Indexes on columns a later migration adds are created by that migration
+            if index.name not in existing and all(column.name in columns for column in index.columns):
+                index.create(bind)
+                created.append(index.name)
+    
+    if created:
+        logger.info(f"Created {len(created)} missing indexes: {', '.join(created)}")
+    return created
+
+
+# ---------------------------------------------------------------------------
+# Migration steps
+#
+# Each step receives a Connection inside the upgrade transaction. Steps are
+# never edited once released; schema changes get a new step appended here.
+# ---------------------------------------------------------------------------
+
+def _initial_schema(conn):
+    """Tables as they existed before versioned migrations"""
+    Base.metadata.create_all(conn)
+
+
+def _hot_path_indexes(conn):
+    """Filter and foreign key indexes for the list and report screens"""
+    create_missing_indexes(conn)
+
+
+def _pagination_indexes(conn):
+    """Sort index for name-ordered product pages"""
+    create_missing_indexes(conn)
+
+
+def _daily_rollup(conn):
+    """Daily report totals table, backfilled from existing data"""
+    from .rollup import rebuild
+    
+    Base.metadata.tables['daily_rollup'].create(conn, checkfirst=True)
+    rebuild(conn)
+
+
+def _search_index(conn):
+    """Full-text search table and triggers, filled from existing data"""
+    search.create_index(conn)
+    search.rebuild(conn)
+
+
+def _normalized_phones(conn):
+    """Canonical customer phone column for caller lookup, backfilled from existing rows"""
+    from .phones import normalize_phone
+    
+    customers = Base.metadata.tables['customers']
+    if 'phone_normalized' not in {column['name'] for column in inspect(conn).get_columns('customers')}:
+        conn.execute(text("ALTER TABLE customers ADD COLUMN phone_normalized VARCHAR(20)"))
+    
+    # updated_at is kept: the customers themselves did not change
+    rows = [
+        {'customer_id': customer_id, 'normalized': normalize_phone(phone)}
+        for customer_id, phone in conn.execute(select(customers.c.id, customers.c.phone))
+    ]
+    if rows:
+        conn.execute(
+            update(customers)
+            .where(customers.c.id == bindparam('customer_id'))
+            .values(phone_normalized=bindparam('normalized'), updated_at=customers.c.updated_at),
+            rows
+        )
+    create_missing_indexes(conn)
+
+
+def _archived_ids_autoincrement(conn):
+    """AUTOINCREMENT on the archived tables, counting ids already moved to the history files as used"""
+    from .history import HISTORY_TABLES, attached_years, schema_name
+    
+    # The temporary *_all views name the tables being rebuilt
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+    try:
+        for name in HISTORY_TABLES:
+            sql = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                              {'name': name})
+            if sql is None or 'AUTOINCREMENT' in sql.upper():
+                continue
+            
+            # SQLite cannot add AUTOINCREMENT to a table, so it is rebuilt
+            table = Base.metadata.tables[name]
+            present = {column['name'] for column in inspect(conn).get_columns(name)}
+            columns = ', '.join(column.name for column in table.columns if column.name in present)
+            create = str(CreateTable(table).compile(dialect=conn.dialect))
+            conn.execute(text(create.replace(f"CREATE TABLE {name} ", f"CREATE TABLE _rebuilt_{name} ", 1)))
+            conn.execute(text(f"INSERT INTO _rebuilt_{name} ({columns}) SELECT {columns} FROM {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+            conn.execute(text(f"ALTER TABLE _rebuilt_{name} RENAME TO {name}"))
+            
+            archived = [
+                conn.scalar(text(f"SELECT max(id) FROM {schema_name(year)}.{name}"))
+                for year in attached_years(conn)
+            ]
+            highest = max([id_ for id_ in archived if id_ is not None], default=None)
+            if highest is None:
+                continue
+            params = {'name': name, 'seq': highest}
+            current = conn.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), params)
+            if current is None:
+                conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), params)
+            elif current < highest:
+                conn.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name"), params)
+    finally:
+        conn.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+    
+    # Dropping the old tables dropped their indexes and search triggers
+    create_missing_indexes(conn)
+    search.create_index(conn)
+
+
+MIGRATIONS = [
+    (1, "Initial schema", _initial_schema),
+    (2, "Hot-path indexes", _hot_path_indexes),
+    (3, "Pagination indexes", _pagination_indexes),
+    (4, "Daily rollup", _daily_rollup),
+    (5, "Search index", _search_index),
+    (6, "Normalized customer phones", _normalized_phones),
+    (7, "Archived ids never reused", _archived_ids_autoincrement),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    """
+    Read the schema version of a database
+    
+    Args:
+        conn: Connection
+    
+    Returns:
+        int: Current version, 0 if the database was never versioned
+    """
+    try:
+        return conn.execute(select(schema_version.c.version)).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        conn.rollback()
+        return 0
+
+
+def _set_version(conn, version):
+    """Record the schema version (single-row table)"""
+    result = conn.execute(
+        update(schema_version).values(version=version, applied_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(schema_version).values(version=version, applied_at=datetime.utcnow()))
+
+
+def upgrade(engine, target=None):
+    """
+    Bring a database up to the target schema version
+    
+    When the stored version already matches, this costs a single-row read.
+    Otherwise all pending steps run in one transaction, so a failure leaves
+    the database at its previous version.
+    
+    Args:
+        engine: SQLAlchemy engine
+        target (int): Version to upgrade to. Defaults to the latest
+    
+    Returns:
+        list: Versions that were applied
+    """
+    target = LATEST_VERSION if target is None else target
+    
+    with engine.connect() as conn:
+        if get_version(conn) >= target:
+            return []
+    
+    # DDL must share the transaction, so take manual control of BEGIN/COMMIT
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if engine.dialect.name == 'sqlite' else "BEGIN")
+        
+        try:
+            _version_metadata.create_all(conn)
+            version = get_version(conn)
+            applied = []
+            
+            if version == 0:
+                existing_tables = set(inspect(conn).get_table_names())
+                if existing_tables & set(Base.metadata.tables):
+                    # Database created by create_all before migrations existed
+                    version = 1
+                    logger.info("Unversioned database found, treating it as version 1")
+                else:
+                    # Fresh database: build the current schema directly (the
+                    # search index comes with create_all, see database.search)
+                    Base.metadata.create_all(conn)
+                    _set_version(conn, target)
+                    conn.exec_driver_sql("COMMIT")
+                    logger.info(f"Created new database at schema version {target}")
+                    return [target]
+            
+            pending = [m for m in MIGRATIONS if version < m[0] <= target]
+            for i, (step_version, description, step) in enumerate(pending, start=1):
+                logger.info(f"Applying migration {i}/{len(pending)}: v{step_version} {description}")
+                started = time.perf_counter()
+                step(conn)
+                logger.info(f"Migration v{step_version} done in {time.perf_counter() - started:.2f}s")
+                applied.append(step_version)
+            
+            _set_version(conn, target)
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            logger.error("Migration failed, database left unchanged")
+            raise
+    
+    logger.info(f"Database upgraded to schema version {target}")
+    return applied
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Upgrade the Kagan database schema")
+    parser.add_argument('--db-url', help="Database URL (defaults to kagan_db.sqlite)")
+    parser.add_argument('--status', action='store_true', help="Only print the current schema version")
+    args = parser.parse_args(argv)
+    
+    from utils import setup_logging
+    from .db_manager import DatabaseManager
+    
+    setup_logging()
+    db_manager = DatabaseManager()
+    
+    if args.status:
+        db_manager.initialize(args.db_url, migrate=False)
+        with db_manager.engine.connect() as conn:
+            print(f"Schema version: {get_version(conn)} (latest: {LATEST_VERSION})")
+        return 0
+    
+    db_manager.initialize(args.db_url)
+    print(f"✓ Database is at schema version {LATEST_VERSION}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,13 +6,19 @@ SQLAlchemy ORM models for all entities
 """
 
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Index, bindparam, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 import enum
+from .phones import normalize_phone
 
 Base = declarative_base()
 
+# Order statuses in workflow order, and those shown on the cafe "active orders" screen
+ORDER_STATUSES = ('pending', 'preparing', 'ready', 'delivered', 'paid')
+ACTIVE_ORDER_STATUSES = ('pending', 'preparing', 'ready')
+
 
 class UserRole(enum.Enum):
     """User roles enumeration"""
@@ -40,6 +46,11 @@ class User(Base):
         return f"<User(username='{self.username}', role='{self.role.value}')>"
 
 
+def _phone_default(context):
+    """Column default: normalized phone of a row inserted without one (Core inserts)"""
+    return normalize_phone(context.get_current_parameters().get('phone'))
+
+
 class Customer(Base):
     """Customer model"""
     __tablename__ = 'customers'
@@ -47,6 +58,7 @@ class Customer(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     phone = Column(String(20), nullable=False)
+    phone_normalized = Column(String(20), default=_phone_default)  # see database.phones
     email = Column(String(100))
     address = Column(Text)
     loyalty_points = Column(Integer, default=0)
@@ -54,12 +66,24 @@ class Customer(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_customers_phone', 'phone'),
+        Index('ix_customers_phone_normalized', 'phone_normalized'),
+        Index('ix_customers_created_at', 'created_at'),
+    )
+    
     # Relationships
     appointments = relationship("Appointment", back_populates="customer")
     orders = relationship("Order", back_populates="customer")
     invoices = relationship("Invoice", back_populates="customer")
     gaming_sessions = relationship("GamingSession", back_populates="customer")
     
+    @validates('phone')
+    def _normalize_phone(self, key, phone):
+        """Keep phone_normalized in step with phone on ORM writes"""
+        self.phone_normalized = normalize_phone(phone)
+        return phone
+    
     def __repr__(self):
         return f"<Customer(name='{self.name}', phone='{self.phone}')>"
 
@@ -81,6 +105,10 @@ class Employee(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_employees_user_id', 'user_id'),
+    )
+    
     # Relationships
     user = relationship("User")
     appointments = relationship("Appointment", back_populates="stylist")
@@ -102,6 +130,10 @@ class Service(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_services_active_name', 'name', sqlite_where=text('is_active = 1')),
+    )
+    
     # Relationships
     appointments = relationship("Appointment", back_populates="service")
     
@@ -123,6 +155,13 @@ class Appointment(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_appointments_appointment_date', 'appointment_date'),
+        Index('ix_appointments_customer_id', 'customer_id'),
+        Index('ix_appointments_service_id', 'service_id'),
+        Index('ix_appointments_stylist_id', 'stylist_id'),
+    )
+    
     # Relationships
     customer = relationship("Customer", back_populates="appointments")
     service = relationship("Service", back_populates="appointments")
@@ -149,6 +188,12 @@ class Product(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_products_active_category', 'category', 'name', sqlite_where=text('is_active = 1')),
+        Index('ix_products_active_name', 'name', sqlite_where=text('is_active = 1')),
+        Index('ix_products_active_stock', 'stock_quantity', 'min_stock_level', sqlite_where=text('is_active = 1')),
+    )
+    
     # Relationships
     order_items = relationship("OrderItem", back_populates="product")
     invoice_items = relationship("InvoiceItem", back_populates="product")
@@ -170,10 +215,38 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_orders_created_at', 'created_at'),
+        Index('ix_orders_status_created_at', 'status', 'created_at'),
+        Index('ix_orders_customer_id', 'customer_id'),
+        Index(
+            'ix_orders_active',
+            'created_at',
+            sqlite_where=text("status IN ('pending', 'preparing', 'ready')")
+        ),
+        # Ids of rows moved to the history files are never handed out again (see database.history)
+        {'sqlite_autoincrement': True},
+    )
+    
     # Relationships
     customer = relationship("Customer", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     
+    @classmethod
+    def active_filter(cls):
+        """
+        Filter clause for active (not yet delivered) orders
+        
+        The statuses are rendered inline rather than as bound parameters so
+        SQLite can match the clause against the partial ix_orders_active index.
+        
+        Returns:
+            ColumnElement: SQL expression usable in query.filter()
+        """
+        return cls.status.in_(
+            bindparam('active_statuses', ACTIVE_ORDER_STATUSES, expanding=True, literal_execute=True)
+        )
+    
     def __repr__(self):
         return f"<Order(id={self.id}, total={self.total_amount})>"
 
@@ -189,6 +262,12 @@ class OrderItem(Base):
     price = Column(Float, nullable=False)
     subtotal = Column(Float, nullable=False)
     
+    __table_args__ = (
+        Index('ix_order_items_order_id', 'order_id'),
+        Index('ix_order_items_product_id', 'product_id'),
+        {'sqlite_autoincrement': True},  # see Order
+    )
+    
     # Relationships
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
@@ -214,6 +293,13 @@ class GamingSession(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_gaming_sessions_status', 'status'),
+        Index('ix_gaming_sessions_start_time', 'start_time'),
+        Index('ix_gaming_sessions_customer_id', 'customer_id'),
+        {'sqlite_autoincrement': True},  # see Order
+    )
+    
     # Relationships
     customer = relationship("Customer", back_populates="gaming_sessions")
     
@@ -242,6 +328,12 @@ class Invoice(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_invoices_invoice_date', 'invoice_date'),
+        Index('ix_invoices_customer_id', 'customer_id'),
+        {'sqlite_autoincrement': True},  # see Order
+    )
+    
     # Relationships
     customer = relationship("Customer", back_populates="invoices")
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
@@ -262,6 +354,12 @@ class InvoiceItem(Base):
     price = Column(Float, nullable=False)
     subtotal = Column(Float, nullable=False)
     
+    __table_args__ = (
+        Index('ix_invoice_items_invoice_id', 'invoice_id'),
+        Index('ix_invoice_items_product_id', 'product_id'),
+        {'sqlite_autoincrement': True},  # see Order
+    )
+    
     # Relationships
     invoice = relationship("Invoice", back_populates="items")
     product = relationship("Product", back_populates="invoice_items")
@@ -308,6 +406,11 @@ class Expense(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_expenses_expense_date', 'expense_date'),
+        Index('ix_expenses_supplier_id', 'supplier_id'),
+    )
+    
     # Relationships
     supplier = relationship("Supplier", back_populates="expenses")
     
@@ -351,5 +454,35 @@ class SmsMessage(Base):
     error_message = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_sms_messages_created_at', 'created_at'),
+        Index('ix_sms_messages_status', 'status'),
+        {'sqlite_autoincrement': True},  # see Order
+    )
+    
     def __repr__(self):
         return f"<SmsMessage(recipient='{self.recipient}', status='{self.status}')>"
+
+
+class DailyRollup(Base):
+    """
+    Daily totals per business unit for the report screens
+    
+    Derived data: maintained by database.rollup whenever orders, invoices,
+    expenses or appointments change, and rebuildable from them at any time.
+    """
+    __tablename__ = 'daily_rollup'
+    
+    day = Column(Date, primary_key=True)
+    unit = Column(String(20), primary_key=True)  # cafe, salon, general
+    order_count = Column(Integer, default=0, nullable=False)
+    order_total = Column(Float, default=0.0, nullable=False)  # all statuses
+    paid_order_count = Column(Integer, default=0, nullable=False)
+    paid_revenue = Column(Float, default=0.0, nullable=False)
+    invoice_revenue = Column(Float, default=0.0, nullable=False)
+    expenses = Column(Float, default=0.0, nullable=False)
+    appointment_count = Column(Integer, default=0, nullable=False)
+    completed_appointments = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<DailyRollup(day='{self.day}', unit='{self.unit}')>"
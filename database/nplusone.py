@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+N+1 Query Detector
+Reports relationships lazy-loaded over and over within one UI action
+
+A loop over ORM objects that touches a lazy relationship (.customer,
+.items, .service, .stylist, ...) runs one query per object. When enabled,
+every lazy load inside diagnostics.action() is counted per relationship
+and call site; repeats are logged when the action ends, and an action
+over the lazy-load budget raises LazyLoadBudgetError. Off by default:
+    
+    KAGAN_N1_DETECT=1 python main.py
+    KAGAN_N1_MAX_LAZY_LOADS=10 python test_app.py
+"""
+
+import os
+import sys
+import logging
+import threading
+from sqlalchemy import event
+from . import diagnostics
+
+logger = logging.getLogger(__name__)
+
+DETECT_ENV_VAR = 'KAGAN_N1_DETECT'
+BUDGET_ENV_VAR = 'KAGAN_N1_MAX_LAZY_LOADS'
+
+# Lazy loads of one relationship from one call site that count as N+1
+REPEAT_THRESHOLD = 3
+
+_SQLALCHEMY_DIR = os.sep + 'sqlalchemy' + os.sep
+
+_lock = threading.Lock()
+_findings = []
+_violations = []
+
+
+class LazyLoadBudgetError(AssertionError):
+    """Raised when a UI action lazy-loads more than the budget allows"""
+
+
+def max_lazy_loads():
+    """
+    Get the lazy-load budget per action
+    
+    Returns:
+        int: Budget, None if unlimited
+    """
+    value = os.environ.get(BUDGET_ENV_VAR)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Invalid {BUDGET_ENV_VAR}={value!r}, no lazy-load budget applied")
+        return None
+
+
+def enabled():
+    """True if the detector was switched on through the environment"""
+    return os.environ.get(DETECT_ENV_VAR, '') not in ('', '0') or max_lazy_loads() is not None
+
+
+def _call_site():
+    """First frame outside SQLAlchemy and this module, as 'file:line (function)'"""
+    frame = sys._getframe(2)
+    while frame is not None and (
+        _SQLALCHEMY_DIR in frame.f_code.co_filename or frame.f_code.co_filename == __file__
+    ):
+        frame = frame.f_back
+    if frame is None:
+        return '(unknown)'
+    path = os.path.relpath(frame.f_code.co_filename)
+    return f"{path}:{frame.f_lineno} ({frame.f_code.co_name})"
+
+
+def _note_lazy_load(orm_execute_state):
+    """do_orm_execute: count a lazy relationship load against the current action"""
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+        return
+    run = diagnostics.current_action()
+    if run is None:
+        return
+    key = (str(orm_execute_state.loader_strategy_path.prop), _call_site())
+    run.lazy_loads[key] = run.lazy_loads.get(key, 0) + 1
+
+
+def _check_action(run):
+    """Report repeated lazy loads of a finished action and enforce the budget"""
+    if not run.lazy_loads:
+        return
+    
+    for (relationship, site), count in run.lazy_loads.items():
+        if count >= REPEAT_THRESHOLD:
+            finding = {'action': run.name, 'relationship': relationship, 'call_site': site, 'count': count}
+            with _lock:
+                _findings.append(finding)
+            logger.warning(f"N+1 in {run.name}: {relationship} lazy-loaded {count} times at {site}")
+    
+    total = sum(run.lazy_loads.values())
+    budget = max_lazy_loads()
+    if budget is not None and total > budget:
+        message = f"{run.name} lazy-loaded {total} times (budget {budget})"
+        with _lock:
+            _violations.append(message)
+        raise LazyLoadBudgetError(message)
+
+
+def findings():
+    """
+    Repeated lazy loads seen so far
+    
+    Returns:
+        list: Dicts with action, relationship, call_site and count
+    """
+    with _lock:
+        return list(_findings)
+
+
+def violations():
+    """
+    Actions that went over the lazy-load budget
+    
+    Returns:
+        list: Messages
+    """
+    with _lock:
+        return list(_violations)
+
+
+def clear():
+    """Forget findings and violations"""
+    with _lock:
+        _findings.clear()
+        _violations.clear()
+
+
+def install(session_factory):
+    """
+    Watch the lazy loads of sessions from a factory, if enabled
+    
+    Args:
+        session_factory: sessionmaker to attach the hook to
+    """
+    if not enabled():
+        return
+    event.listen(session_factory, 'do_orm_execute', _note_lazy_load)
+    diagnostics.on_action_end(_check_action)
+    logger.info("N+1 query detector enabled")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Keyset Pagination
+Seek-based paging over (sort value, id) so every page costs the same
+"""
+
+from collections import namedtuple
+from sqlalchemy import tuple_
+from .cache import query_cache
+
+# Rows fetched per page by the list screens
+PAGE_SIZE = 50
+
+# items: rows of this page
+# cursor: sort key of the last row, passed back to fetch the next page
+# has_more: whether another page exists
+Page = namedtuple('Page', ['items', 'cursor', 'has_more'])
+
+
+def keyset_page(query, sort_columns, cursor=None, limit=PAGE_SIZE, descending=False):
+    """
+    Fetch one page of a query ordered by sort_columns
+    
+    Instead of OFFSET, the next page starts after the cursor, i.e.
+    WHERE (created_at, id) < (:last_created_at, :last_id). With an index
+    on the sort columns this is an index seek, so page 1,000 is as fast as
+    page 1. The last sort column must be unique (normally the primary key).
+    
+    Args:
+        query: ORM query with filters applied and no ORDER BY/LIMIT
+        sort_columns (tuple): Columns to order by, e.g. (Order.created_at, Order.id)
+        cursor (tuple): Cursor of the previous page, None for the first page
+        limit (int): Page size
+        descending (bool): Sort newest/largest first
+    
+    Returns:
+        Page: The requested page
+    """
+    if cursor is not None:
+        key = tuple_(*sort_columns)
+        bound = tuple_(*cursor)
+        query = query.filter(key < bound if descending else key > bound)
+    
+    order_by = [column.desc() if descending else column.asc() for column in sort_columns]
+    
+    # One extra row tells whether another page exists
+    rows = query_cache.fetch_query(query.order_by(*order_by).limit(limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    if rows:
+        cursor = tuple(getattr(rows[-1], column.key) for column in sort_columns)
+    
+    return Page(rows, cursor, has_more)
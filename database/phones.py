@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Phone Numbers
+Canonical E.164-style phone numbers and a prefix index over them
+
+"0912 123 4567", "+98 912-123-4567", "00989121234567", "9121234567" and
+the same digits typed in Persian all normalize to "+989121234567", which
+is what customers.phone_normalized stores and what lookups compare.
+Partial input normalizes the same way, so "۰۹۱۲" is the prefix "+98912"
+while a caller ID is being typed. Bare digits without a 0, 00 or +
+prefix only count as a number when they start with 9 (a mobile number
+without its 0); anything else is kept as typed and never validates.
+"""
+
+import re
+from bisect import bisect_left, insort
+
+COUNTRY_CODE = '+98'
+
+# Persian and Arabic-Indic digits to ASCII
+_DIGITS = str.maketrans(
+    {chr(0x06f0 + digit): str(digit) for digit in range(10)}
+    | {chr(0x0660 + digit): str(digit) for digit in range(10)}
+)
+
+_NON_DIGITS = re.compile(r'[^0-9]')
+
+# Two-digit area codes of the provinces (Tehran 21, Isfahan 31, ...)
+AREA_CODES = (
+    '11', '13', '17', '21', '23', '24', '25', '26', '28', '31', '34', '35', '38', '41', '44', '45',
+    '51', '54', '56', '58', '61', '66', '71', '74', '76', '77', '81', '83', '84', '86', '87',
+)
+
+# A complete Iranian number: a 9xx mobile number, or an area code and eight digits
+_VALID = re.compile(rf"^\+98(9\d{{9}}|({'|'.join(AREA_CODES)})\d{{8}})$")
+
+
+def normalize_phone(phone):
+    """
+    Canonical form of a phone number, or of the start of one
+    
+    Args:
+        phone (str): Number as typed, in any digits and separators
+    
+    Returns:
+        str: '+98...' form, the bare digits if they have no known prefix,
+            None if there are no digits
+    """
+    if not phone:
+        return None
+    text = phone.translate(_DIGITS).strip()
+    digits = _NON_DIGITS.sub('', text)
+    
+    if text.startswith('+'):
+        return '+' + digits
+    if not digits:
+        return None
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    if digits.startswith('0'):
+        return COUNTRY_CODE + digits[1:]
+    if len(digits) == 12 and digits.startswith(COUNTRY_CODE[1:]):
+        return '+' + digits
+    if digits.startswith('9'):
+        return COUNTRY_CODE + digits
+    return digits
+
+
+def is_valid_phone(phone):
+    """
+    True if a number is a complete Iranian mobile or landline number
+    
+    Args:
+        phone (str): Number as typed
+    """
+    normalized = normalize_phone(phone)
+    return bool(normalized and _VALID.match(normalized))
+
+
+class PhoneIndex:
+    """
+    Sorted (phone, id) pairs answering exact and prefix lookups with bisect
+    
+    Args:
+        entries (iterable): (normalized phone, id) pairs; empty phones are skipped
+    """
+    
+    def __init__(self, entries=()):
+        self._keys = sorted((phone, row_id) for phone, row_id in entries if phone)
+    
+    def __len__(self):
+        return len(self._keys)
+    
+    def add(self, phone, row_id):
+        """Add an entry"""
+        if phone:
+            insort(self._keys, (phone, row_id))
+    
+    def discard(self, phone, row_id):
+        """Remove an entry if present"""
+        index = bisect_left(self._keys, (phone, row_id))
+        if index < len(self._keys) and self._keys[index] == (phone, row_id):
+            del self._keys[index]
+    
+    def prefix(self, prefix, limit=None):
+        """
+        Ids of the entries whose phone starts with a normalized prefix
+        
+        Args:
+            prefix (str): Normalized prefix
+            limit (int): Most ids returned (default: all)
+        
+        Returns:
+            list: Ids, ordered by phone
+        """
+        ids = []
+        if not prefix:
+            return ids
+        for index in range(bisect_left(self._keys, (prefix,)), len(self._keys)):
+            phone, row_id = self._keys[index]
+            if not phone.startswith(prefix) or (limit is not None and len(ids) >= limit):
+                break
+            ids.append(row_id)
+        return ids
+    
+    def exact(self, phone):
+        """
+        Ids of the entries with exactly this normalized phone
+        
+        Returns:
+            list: Ids
+        """
+        ids = []
+        if not phone:
+            return ids
+        for index in range(bisect_left(self._keys, (phone,)), len(self._keys)):
+            key, row_id = self._keys[index]
+            if key != phone:
+                break
+            ids.append(row_id)
+        return ids
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Database Performance Profiles
+Named sets of SQLite connection PRAGMAs and the persisted profile choice
+"""
+
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Settings file stored next to the default database file
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'kagan_settings.json')
+
+# Environment variable that overrides the saved profile (e.g. for import scripts)
+PROFILE_ENV_VAR = 'KAGAN_DB_PROFILE'
+
+DEFAULT_PROFILE = 'pos-terminal'
+
+# PRAGMAs applied to every new SQLite connection, in order.
+# cache_size is negative to mean KiB instead of pages.
+PERFORMANCE_PROFILES = {
+    # Cashier machines: short transactions, readers never block the writer
+    'pos-terminal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # Reporting machines: larger cache and mmap window for aggregate queries
+    'back-office': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+    },
+    # One-off imports and data generation: durability traded for speed
+    'bulk-import': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -128000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000,
+    },
+}
+
+# Persian labels for the settings screen
+PROFILE_LABELS = {
+    'pos-terminal': 'صندوق فروش',
+    'back-office': 'دفتر مدیریت و گزارش',
+    'bulk-import': 'ورود انبوه اطلاعات',
+}
+
+
+def load_settings():
+    """
+    Load application settings from the settings file
+    
+    Returns:
+        dict: Saved settings, empty if the file is missing or unreadable
+    """
+    if not os.path.exists(SETTINGS_FILE):
+        return {}
+    
+    try:
+        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read settings file: {e}")
+        return {}
+
+
+def save_settings(settings):
+    """
+    Save application settings to the settings file
+    
+    Args:
+        settings (dict): Settings to save
+    """
+    with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, ensure_ascii=False, indent=2)
+
+
+def get_active_profile():
+    """
+    Get the name of the performance profile to use
+    
+    The environment variable wins over the saved setting; unknown names fall
+    back to the default profile.
+    
+    Returns:
+        str: Profile name
+    """
+    name = os.environ.get(PROFILE_ENV_VAR) or load_settings().get('db_profile', DEFAULT_PROFILE)
+    
+    if name not in PERFORMANCE_PROFILES:
+        logger.warning(f"Unknown database profile '{name}', using '{DEFAULT_PROFILE}'")
+        return DEFAULT_PROFILE
+    return name
+
+
+def set_active_profile(name):
+    """
+    Persist the performance profile choice
+    
+    Args:
+        name (str): Profile name
+    
+    Raises:
+        ValueError: If the profile name is unknown
+    """
+    if name not in PERFORMANCE_PROFILES:
+        raise ValueError(f"Unknown database profile: {name}")
+    
+    settings = load_settings()
+    settings['db_profile'] = name
+    save_settings(settings)
+
+
+def apply_pragmas(dbapi_connection, profile_name):
+    """
+    Apply a profile's PRAGMAs to a raw SQLite connection
+    
+    Args:
+        dbapi_connection: sqlite3 connection
+        profile_name (str): Profile name
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in PERFORMANCE_PROFILES[profile_name].items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
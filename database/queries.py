@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read Queries
+Projection queries for the list and report screens
+
+Each function selects only the columns a screen displays, joins related
+names in the same statement, and returns lightweight namedtuple rows
+instead of ORM entities. Rows carry no session state, so they can be
+handed from a loader thread to the Tk thread and never trigger lazy loads.
+"""
+
+from collections import namedtuple
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from .models import Order, Product, Service, Appointment, Customer, Employee, DailyRollup
+from .pagination import keyset_page
+from .cache import query_cache
+from .rollup import METRICS
+from .phones import normalize_phone
+
+OrderRow = namedtuple('OrderRow', ['id', 'table_number', 'total_amount', 'status', 'created_at'])
+
+MenuItemRow = namedtuple('MenuItemRow', ['id', 'name', 'price', 'stock_quantity'])
+
+ProductRow = namedtuple(
+    'ProductRow',
+    ['id', 'name', 'category', 'price', 'stock_quantity', 'min_stock_level', 'unit']
+)
+
+ServiceRow = namedtuple('ServiceRow', ['id', 'name', 'price', 'duration'])
+
+AppointmentRow = namedtuple(
+    'AppointmentRow',
+    ['id', 'customer_name', 'service_name', 'stylist_name', 'appointment_date', 'status']
+)
+
+CustomerRow = namedtuple('CustomerRow', ['id', 'name', 'phone'])
+
+SalesSummary = namedtuple('SalesSummary', ['total_orders', 'total_revenue', 'paid_orders'])
+
+# Sums of the daily_rollup columns over a period
+PeriodTotals = namedtuple('PeriodTotals', METRICS)
+
+
+def _rows(row_type, page):
+    """Convert the rows of a page to a namedtuple type"""
+    return page._replace(items=[row_type._make(row) for row in page.items])
+
+
+def active_orders_page(session, cursor=None):
+    """
+    Get one page of active cafe orders, newest first
+    
+    Args:
+        session: Database session
+        cursor (tuple): Cursor of the previous page
+    
+    Returns:
+        Page: Page of OrderRow
+    """
+    query = session.query(
+        Order.id, Order.table_number, Order.total_amount, Order.status, Order.created_at
+    ).filter(Order.active_filter())
+    
+    return _rows(OrderRow, keyset_page(query, (Order.created_at, Order.id), cursor, descending=True))
+
+
+def cafe_menu_page(session, cursor=None):
+    """
+    Get one page of active cafe products ordered by name
+    
+    Args:
+        session: Database session
+        cursor (tuple): Cursor of the previous page
+    
+    Returns:
+        Page: Page of MenuItemRow
+    """
+    query = session.query(
+        Product.id, Product.name, Product.price, Product.stock_quantity
+    ).filter(
+        Product.category == 'cafe',
+        Product.is_active == True
+    )
+    
+    return _rows(MenuItemRow, keyset_page(query, (Product.name, Product.id), cursor))
+
+
+def _product_query(session):
+    """Active products with the columns shown in the product lists"""
+    return session.query(
+        Product.id, Product.name, Product.category, Product.price,
+        Product.stock_quantity, Product.min_stock_level, Product.unit
+    ).filter(Product.is_active == True)
+
+
+def products_page(session, cursor=None):
+    """
+    Get one page of active products ordered by name
+    
+    Args:
+        session: Database session
+        cursor (tuple): Cursor of the previous page
+    
+    Returns:
+        Page: Page of ProductRow
+    """
+    query = _product_query(session)
+    return _rows(ProductRow, keyset_page(query, (Product.name, Product.id), cursor))
+
+
+def low_stock_page(session, cursor=None):
+    """
+    Get one page of active products at or below their minimum stock level
+    
+    Args:
+        session: Database session
+        cursor (tuple): Cursor of the previous page
+    
+    Returns:
+        Page: Page of ProductRow
+    """
+    query = _product_query(session).filter(Product.stock_quantity <= Product.min_stock_level)
+    return _rows(ProductRow, keyset_page(query, (Product.name, Product.id), cursor))
+
+
+def services_page(session, cursor=None):
+    """
+    Get one page of active salon services ordered by name
+    
+    Args:
+        session: Database session
+        cursor (tuple): Cursor of the previous page
+    
+    Returns:
+        Page: Page of ServiceRow
+    """
+    query = session.query(
+        Service.id, Service.name, Service.price, Service.duration
+    ).filter(Service.is_active == True)
+    
+    return _rows(ServiceRow, keyset_page(query, (Service.name, Service.id), cursor))
+
+
+def appointments_page(session, since, cursor=None):
+    """
+    Get one page of appointments from a date on, with customer, service and stylist names
+    
+    The names come from outer joins in the same statement rather than from
+    the lazy relationships, so a page costs one query however long it is.
+    
+    Args:
+        session: Database session
+        since (datetime): Earliest appointment date
+        cursor (tuple): Cursor of the previous page
+    
+    Returns:
+        Page: Page of AppointmentRow
+    """
+    stylist = aliased(Employee)
+    query = session.query(
+        Appointment.id,
+        Customer.name.label('customer_name'),
+        Service.name.label('service_name'),
+        stylist.name.label('stylist_name'),
+        Appointment.appointment_date,
+        Appointment.status
+    ).outerjoin(
+        Customer, Appointment.customer_id == Customer.id
+    ).outerjoin(
+        Service, Appointment.service_id == Service.id
+    ).outerjoin(
+        stylist, Appointment.stylist_id == stylist.id
+    ).filter(Appointment.appointment_date >= since)
+    
+    return _rows(AppointmentRow, keyset_page(query, (Appointment.appointment_date, Appointment.id), cursor))
+
+
+def customers_with_phone(session, phone):
+    """
+    Get the customers registered under a phone number, however it is written
+    
+    Compares the indexed normalized column, so "0912 123 4567" finds a
+    customer saved as "+989121234567". This is the duplicate check to run
+    before saving a customer.
+    
+    Args:
+        session: Database session
+        phone (str): Phone number
+    
+    Returns:
+        list: CustomerRow tuples, oldest customer first
+    """
+    normalized = normalize_phone(phone)
+    if normalized is None:
+        return []
+    query = session.query(Customer.id, Customer.name, Customer.phone).filter(
+        Customer.phone_normalized == normalized
+    ).order_by(Customer.id)
+    return [CustomerRow._make(row) for row in query]
+
+
+def period_totals(session, start_date=None, end_date=None):
+    """
+    Sum the daily rollup over a period
+    
+    Reads one row per day and unit instead of the raw orders, invoices,
+    expenses and appointments, so long periods cost O(days).
+    
+    Args:
+        session: Database session
+        start_date (datetime): First day of the period, None for all time
+        end_date (datetime): Day after the period, None for no end
+    
+    Returns:
+        PeriodTotals: Totals of every rollup metric
+    """
+    query = session.query(
+        *[func.coalesce(func.sum(getattr(DailyRollup, name)), 0) for name in METRICS]
+    )
+    if start_date is not None:
+        query = query.filter(DailyRollup.day >= start_date.date())
+    if end_date is not None:
+        query = query.filter(DailyRollup.day < end_date.date())
+    
+    return PeriodTotals._make(query_cache.fetch_query(query)[0])
+
+
+def sales_summary(session, start_date=None):
+    """
+    Get order count, revenue and paid order count since a date
+    
+    Args:
+        session: Database session
+        start_date (datetime): First day of the period, None for all time
+    
+    Returns:
+        SalesSummary: Aggregated figures
+    """
+    totals = period_totals(session, start_date)
+    return SalesSummary(totals.order_count, totals.order_total, totals.paid_order_count)
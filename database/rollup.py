@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Daily Rollup
+Maintains the daily_rollup table of per-day, per-unit report totals
+
+Sessions created by DatabaseManager note the business days touched by each
+flush and recompute just those days right before the transaction commits,
+so the rollup always matches the raw tables it is derived from. A full
+rebuild (for backfill or repair) is available from the command line:
+    python -m database.rollup [--db-url sqlite:///path/to/kagan_db.sqlite]
+"""
+
+import sys
+import logging
+import argparse
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import event, select, delete, insert, func, case, inspect
+from .models import DailyRollup, Order, Invoice, Expense, Appointment
+from . import history
+
+logger = logging.getLogger(__name__)
+
+# session.info key holding the days touched since the last commit
+PENDING_DAYS_KEY = 'rollup_pending_days'
+
+# Date attribute that decides the business day of each tracked model
+TRACKED_DATES = {
+    Order: 'created_at',
+    Appointment: 'appointment_date',
+    Invoice: 'invoice_date',
+    Expense: 'expense_date',
+}
+
+METRICS = (
+    'order_count', 'order_total', 'paid_order_count', 'paid_revenue',
+    'invoice_revenue', 'expenses', 'appointment_count', 'completed_appointments',
+)
+
+
+def _sources(conn):
+    """(unit, date column, {metric: aggregate}) for each raw table"""
+    # Archived orders and invoices count too (see database.history)
+    orders = history.with_history(conn, Order)
+    invoices = history.with_history(conn, Invoice)
+    paid = orders.status == 'paid'
+    return [
+        ('cafe', orders.created_at, {
+            'order_count': func.count(orders.id),
+            'order_total': func.sum(orders.total_amount),
+            'paid_order_count': func.sum(case((paid, 1), else_=0)),
+            'paid_revenue': func.sum(case((paid, orders.total_amount), else_=0)),
+        }),
+        ('salon', Appointment.appointment_date, {
+            'appointment_count': func.count(Appointment.id),
+            'completed_appointments': func.sum(case((Appointment.status == 'completed', 1), else_=0)),
+        }),
+        ('general', invoices.invoice_date, {
+            'invoice_revenue': func.sum(invoices.paid_amount),
+        }),
+        ('general', Expense.expense_date, {
+            'expenses': func.sum(Expense.amount),
+        }),
+    ]
+
+
+def _aggregate(conn, start=None, end=None):
+    """
+    Aggregate the raw tables into rollup rows
+    
+    Args:
+        conn: Connection or Session
+        start (datetime): Inclusive lower bound, None for no bound
+        end (datetime): Exclusive upper bound, None for no bound
+    
+    Returns:
+        dict: {(day, unit): {metric: value}}
+    """
+    totals = {}
+    for unit, date_column, metrics in _sources(conn):
+        day = func.date(date_column)
+        stmt = select(day, *[expr.label(name) for name, expr in metrics.items()]).group_by(day)
+        if start is not None:
+            stmt = stmt.where(date_column >= start)
+        if end is not None:
+            stmt = stmt.where(date_column < end)
+        
+        for row in conn.execute(stmt):
+            if row[0] is None:
+                continue
+            entry = totals.setdefault((date.fromisoformat(row[0]), unit), dict.fromkeys(METRICS, 0))
+            for name in metrics:
+                entry[name] += row._mapping[name] or 0
+    return totals
+
+
+def _write(conn, totals):
+    if totals:
+        conn.execute(insert(DailyRollup), [
+            {'day': day, 'unit': unit, **values} for (day, unit), values in totals.items()
+        ])
+
+
+def refresh_days(conn, days):
+    """
+    Recompute the rollup rows of some business days
+    
+    Args:
+        conn: Connection or Session, inside the caller's transaction
+        days (iterable): Dates to recompute
+    """
+    for day in sorted(set(days)):
+        start = datetime.combine(day, time.min)
+        totals = _aggregate(conn, start, start + timedelta(days=1))
+        conn.execute(delete(DailyRollup).where(DailyRollup.day == day))
+        _write(conn, totals)
+
+
+def rebuild(conn):
+    """
+    Recompute the whole rollup table from the raw tables
+    
+    Args:
+        conn: Connection or Session, inside the caller's transaction
+    
+    Returns:
+        int: Number of rollup rows written
+    """
+    totals = _aggregate(conn)
+    conn.execute(delete(DailyRollup))
+    _write(conn, totals)
+    logger.info(f"Daily rollup rebuilt: {len(totals)} rows")
+    return len(totals)
+
+
+def _day_of(value):
+    return value.date() if isinstance(value, datetime) else None
+
+
+def _collect_days(session, flush_context):
+    """after_flush: remember the business days touched by this flush"""
+    days = session.info.setdefault(PENDING_DAYS_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        attr = TRACKED_DATES.get(type(obj))
+        if attr is None:
+            continue
+        
+        # Both the current day and, if the date was edited, the old one
+        attr_history = inspect(obj).attrs[attr].history
+        for value in [getattr(obj, attr)] + list(attr_history.deleted or ()):
+            day = _day_of(value)
+            if day is not None:
+                days.add(day)
+    
+    if not days:
+        session.info.pop(PENDING_DAYS_KEY, None)
+
+
+def note_days(session, days):
+    """
+    Have the rollup recompute days written without the unit of work
+    
+    Core INSERT/UPDATE statements are invisible to the flush hook; writers
+    that use them report the business days they touched here, and the days
+    are recomputed right before the session commits.
+    
+    Args:
+        session: Session the rows were written in
+        days (iterable): Dates touched
+    """
+    session.info.setdefault(PENDING_DAYS_KEY, set()).update(days)
+
+
+def _refresh_pending(session):
+    """before_commit: recompute touched days inside the committing transaction"""
+    session.flush()
+    days = session.info.pop(PENDING_DAYS_KEY, None)
+    if days:
+        refresh_days(session, days)
+
+
+def _discard_pending(session, transaction):
+    """after_transaction_end: forget days of a rolled back transaction"""
+    if transaction.parent is None:
+        session.info.pop(PENDING_DAYS_KEY, None)
+
+
+def install(session_factory):
+    """
+    Keep the rollup current for sessions made by a session factory
+    
+    Args:
+        session_factory: sessionmaker to attach the hooks to
+    """
+    event.listen(session_factory, 'after_flush', _collect_days)
+    event.listen(session_factory, 'before_commit', _refresh_pending)
+    event.listen(session_factory, 'after_transaction_end', _discard_pending)
+
+
+def main(argv=None):
+    """Command line entry point: rebuild the rollup table"""
+    parser = argparse.ArgumentParser(description="Rebuild the daily report rollup")
+    parser.add_argument('--db-url', help="Database URL (defaults to kagan_db.sqlite)")
+    args = parser.parse_args(argv)
+    
+    from utils import setup_logging
+    from .db_manager import DatabaseManager
+    
+    setup_logging()
+    db_manager = DatabaseManager()
+    db_manager.initialize(args.db_url)
+    
+    with db_manager.engine.begin() as conn:
+        rows = rebuild(conn)
+    print(f"✓ Daily rollup rebuilt ({rows} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search Index
+Ranked prefix search over customers, products, services and invoices
+
+An FTS5 table holds a normalized copy of the searchable text of each row.
+Triggers on the source tables keep it current, whichever program writes
+them: the GUI, bulk writers, the generator or a hand-edited database.
+Persian text is normalized the same way on both sides. Arabic yeh and
+kaf become Persian, ZWNJ, tatweel and diacritics are dropped, and
+Persian and Arabic digits become ASCII. So "علي" finds "علی" and "۰۹۱۲"
+finds "0912". To rebuild the index or try a query:
+    python -m database.search --rebuild
+    python -m database.search "سارا ۰۹۱۲"
+"""
+
+import re
+import sys
+import logging
+import argparse
+from collections import namedtuple
+from sqlalchemy import event, text
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+INDEX_TABLE = 'search_index'
+
+# Character replacements applied to indexed text and to queries
+NORMALIZATION = {
+    '\u064a': '\u06cc',  # Arabic yeh -> Persian yeh
+    '\u0649': '\u06cc',  # alef maksura -> Persian yeh
+    '\u0643': '\u06a9',  # Arabic kaf -> Persian keheh
+    '\u200c': '',  # zero-width non-joiner
+    '\u0640': '',  # tatweel
+    '\u0670': '',  # superscript alef
+}
+NORMALIZATION.update({chr(code): '' for code in range(0x064b, 0x0653)})  # fathatan ... sukun
+NORMALIZATION.update({chr(0x06f0 + digit): str(digit) for digit in range(10)})  # Persian digits
+NORMALIZATION.update({chr(0x0660 + digit): str(digit) for digit in range(10)})  # Arabic-Indic digits
+
+_TRANSLATION = str.maketrans(NORMALIZATION)
+
+# Nested replace() calls per level of the SQL form of the normalization
+REPLACE_CHUNK = 12
+
+# Separators dropped from phone numbers so '0912-345 6789' is one token
+PHONE_SEPARATORS = (' ', '-')
+
+# Rowids are source id * KIND_SLOTS + kind code, so a trigger finds the
+# entry of a row through the rowid instead of scanning the index
+KIND_SLOTS = 8
+
+# kind: (code, table, label column, title columns, body columns, phone
+# columns, condition for a row to be listed)
+SOURCES = {
+    'customer': (1, 'customers', 'name', ('name',), ('email',), ('phone',), None),
+    'product': (2, 'products', 'name', ('name',), ('category', 'description'), (), 'is_active'),
+    'service': (3, 'services', 'name', ('name',), ('description',), (), 'is_active'),
+    'invoice': (4, 'invoices', 'invoice_number', ('invoice_number',), ('notes',), (), None),
+}
+
+# Title matches weigh more than body matches in the bm25 ranking
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+DEFAULT_LIMIT = 20
+
+# Most matches ranked per query (the newest ones)
+RANK_CANDIDATES = 1000
+
+SearchHit = namedtuple('SearchHit', ['kind', 'id', 'label', 'score'])
+
+_TOKEN = re.compile(r'\w+')
+
+
+def normalize(value):
+    """
+    Normalize text the way the index stores it
+    
+    Args:
+        value (str): Text, may be None
+    
+    Returns:
+        str: Normalized text ('' for None)
+    """
+    return value.translate(_TRANSLATION) if value else ''
+
+
+def _sql_normalize(expression):
+    """SQL expression applying NORMALIZATION to a text expression"""
+    # SQLite's parser overflows on about 30 nested calls, so the replace()
+    # chain is split across nested scalar subqueries. Each part only runs
+    # when a GLOB finds one of its characters, which most text lacks.
+    replacements = list(NORMALIZATION.items())
+    for start in range(0, len(replacements), REPLACE_CHUNK):
+        part = replacements[start:start + REPLACE_CHUNK]
+        value = 'v'
+        for old, new in part:
+            value = f"replace({value}, '{old}', '{new}')"
+        characters = ''.join(old for old, _new in part)
+        expression = (
+            f"(SELECT CASE WHEN v GLOB '*[{characters}]*' THEN {value} ELSE v END "
+            f"FROM (SELECT {expression} AS v))"
+        )
+    return expression
+
+
+def _joined(row, columns):
+    """SQL expression joining some columns of a row with spaces, NULLs skipped"""
+    if not columns:
+        return "''"
+    return " || ' ' || ".join(f"coalesce({row}.{column}, '')" for column in columns)
+
+
+def _phones(row, columns):
+    """SQL expression of phone columns with separators removed"""
+    parts = []
+    for column in columns:
+        expression = f"coalesce({row}.{column}, '')"
+        for separator in PHONE_SEPARATORS:
+            expression = f"replace({expression}, '{separator}', '')"
+        parts.append(expression)
+    return " || ' ' || ".join(parts)
+
+
+def _select_entries(kind, row):
+    """SELECT producing the index entries of rows named `row` (NEW or the table)"""
+    code, table, label, title, body, phones, condition = SOURCES[kind]
+    body_expression = _joined(row, body)
+    if phones:
+        body_expression = f"{_phones(row, phones)} || ' ' || {body_expression}"
+    where = f" WHERE {row}.{condition}" if condition else ""
+    source = f" FROM {table}" if row == table else ""
+    return (
+        f"SELECT {row}.id * {KIND_SLOTS} + {code}, {row}.{label}, "
+        f"{_sql_normalize(_joined(row, title))}, {_sql_normalize(body_expression)}"
+        f"{source}{where}"
+    )
+
+
+def _trigger_statements(kind):
+    """CREATE TRIGGER statements keeping the entries of one source current"""
+    code, table, label, title, body, phones, condition = SOURCES[kind]
+    insert_new = f"INSERT INTO {INDEX_TABLE} (rowid, label, title, body) {_select_entries(kind, 'new')};"
+    delete_old = f"DELETE FROM {INDEX_TABLE} WHERE rowid = old.id * {KIND_SLOTS} + {code};"
+    # Only edits of indexed columns touch the index (not e.g. stock changes)
+    watched = sorted({label, *title, *body, *phones, *([condition] if condition else [])})
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {', '.join(watched)} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} "
+        f"BEGIN {delete_old} END",
+    ]
+
+
+def create_index(conn):
+    """
+    Create the search table and its triggers if they do not exist
+    
+    Args:
+        conn: Connection, inside the caller's transaction
+    """
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+        f"label UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')"
+    ))
+    for kind in SOURCES:
+        for statement in _trigger_statements(kind):
+            conn.execute(text(statement))
+
+
+def rebuild(conn):
+    """
+    Refill the search index from the source tables
+    
+    Args:
+        conn: Connection or Session, inside the caller's transaction
+    
+    Returns:
+        int: Number of entries written
+    """
+    conn.execute(text(f"DELETE FROM {INDEX_TABLE}"))
+    for kind, source in SOURCES.items():
+        table = source[1]
+        conn.execute(text(f"INSERT INTO {INDEX_TABLE} (rowid, label, title, body) {_select_entries(kind, table)}"))
+    conn.execute(text(f"INSERT INTO {INDEX_TABLE} ({INDEX_TABLE}) VALUES ('optimize')"))
+    count = conn.execute(text(f"SELECT COUNT(*) FROM {INDEX_TABLE}")).scalar()
+    logger.info(f"Search index rebuilt: {count} entries")
+    return count
+
+
+def match_expression(query):
+    """
+    FTS5 MATCH expression for what a user typed
+    
+    Every word must match the start of a word in the entry, so "سار ۰۹۱"
+    finds "سارا" with phone "0912...".
+    
+    Args:
+        query (str): Search box text
+    
+    Returns:
+        str: MATCH expression, '' if the query has no words
+    """
+    return ' '.join(f'"{token}"*' for token in _TOKEN.findall(normalize(query)))
+
+
+def search(session, query, kinds=None, limit=DEFAULT_LIMIT):
+    """
+    Find customers, products, services and invoices matching a query
+    
+    Args:
+        session: Session or Connection
+        query (str): Search box text
+        kinds (iterable): Kinds to search, from SOURCES (default: all)
+        limit (int): Most hits returned
+    
+    Returns:
+        list: SearchHit tuples, best match first; ties go to newer rows
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    
+    codes = {SOURCES[kind][0]: kind for kind in (kinds or SOURCES)}
+    kind_filter = ''
+    if len(codes) < len(SOURCES):
+        kind_filter = f" AND rowid % {KIND_SLOTS} IN ({', '.join(map(str, codes))})"
+    
+    # bm25 costs the same for every match, so a short prefix matching half
+    # the customers would take tens of milliseconds; only the newest
+    # RANK_CANDIDATES matches are ranked, which FTS5 reads in rowid order
+    rows = session.execute(
+        text(
+            f"SELECT rowid, label, score FROM ("
+            f"SELECT rowid, label, bm25({INDEX_TABLE}, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+            f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH :expression{kind_filter} "
+            f"ORDER BY rowid DESC LIMIT :candidates"
+            f") ORDER BY score, rowid DESC LIMIT :limit"
+        ),
+        {'expression': expression, 'candidates': RANK_CANDIDATES, 'limit': limit},
+    )
+    return [
+        SearchHit(codes[rowid % KIND_SLOTS], rowid // KIND_SLOTS, label, score)
+        for rowid, label, score in rows
+    ]
+
+
+def _after_create(metadata, connection, **kw):
+    """Metadata after_create: create_all() also creates the search index"""
+    if connection.dialect.name == 'sqlite':
+        create_index(connection)
+
+
+def _before_drop(metadata, connection, **kw):
+    """Metadata before_drop: drop_all() also drops the search index"""
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"DROP TABLE IF EXISTS {INDEX_TABLE}"))
+
+
+event.listen(Base.metadata, 'after_create', _after_create)
+event.listen(Base.metadata, 'before_drop', _before_drop)
+
+
+def main(argv=None):
+    """Command line entry point: search, or rebuild the index"""
+    parser = argparse.ArgumentParser(description="Search the Kagan database")
+    parser.add_argument('query', nargs='?', help="Text to search for")
+    parser.add_argument('--kind', action='append', choices=list(SOURCES), help="Only search these kinds")
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help="Most results shown")
+    parser.add_argument('--rebuild', action='store_true', help="Refill the index from the source tables")
+    parser.add_argument('--db-url', help="Database URL (defaults to kagan_db.sqlite)")
+    args = parser.parse_args(argv)
+    if not args.query and not args.rebuild:
+        parser.error("give a query or --rebuild")
+    
+    from utils import setup_logging
+    from .db_manager import DatabaseManager
+    
+    setup_logging()
+    db_manager = DatabaseManager()
+    db_manager.initialize(args.db_url)
+    
+    if args.rebuild:
+        with db_manager.engine.begin() as conn:
+            count = rebuild(conn)
+        print(f"✓ Search index rebuilt ({count} entries)")
+    
+    if args.query:
+        with db_manager.engine.connect() as conn:
+            for hit in search(conn, args.query, args.kind, args.limit):
+                print(f"{hit.kind:<9} {hit.id:>8}  {hit.label}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic Data Generator
+Production-sized, deterministic test databases for benchmarking
+
+Scale 1 is a typical branch-year: about 2,000 customers and, per day,
+150 cafe orders, 30 salon appointments, 40 gaming sessions, 10 invoices,
+3 expenses and 20 text messages, spread over opening hours and weekdays
+the way a shop sees them (Thursday and Friday busiest). Scales 10, 100 and
+1000 multiply every volume. The same seed, scale and end date always give
+the same rows.
+
+Rows are written with Core executemany inserts in large batches, bypassing
+the session hooks, so the daily rollup is rebuilt and the in-memory caches
+are dropped afterwards.
+    
+    python -m database.synthetic --scale 10 --db-url sqlite:///bench_10x.sqlite
+"""
+
+import sys
+import time
+import random
+import logging
+import argparse
+from bisect import bisect
+from itertools import accumulate
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, select
+from .models import (
+    Customer, Employee, Service, Product, Supplier, Appointment, Order, OrderItem,
+    GamingSession, Invoice, InvoiceItem, Expense, SmsMessage
+)
+from . import rollup, dashboard
+from .cache import query_cache
+from .catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+SCALE_FACTORS = (1, 10, 100, 1000)
+DEFAULT_SEED = 1403
+DEFAULT_DAYS = 365
+
+# Rows per executemany call
+BATCH_SIZE = 20000
+
+# Volumes of a typical branch-year (scale 1)
+BRANCH_YEAR = {
+    'customers': 2000,
+    'orders_per_day': 150,
+    'appointments_per_day': 30,
+    'gaming_sessions_per_day': 40,
+    'invoices_per_day': 10,
+    'expenses_per_day': 3,
+    'sms_per_day': 20,
+}
+
+# Relative traffic by weekday (Monday first); the weekend is Thursday-Friday
+WEEKDAY_WEIGHTS = (0.9, 0.9, 1.0, 1.25, 1.4, 0.85, 0.9)
+
+# Relative traffic by hour of day for each business unit
+HOUR_WEIGHTS = {
+    'cafe': {8: 3, 9: 6, 10: 7, 11: 6, 12: 5, 13: 5, 14: 4, 15: 4, 16: 5, 17: 7, 18: 9, 19: 10, 20: 10, 21: 8, 22: 4},
+    'salon': {9: 2, 10: 5, 11: 6, 12: 5, 13: 3, 14: 4, 15: 6, 16: 8, 17: 9, 18: 8, 19: 6, 20: 3},
+    'gamnet': {10: 1, 12: 2, 14: 4, 15: 6, 16: 8, 17: 9, 18: 10, 19: 10, 20: 9, 21: 8, 22: 6, 23: 3},
+    'office': {9: 5, 10: 6, 11: 6, 12: 4, 13: 3, 14: 4, 15: 5, 16: 4, 17: 2},
+}
+
+MALE_NAMES = [
+    'علی', 'محمد', 'حسین', 'رضا', 'مهدی', 'امیر', 'حمید', 'سعید', 'مجید', 'جواد',
+    'مصطفی', 'احمد', 'حسن', 'کامران', 'بهزاد', 'فرهاد', 'پویا', 'آرش', 'سینا', 'میلاد',
+]
+FEMALE_NAMES = [
+    'فاطمه', 'زهرا', 'مریم', 'سارا', 'نرگس', 'الهام', 'مینا', 'لیلا', 'نازنین', 'شیرین',
+    'پریسا', 'مهسا', 'نیلوفر', 'سمیرا', 'ریحانه', 'آزاده', 'هانیه', 'ستاره', 'یگانه', 'مهتاب',
+]
+LAST_NAMES = [
+    'احمدی', 'محمدی', 'حسینی', 'رضایی', 'کریمی', 'موسوی', 'جعفری', 'صادقی', 'رحیمی', 'هاشمی',
+    'قاسمی', 'نوری', 'اکبری', 'عباسی', 'کاظمی', 'زارعی', 'مرادی', 'شریفی', 'طاهری', 'یوسفی',
+    'سلیمانی', 'ابراهیمی', 'نجفی', 'فرهادی', 'تهرانی', 'شیرازی', 'اصفهانی', 'قربانی', 'بهرامی', 'امینی',
+]
+
+# Mobile operator prefixes after the leading 09 (Hamrah-e Aval, Irancell, Rightel)
+MOBILE_PREFIXES = [
+    '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '90', '91', '92', '93', '94',
+    '01', '02', '03', '05', '30', '33', '35', '36', '37', '38', '39', '20', '21', '22',
+]
+
+PRODUCTS = [
+    # name, category, price, cost, unit
+    ('قهوه اسپرسو', 'cafe', 60000, 22000, 'فنجان'),
+    ('کاپوچینو', 'cafe', 85000, 32000, 'فنجان'),
+    ('لاته', 'cafe', 90000, 34000, 'فنجان'),
+    ('آمریکانو', 'cafe', 70000, 25000, 'فنجان'),
+    ('موکا', 'cafe', 95000, 38000, 'فنجان'),
+    ('چای', 'cafe', 35000, 8000, 'لیوان'),
+    ('چای سبز', 'cafe', 40000, 10000, 'لیوان'),
+    ('دمنوش', 'cafe', 55000, 15000, 'لیوان'),
+    ('هات چاکلت', 'cafe', 85000, 35000, 'لیوان'),
+    ('آب پرتقال', 'cafe', 90000, 45000, 'لیوان'),
+    ('اسموتی', 'cafe', 120000, 55000, 'لیوان'),
+    ('کیک شکلاتی', 'cafe', 130000, 55000, 'تکه'),
+    ('چیزکیک', 'cafe', 150000, 65000, 'تکه'),
+    ('کروسان', 'cafe', 75000, 30000, 'عدد'),
+    ('ساندویچ مرغ', 'cafe', 180000, 85000, 'عدد'),
+    ('ساندویچ ژامبون', 'cafe', 170000, 80000, 'عدد'),
+    ('سالاد سزار', 'cafe', 210000, 95000, 'پرس'),
+    ('پاستا', 'cafe', 240000, 110000, 'پرس'),
+    ('شامپو', 'salon', 220000, 110000, 'بطری'),
+    ('نرم کننده', 'salon', 200000, 100000, 'بطری'),
+    ('رنگ مو', 'salon', 380000, 190000, 'بسته'),
+    ('کرم مو', 'salon', 160000, 75000, 'بطری'),
+    ('ژل مو', 'salon', 120000, 55000, 'بطری'),
+    ('ماسک مو', 'salon', 260000, 120000, 'بطری'),
+    ('لاک ناخن', 'salon', 90000, 40000, 'عدد'),
+    ('دستمال کاغذی', 'general', 50000, 25000, 'بسته'),
+    ('مایع دستشویی', 'general', 80000, 40000, 'بطری'),
+    ('لیوان یکبار مصرف', 'general', 60000, 30000, 'بسته'),
+    ('کیسه زباله', 'general', 45000, 20000, 'بسته'),
+]
+
+SERVICES = [
+    # name, price, duration
+    ('کوتاهی مو', 500000, 45), ('رنگ مو', 1500000, 120), ('هایلایت', 2200000, 150),
+    ('اصلاح صورت', 300000, 30), ('ماساژ سر', 400000, 40), ('کراتینه', 3500000, 180),
+    ('براشینگ', 450000, 40), ('شینیون', 1800000, 90), ('مانیکور', 600000, 45),
+    ('پدیکور', 700000, 60), ('اصلاح ابرو', 200000, 20), ('پاکسازی پوست', 1200000, 75),
+]
+
+EMPLOYEES = [
+    # position, count
+    ('آرایشگر', 5), ('باریستا', 3), ('صندوقدار', 2), ('منشی', 1), ('مدیر', 1),
+]
+
+SUPPLIERS = [
+    'تامین کننده قهوه', 'تامین کننده لوازم آرایشی', 'تامین کننده مواد غذایی',
+    'پخش لبنیات', 'نان و شیرینی', 'لوازم یکبار مصرف', 'تجهیزات کافه', 'خدمات نظافتی',
+]
+
+EXPENSE_CATEGORIES = [
+    # category, weight, low, high, needs a supplier
+    ('مواد اولیه', 50, 2000000, 30000000, True),
+    ('قبوض', 10, 1500000, 12000000, False),
+    ('تعمیرات', 8, 1000000, 20000000, False),
+    ('نظافت', 15, 500000, 4000000, True),
+    ('بازاریابی', 7, 2000000, 25000000, False),
+    ('حمل و نقل', 10, 300000, 3000000, False),
+]
+
+SMS_TEMPLATES = [
+    'نوبت شما فردا ساعت {hour} ثبت شده است. سالن کاگان',
+    'مشتری گرامی، از خرید شما سپاسگزاریم.',
+    'تخفیف ویژه آخر هفته در کافه کاگان!',
+    'امتیاز باشگاه مشتریان شما به‌روز شد.',
+]
+
+GAMING_SYSTEMS = [f"PC-{n:02d}" for n in range(1, 21)]
+GAMING_RATE = 60000  # per hour
+
+# Order statuses: the last couple of hours are still open
+OPEN_ORDER_STATUSES = ('pending', 'preparing', 'ready')
+
+
+class _Sampler:
+    """Weighted choices from a fixed list, O(log n) per draw"""
+    
+    def __init__(self, rng, items, weights):
+        self.rng = rng
+        self.items = list(items)
+        self.cumulative = list(accumulate(weights))
+        self.total = self.cumulative[-1]
+    
+    def __call__(self):
+        return self.items[bisect(self.cumulative, self.rng.random() * self.total)]
+
+
+class _BatchWriter:
+    """Buffers rows of one table and inserts them BATCH_SIZE at a time"""
+    
+    def __init__(self, conn, model, batch_size):
+        self.conn = conn
+        self.table = model.__table__
+        self.batch_size = batch_size
+        self.rows = []
+        self.count = 0
+        self.next_id = (conn.execute(select(func.max(self.table.c.id))).scalar() or 0) + 1
+    
+    def add(self, row):
+        """Queue a row, assigning its id; returns the id"""
+        row_id = row['id'] = self.next_id
+        self.next_id += 1
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+        return row_id
+    
+    def flush(self):
+        if self.rows:
+            self.conn.execute(self.table.insert(), self.rows)
+            self.conn.commit()
+            self.count += len(self.rows)
+            self.rows = []
+
+
+class SyntheticDataGenerator:
+    """
+    Generates one branch's data for a period, deterministically
+    
+    Args:
+        scale (float): Volume multiplier; 1 is a typical branch-year
+        seed (int): Random seed
+        days (int): Length of the period in days
+        end (date): Last day of the period (default: today)
+        batch_size (int): Rows per insert batch
+    """
+    
+    def __init__(self, scale=1, seed=DEFAULT_SEED, days=DEFAULT_DAYS, end=None, batch_size=BATCH_SIZE):
+        if scale <= 0:
+            raise ValueError("Scale must be positive")
+        self.scale = scale
+        self.seed = seed
+        self.days = days
+        self.end = end or date.today()
+        self.start = self.end - timedelta(days=days - 1)
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        
+        self._hours = {unit: _Sampler(self.rng, weights.keys(), weights.values())
+                       for unit, weights in HOUR_WEIGHTS.items()}
+    
+    def _count_for(self, per_day, day):
+        """Events on one day: the daily rate shaped by weekday and noise"""
+        mean = per_day * self.scale * WEEKDAY_WEIGHTS[day.weekday()]
+        return max(0, int(round(self.rng.gauss(mean, mean * 0.15))))
+    
+    def _time_on(self, day, unit):
+        """A time of day on a date, following the unit's busy hours"""
+        return datetime(day.year, day.month, day.day, self._hours[unit](),
+                        self.rng.randrange(60), self.rng.randrange(60))
+    
+    def _pick_customer(self):
+        """A customer id, regulars far more often than one-off visitors"""
+        return self.customer_ids[int(len(self.customer_ids) * self.rng.random() ** 2.5)]
+    
+    def _days(self):
+        day = self.start
+        while day <= self.end:
+            yield day
+            day += timedelta(days=1)
+    
+    def phone_number(self):
+        """A random Iranian mobile number, e.g. 09121234567"""
+        return f"09{self.rng.choice(MOBILE_PREFIXES)}{self.rng.randrange(10 ** 7):07d}"
+    
+    def person_name(self):
+        """A random Persian full name"""
+        first = self.rng.choice(MALE_NAMES if self.rng.random() < 0.5 else FEMALE_NAMES)
+        return f"{first} {self.rng.choice(LAST_NAMES)}"
+    
+    def _writer(self, conn, model):
+        return _BatchWriter(conn, model, self.batch_size)
+    
+    def _reference_data(self, conn):
+        """Create products, services, employees and suppliers unless present"""
+        created = datetime.combine(self.start, datetime.min.time())
+        
+        if not conn.execute(select(func.count(Product.id))).scalar():
+            writer = self._writer(conn, Product)
+            for name, category, price, cost, unit in PRODUCTS:
+                writer.add({
+                    'name': name, 'category': category, 'price': price, 'cost': cost,
+                    'stock_quantity': self.rng.randint(0, 200), 'min_stock_level': 10,
+                    'unit': unit, 'is_active': True, 'created_at': created, 'updated_at': created,
+                })
+            writer.flush()
+        
+        if not conn.execute(select(func.count(Service.id))).scalar():
+            writer = self._writer(conn, Service)
+            for name, price, duration in SERVICES:
+                writer.add({
+                    'name': name, 'price': price, 'duration': duration, 'is_active': True,
+                    'created_at': created, 'updated_at': created,
+                })
+            writer.flush()
+        
+        if not conn.execute(select(func.count(Employee.id))).scalar():
+            writer = self._writer(conn, Employee)
+            for position, count in EMPLOYEES:
+                for _ in range(max(1, int(round(count * self.scale ** 0.5)))):
+                    writer.add({
+                        'name': self.person_name(), 'position': position, 'phone': self.phone_number(),
+                        'salary': self.rng.randrange(120, 300) * 100000, 'hire_date': created,
+                        'is_active': True, 'created_at': created, 'updated_at': created,
+                    })
+            writer.flush()
+        
+        if not conn.execute(select(func.count(Supplier.id))).scalar():
+            writer = self._writer(conn, Supplier)
+            for name in SUPPLIERS:
+                writer.add({
+                    'name': name, 'contact_person': self.person_name(),
+                    'phone': f"021{self.rng.randrange(10 ** 8):08d}", 'is_active': True,
+                    'created_at': created, 'updated_at': created,
+                })
+            writer.flush()
+        
+        products = conn.execute(select(Product.id, Product.name, Product.category, Product.price)).all()
+        self.cafe_products = [row for row in products if row.category == 'cafe'] or products
+        self.shop_products = [row for row in products if row.category != 'cafe'] or products
+        self.services = conn.execute(select(Service.id, Service.price)).all()
+        stylists = conn.execute(select(Employee.id).where(Employee.position == 'آرایشگر')).scalars().all()
+        self.stylist_ids = stylists or conn.execute(select(Employee.id)).scalars().all()
+        self.supplier_ids = conn.execute(select(Supplier.id)).scalars().all()
+    
+    def _customers(self, conn):
+        writer = self._writer(conn, Customer)
+        count = int(round(BRANCH_YEAR['customers'] * self.scale))
+        phones = set()
+        span = self.days * 86400
+        
+        self.customer_ids = []
+        self.customer_phones = []
+        for _ in range(count):
+            phone = self.phone_number()
+            while phone in phones:
+                phone = self.phone_number()
+            phones.add(phone)
+            
+            # A third were customers before the period started
+            if self.rng.random() < 0.33:
+                created = datetime.combine(self.start, datetime.min.time()) - timedelta(days=self.rng.randrange(1, 730))
+            else:
+                created = datetime.combine(self.start, datetime.min.time()) + timedelta(seconds=self.rng.randrange(span))
+            self.customer_ids.append(writer.add({
+                'name': self.person_name(), 'phone': phone,
+                'email': f"user{len(phones)}@example.com" if self.rng.random() < 0.3 else None,
+                'loyalty_points': int(self.rng.expovariate(1 / 40)),
+                'created_at': created, 'updated_at': created,
+            }))
+            self.customer_phones.append(phone)
+        writer.flush()
+        
+        # Shuffled so the regulars _pick_customer favours are not just the oldest customers
+        self.rng.shuffle(self.customer_ids)
+        return writer.count
+    
+    def _orders(self, conn):
+        orders = self._writer(conn, Order)
+        items = self._writer(conn, OrderItem)
+        open_after = datetime.combine(self.end, datetime.min.time()) + timedelta(hours=20)
+        
+        for day in self._days():
+            for _ in range(self._count_for(BRANCH_YEAR['orders_per_day'], day)):
+                created = self._time_on(day, 'cafe')
+                if created >= open_after:
+                    status = self.rng.choice(OPEN_ORDER_STATUSES)
+                else:
+                    status = 'paid' if self.rng.random() < 0.93 else 'delivered'
+                
+                lines = []
+                for product in self.rng.sample(self.cafe_products, min(len(self.cafe_products), self.rng.choice((1, 1, 2, 2, 3, 4)))):
+                    quantity = 1 if self.rng.random() < 0.8 else self.rng.randint(2, 4)
+                    lines.append((product, quantity))
+                total = sum(product.price * quantity for product, quantity in lines)
+                
+                order_id = orders.add({
+                    'customer_id': self._pick_customer() if self.rng.random() < 0.4 else None,
+                    'table_number': str(self.rng.randint(1, 20)) if self.rng.random() < 0.7 else None,
+                    'status': status, 'total_amount': total,
+                    'created_at': created, 'updated_at': created + timedelta(minutes=self.rng.randint(5, 60)),
+                })
+                for product, quantity in lines:
+                    items.add({
+                        'order_id': order_id, 'product_id': product.id, 'quantity': quantity,
+                        'price': product.price, 'subtotal': product.price * quantity,
+                    })
+        orders.flush()
+        items.flush()
+        return orders.count, items.count
+    
+    def _appointments(self, conn, now):
+        writer = self._writer(conn, Appointment)
+        for day in self._days():
+            for _ in range(self._count_for(BRANCH_YEAR['appointments_per_day'], day)):
+                when = self._time_on(day, 'salon').replace(minute=self.rng.choice((0, 15, 30, 45)), second=0)
+                if when > now:
+                    status = 'scheduled'
+                else:
+                    status = 'completed' if self.rng.random() < 0.88 else 'cancelled'
+                writer.add({
+                    'customer_id': self._pick_customer(),
+                    'service_id': self.rng.choice(self.services).id,
+                    'stylist_id': self.rng.choice(self.stylist_ids) if self.stylist_ids else None,
+                    'appointment_date': when, 'status': status,
+                    'created_at': when - timedelta(days=self.rng.randint(0, 14)), 'updated_at': when,
+                })
+        writer.flush()
+        return writer.count
+    
+    def _gaming_sessions(self, conn, now):
+        writer = self._writer(conn, GamingSession)
+        for day in self._days():
+            for _ in range(self._count_for(BRANCH_YEAR['gaming_sessions_per_day'], day)):
+                start = self._time_on(day, 'gamnet')
+                duration = self.rng.choice((30, 60, 60, 90, 120, 120, 180, 240))
+                end = start + timedelta(minutes=duration)
+                finished = end <= now
+                writer.add({
+                    'customer_id': self._pick_customer() if self.rng.random() < 0.5 else None,
+                    'system_number': self.rng.choice(GAMING_SYSTEMS),
+                    'start_time': start, 'end_time': end if finished else None,
+                    'duration': duration if finished else None, 'rate': GAMING_RATE,
+                    'total_amount': GAMING_RATE * duration / 60 if finished else None,
+                    'status': 'completed' if finished else 'active',
+                    'created_at': start, 'updated_at': end if finished else start,
+                })
+        writer.flush()
+        return writer.count
+    
+    def _invoices(self, conn):
+        invoices = self._writer(conn, Invoice)
+        items = self._writer(conn, InvoiceItem)
+        for day in self._days():
+            for _ in range(self._count_for(BRANCH_YEAR['invoices_per_day'], day)):
+                issued = self._time_on(day, 'office')
+                lines = [(product, self.rng.randint(1, 3))
+                         for product in self.rng.sample(self.shop_products, min(len(self.shop_products), self.rng.randint(1, 3)))]
+                subtotal = sum(product.price * quantity for product, quantity in lines)
+                discount = subtotal * 0.1 if self.rng.random() < 0.15 else 0
+                tax = round((subtotal - discount) * 0.09)
+                total = subtotal - discount + tax
+                roll = self.rng.random()
+                status, paid = ('paid', total) if roll < 0.8 else ('partial', round(total / 2)) if roll < 0.9 else ('unpaid', 0)
+                
+                invoice_id = invoices.add({
+                    'invoice_number': f"INV-{issued:%Y%m%d}-{invoices.next_id:07d}",
+                    'customer_id': self._pick_customer(), 'invoice_date': issued,
+                    'due_date': issued + timedelta(days=30), 'subtotal': subtotal, 'tax_rate': 9.0,
+                    'tax_amount': tax, 'discount_amount': discount, 'total_amount': total,
+                    'paid_amount': paid, 'status': status,
+                    'payment_method': self.rng.choice(('نقدی', 'کارت', 'کارت', 'انتقال')),
+                    'created_at': issued, 'updated_at': issued,
+                })
+                for product, quantity in lines:
+                    items.add({
+                        'invoice_id': invoice_id, 'product_id': product.id, 'description': product.name,
+                        'quantity': quantity, 'price': product.price, 'subtotal': product.price * quantity,
+                    })
+        invoices.flush()
+        items.flush()
+        return invoices.count, items.count
+    
+    def _expenses(self, conn):
+        writer = self._writer(conn, Expense)
+        category = _Sampler(self.rng, EXPENSE_CATEGORIES, [entry[1] for entry in EXPENSE_CATEGORIES])
+        for day in self._days():
+            for _ in range(self._count_for(BRANCH_YEAR['expenses_per_day'], day)):
+                name, _weight, low, high, needs_supplier = category()
+                when = self._time_on(day, 'office')
+                writer.add({
+                    'supplier_id': self.rng.choice(self.supplier_ids) if needs_supplier and self.supplier_ids else None,
+                    'category': name, 'description': name,
+                    'amount': self.rng.randrange(low // 10000, high // 10000) * 10000,
+                    'expense_date': when, 'payment_method': self.rng.choice(('نقدی', 'کارت', 'انتقال')),
+                    'receipt_number': f"R{self.rng.randrange(10 ** 6):06d}",
+                    'created_at': when, 'updated_at': when,
+                })
+        writer.flush()
+        return writer.count
+    
+    def _sms_messages(self, conn):
+        writer = self._writer(conn, SmsMessage)
+        for day in self._days():
+            for _ in range(self._count_for(BRANCH_YEAR['sms_per_day'], day)):
+                sent = self._time_on(day, 'salon')
+                roll = self.rng.random()
+                status = 'delivered' if roll < 0.9 else 'sent' if roll < 0.96 else 'failed'
+                writer.add({
+                    'recipient': self.customer_phones[self.rng.randrange(len(self.customer_phones))],
+                    'message': self.rng.choice(SMS_TEMPLATES).format(hour=self.rng.randint(10, 19)),
+                    'status': status, 'sent_at': sent,
+                    'delivered_at': sent + timedelta(seconds=self.rng.randint(2, 90)) if status == 'delivered' else None,
+                    'message_id': f"{self.rng.randrange(10 ** 10):010d}",
+                    'error_message': 'شماره نامعتبر' if status == 'failed' else None,
+                    'created_at': sent,
+                })
+        writer.flush()
+        return writer.count
+    
+    def generate(self, engine, progress=None):
+        """
+        Write the data set into a database
+        
+        Args:
+            engine: SQLAlchemy engine of a migrated database
+            progress (callable): progress(table, rows) after each table
+        
+        Returns:
+            dict: Rows written per table
+        """
+        report = progress or (lambda table, rows: None)
+        now = datetime.combine(self.end, datetime.min.time()) + timedelta(hours=20)
+        counts = {}
+        
+        with engine.connect() as conn:
+            self._reference_data(conn)
+            
+            steps = [
+                ('customers', lambda: self._customers(conn)),
+                (('orders', 'order_items'), lambda: self._orders(conn)),
+                ('appointments', lambda: self._appointments(conn, now)),
+                ('gaming_sessions', lambda: self._gaming_sessions(conn, now)),
+                (('invoices', 'invoice_items'), lambda: self._invoices(conn)),
+                ('expenses', lambda: self._expenses(conn)),
+                ('sms_messages', lambda: self._sms_messages(conn)),
+            ]
+            for tables, step in steps:
+                result = step()
+                if isinstance(tables, tuple):
+                    counts.update(zip(tables, result))
+                else:
+                    counts[tables] = result
+                for table in (tables if isinstance(tables, tuple) else (tables,)):
+                    report(table, counts[table])
+        
+        # Core inserts bypass the session hooks
+        with engine.begin() as conn:
+            rollup.rebuild(conn)
+        query_cache.invalidate()
+        catalog.reset()
+        dashboard.invalidate()
+        return counts
+
+
+def generate(engine, scale=1, seed=DEFAULT_SEED, days=DEFAULT_DAYS, end=None, progress=None):
+    """
+    Fill a database with a synthetic branch data set
+    
+    Args:
+        engine: SQLAlchemy engine of a migrated database
+        scale (float): Volume multiplier (1, 10, 100 or 1000 branch-years)
+        seed (int): Random seed
+        days (int): Length of the period in days
+        end (date): Last day of the period (default: today)
+        progress (callable): progress(table, rows) after each table
+    
+    Returns:
+        dict: Rows written per table
+    """
+    generator = SyntheticDataGenerator(scale, seed, days, end)
+    return generator.generate(engine, progress)
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic Kagan database for benchmarking")
+    parser.add_argument('--db-url', help="Database URL (defaults to kagan_db.sqlite)")
+    parser.add_argument('--scale', type=float, default=1, help=f"Branch-years of volume, e.g. {SCALE_FACTORS}")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Random seed")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="Days of history")
+    parser.add_argument('--end', type=date.fromisoformat, help="Last day, YYYY-MM-DD (default: today)")
+    args = parser.parse_args(argv)
+    
+    from utils import setup_logging
+    from .db_manager import DatabaseManager
+    
+    setup_logging()
+    db_manager = DatabaseManager()
+    db_manager.initialize(args.db_url)
+    
+    started = time.perf_counter()
+    counts = generate(
+        db_manager.engine, args.scale, args.seed, args.days, args.end,
+        progress=lambda table, rows: print(f"  {table}: {rows:,} rows")
+    )
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"✓ {total:,} rows generated in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
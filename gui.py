@@ -5,22 +5,48 @@ GUI Module - Main window and login dialog with glassmorphism design
 Supports RTL layout for Persian language
 """
 
+import time
+import logging
+import importlib
 import customtkinter as ctk
 from tkinter import messagebox
+from database.db_manager import get_db_manager
+from database.changes import change_tracker
+from database.archive import BackupScheduler
+from modules.data_loader import get_executor
 
-# Import all module sections
-from modules.salon_section import SalonSection
-from modules.cafe_section import CafeSection
-from modules.gamnet_section import GamnetSection
-from modules.inventory_section import InventorySection
-from modules.invoice_section import InvoiceSection
-from modules.customer_section import CustomerSection
-from modules.employee_section import EmployeeSection
-from modules.reports_section import ReportsSection
-from modules.supplier_expense_section import SupplierExpenseSection
-from modules.campaign_section import CampaignSection
-from modules.sms_section import SmsSection
-from modules.settings_section import SettingsSection
+logger = logging.getLogger(__name__)
+
+# Sidebar sections as (id, label, module, class); a section's module is
+# imported the first time the section is shown, not at startup
+SECTIONS = [
+    ('salon', 'آرایشگاه', 'modules.salon_section', 'SalonSection'),
+    ('cafe', 'کافه', 'modules.cafe_section', 'CafeSection'),
+    ('gamnet', 'گیم نت', 'modules.gamnet_section', 'GamnetSection'),
+    ('inventory', 'انبار', 'modules.inventory_section', 'InventorySection'),
+    ('invoice', 'فاکتور', 'modules.invoice_section', 'InvoiceSection'),
+    ('customer', 'مشتریان', 'modules.customer_section', 'CustomerSection'),
+    ('employee', 'کارمندان', 'modules.employee_section', 'EmployeeSection'),
+    ('reports', 'گزارشات', 'modules.reports_section', 'ReportsSection'),
+    ('supplier_expense', 'تامین کنندگان', 'modules.supplier_expense_section', 'SupplierExpenseSection'),
+    ('campaign', 'کمپین ها', 'modules.campaign_section', 'CampaignSection'),
+    ('sms', 'پیامک', 'modules.sms_section', 'SmsSection'),
+    ('settings', 'تنظیمات', 'modules.settings_section', 'SettingsSection'),
+]
+
+# Sections most likely to be opened next, built in idle time after startup
+WARM_MODULES = ['cafe', 'inventory', 'reports']
+
+# Pause between idle-time section builds so user input is handled in between
+WARM_DELAY_MS = 300
+
+# How often to check the database for changes, and how long a burst of
+# changes must settle before the visible section reloads
+CHANGE_POLL_MS = 2000
+CHANGE_DEBOUNCE_MS = 500
+
+# How often to check whether a scheduled backup is due
+BACKUP_CHECK_MS = 60 * 1000
 
 
 class LoginDialog(ctk.CTk):
@@ -154,7 +180,7 @@ class LoginDialog(ctk.CTk):
             self.current_user = user
             self.login_successful = True
             self.destroy()
-            
+        
         except Exception as e:
             messagebox.showerror(
                 "خطا در ورود",
@@ -166,6 +192,7 @@ class MainWindow(ctk.CTk):
     """Main application window with sidebar navigation"""
     
     def __init__(self, current_user):
+        started = time.perf_counter()
         super().__init__()
         
         # Store current user
@@ -179,15 +206,36 @@ class MainWindow(ctk.CTk):
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(0, weight=1)
         
-        # Initialize modules dictionary
+        # Initialize modules dictionary (sections are built on first use)
         self.modules = {}
+        self.module_classes = {}
+        self.module_build_times = {}
         self.current_module_frame = None
+        self.current_module_id = None
+        
+        # Sections showing data that changed since they last loaded
+        self.dirty_modules = set()
+        self.refresh_job = None
         
         # Setup UI
         self.setup_ui()
         
         # Show first module
         self.show_module('salon')
+        logger.info(f"Main window ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+        
+        # Build the next likely sections once the window is idle
+        self.warm_queue = [m for m in WARM_MODULES if m not in self.modules]
+        self.after_idle(self.warm_next_module)
+        
+        # Watch for changes made here or by other programs
+        self.after(CHANGE_POLL_MS, self.poll_changes)
+        
+        # Take scheduled backup archives in the background
+        db_path = get_db_manager().db_path
+        self.backup_scheduler = BackupScheduler(db_path) if db_path else None
+        self.backup_job = None
+        self.after(BACKUP_CHECK_MS, self.check_backup_schedule)
     
     def setup_ui(self):
         """Setup the main window UI"""
@@ -215,23 +263,8 @@ class MainWindow(ctk.CTk):
         subtitle_label.grid(row=1, column=0, padx=20, pady=(0, 20))
         
         # Navigation buttons
-        modules_config = [
-            ('salon', 'آرایشگاه', SalonSection),
-            ('cafe', 'کافه', CafeSection),
-            ('gamnet', 'گیم نت', GamnetSection),
-            ('inventory', 'انبار', InventorySection),
-            ('invoice', 'فاکتور', InvoiceSection),
-            ('customer', 'مشتریان', CustomerSection),
-            ('employee', 'کارمندان', EmployeeSection),
-            ('reports', 'گزارشات', ReportsSection),
-            ('supplier_expense', 'تامین کنندگان', SupplierExpenseSection),
-            ('campaign', 'کمپین ها', CampaignSection),
-            ('sms', 'پیامک', SmsSection),
-            ('settings', 'تنظیمات', SettingsSection),
-        ]
-        
         row = 2
-        for module_id, label, module_class in modules_config:
+        for module_id, label, module_path, class_name in SECTIONS:
             btn = ctk.CTkButton(
                 self.sidebar_frame,
                 text=label,
@@ -249,8 +282,8 @@ class MainWindow(ctk.CTk):
             btn.grid(row=row, column=0, padx=10, pady=5, sticky="ew")
             row += 1
             
-            # Initialize module (create instance but don't add to grid yet)
-            self.modules[module_id] = module_class(self, self.current_user)
+            # Register module; it is imported and created when first shown
+            self.module_classes[module_id] = (module_path, class_name)
         
         # Create content frame
         self.content_frame = ctk.CTkFrame(self, corner_radius=0)
@@ -258,13 +291,116 @@ class MainWindow(ctk.CTk):
         self.content_frame.grid_rowconfigure(0, weight=1)
         self.content_frame.grid_columnconfigure(0, weight=1)
     
+    def get_module(self, module_id):
+        """
+        Get a module instance, creating it on first use
+        
+        Args:
+            module_id (str): Module identifier
+        
+        Returns:
+            CTkFrame: The module section
+        """
+        if module_id not in self.modules:
+            started = time.perf_counter()
+            module_path, class_name = self.module_classes[module_id]
+            section_class = getattr(importlib.import_module(module_path), class_name)
+            imported = time.perf_counter()
+            self.modules[module_id] = section_class(self, self.current_user)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.module_build_times[module_id] = elapsed_ms
+            logger.info(
+                f"Section '{module_id}' built in {elapsed_ms:.0f} ms "
+                f"(import {(imported - started) * 1000:.0f} ms)"
+            )
+        return self.modules[module_id]
+    
+    def warm_next_module(self):
+        """Build one queued section in idle time, then schedule the next"""
+        while self.warm_queue and self.warm_queue[0] in self.modules:
+            self.warm_queue.pop(0)
+        
+        if not self.warm_queue:
+            self.log_startup_timings()
+            return
+        
+        self.get_module(self.warm_queue.pop(0))
+        self.after(WARM_DELAY_MS, lambda: self.after_idle(self.warm_next_module))
+    
+    def log_startup_timings(self):
+        """Log how long each section took to import and build"""
+        breakdown = ', '.join(
+            f"{module_id} {elapsed_ms:.0f} ms"
+            for module_id, elapsed_ms in sorted(self.module_build_times.items(), key=lambda item: -item[1])
+        )
+        total_ms = sum(self.module_build_times.values())
+        logger.info(f"Section build times ({total_ms:.0f} ms total): {breakdown}")
+    
     def show_module(self, module_id):
         """Show the selected module"""
-        if module_id in self.modules:
-            # Hide current module
+        if module_id in self.module_classes:
+            # Hide current module and drop its pending loads
             if self.current_module_frame:
                 self.current_module_frame.grid_forget()
+                loader = getattr(self.current_module_frame, 'loader', None)
+                if loader is not None and self.current_module_frame is not self.modules.get(module_id):
+                    loader.cancel_all()
             
-            # Show new module
-            self.current_module_frame = self.modules[module_id]
+            # Show new module and restart loads cancelled while it was hidden
+            self.current_module_frame = self.get_module(module_id)
+            self.current_module_id = module_id
             self.current_module_frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
+            loader = getattr(self.current_module_frame, 'loader', None)
+            if loader is not None:
+                loader.resume()
+            
+            # Catch up on changes made while it was hidden
+            if module_id in self.dirty_modules:
+                self.schedule_refresh()
+    
+    def poll_changes(self):
+        """Mark sections whose tables changed since the last poll"""
+        db_manager = get_db_manager()
+        if db_manager.restoring:
+            # The database file is being swapped; look again next time
+            self.after(CHANGE_POLL_MS, self.poll_changes)
+            return
+        
+        try:
+            changed = change_tracker.poll(db_manager.engine)
+        except Exception as e:
+            logger.warning(f"Change check failed: {e}")
+            changed = frozenset()
+        
+        if changed:
+            for module_id, section in self.modules.items():
+                if changed.intersection(getattr(section, 'WATCHED_TABLES', ())):
+                    self.dirty_modules.add(module_id)
+            
+            if self.current_module_id in self.dirty_modules:
+                self.schedule_refresh()
+        
+        self.after(CHANGE_POLL_MS, self.poll_changes)
+    
+    def check_backup_schedule(self):
+        """Start a scheduled backup on a worker thread if one is due"""
+        if self.backup_scheduler is not None and (self.backup_job is None or self.backup_job.done()):
+            if self.backup_job is not None and self.backup_job.exception() is not None:
+                logger.error(f"Scheduled backup failed: {self.backup_job.exception()}")
+            self.backup_job = get_executor().submit(self.backup_scheduler.run_if_due)
+        
+        self.after(BACKUP_CHECK_MS, self.check_backup_schedule)
+    
+    def schedule_refresh(self):
+        """Reload the visible section once changes stop arriving"""
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+        self.refresh_job = self.after(CHANGE_DEBOUNCE_MS, self.refresh_current_module)
+    
+    def refresh_current_module(self):
+        """Reload the visible section if it is stale"""
+        self.refresh_job = None
+        module_id = self.current_module_id
+        if module_id in self.dirty_modules:
+            self.dirty_modules.discard(module_id)
+            self.modules[module_id].refresh_data()
@@ -3,41 +3,73 @@
 """
 Main entry point for the Kagan Business Management System
 Supports cafe-bar, salon, and gaming net management
+
+Only customtkinter, auth, database and the window classes are imported
+before the login dialog appears; each business section is imported the
+first time it is opened. To see where startup time goes:
+    
+    python main.py --profile-startup
 """
 
-import customtkinter as ctk
+import sys
 import logging
-from gui import MainWindow, LoginDialog
-from database.db_manager import initialize_database, get_db_manager
-from database.models import UserRole
-from auth import AuthService
-from utils import setup_logging
+import argparse
+from utils import setup_logging, StartupProfile
+
+
+def import_startup_modules(profile):
+    """
+    Import what the login dialog needs, one timed phase per package
+    
+    Args:
+        profile (StartupProfile): Startup timings
+    """
+    with profile.phase("import customtkinter"):
+        import customtkinter
+    with profile.phase("import sqlalchemy"):
+        import sqlalchemy.orm
+    with profile.phase("import database"):
+        import database.db_manager
+    with profile.phase("import auth"):
+        import auth
+    with profile.phase("import gui"):
+        import gui
 
 
-def initialize_app():
+def initialize_app(profile=None):
     """Initialize application (database, logging, default data)"""
+    profile = profile or StartupProfile()
+    
     # Setup logging
-    setup_logging()
+    with profile.phase("setup logging"):
+        setup_logging()
     logger = logging.getLogger(__name__)
     logger.info("Starting Kagan Business Management System")
     
+    import_startup_modules(profile)
+    from database.db_manager import initialize_database
+    
     # Initialize database
-    initialize_database()
+    with profile.phase("initialize_database"):
+        initialize_database()
     logger.info("Database initialized")
     
     # Create default admin user if no users exist
-    create_default_admin()
+    with profile.phase("create_default_admin"):
+        create_default_admin()
     logger.info("Application initialization complete")
 
 
 def create_default_admin():
     """Create default admin user if no users exist"""
+    from database.db_manager import get_db_manager
+    from database.models import User, UserRole
+    from auth import AuthService
+    
     logger = logging.getLogger(__name__)
     db_manager = get_db_manager()
     
     with db_manager.session_scope() as session:
-        from database.models import User
-        
         # Check if any users exist
         user_count = session.query(User).count()
         
@@ -56,24 +88,45 @@ def create_default_admin():
                 logger.error(f"Failed to create default admin user: {e}")
 
 
-def main():
+def main(argv=None):
     """Main application entry point"""
+    parser = argparse.ArgumentParser(description="Kagan Business Management System")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Print how long each import and startup phase takes")
+    args = parser.parse_args(argv)
+    
+    profile = StartupProfile()
+    
     # Initialize application
-    initialize_app()
+    initialize_app(profile)
+    
+    import customtkinter as ctk
+    from gui import MainWindow, LoginDialog
     
     # Set appearance mode and color theme
     ctk.set_appearance_mode("light")
     ctk.set_default_color_theme("blue")
     
     # Create login window
-    login = LoginDialog()
+    with profile.phase("build login window"):
+        login = LoginDialog()
+        login.update_idletasks()
+    if args.profile_startup:
+        print("Startup profile (until the login dialog):")
+        print(profile.report())
     login.mainloop()
     
     # If login was successful, show main window
     if login.login_successful:
-        app = MainWindow(login.current_user)
+        with profile.phase("build main window"):
+            app = MainWindow(login.current_user)
+            app.update_idletasks()
+        if args.profile_startup:
+            print("Startup profile (after login):")
+            print(profile.report())
         app.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
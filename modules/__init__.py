@@ -5,19 +5,25 @@ Modules package for Kagan Business Management System
 Contains all business module sections
 """
 
-from .salon_section import SalonSection
-from .cafe_section import CafeSection
-from .gamnet_section import GamnetSection
-from .inventory_section import InventorySection
-from .invoice_section import InvoiceSection
-from .customer_section import CustomerSection
-from .employee_section import EmployeeSection
-from .reports_section import ReportsSection
-from .supplier_expense_section import SupplierExpenseSection
-from .campaign_section import CampaignSection
-from .sms_section import SmsSection
-from .sms_service import SmsService
-from .settings_section import SettingsSection
+import importlib
+
+# Sections are imported on first access so that importing one submodule
+# (e.g. modules.data_loader) does not pull in every screen
+_LAZY_EXPORTS = {
+    'SalonSection': '.salon_section',
+    'CafeSection': '.cafe_section',
+    'GamnetSection': '.gamnet_section',
+    'InventorySection': '.inventory_section',
+    'InvoiceSection': '.invoice_section',
+    'CustomerSection': '.customer_section',
+    'EmployeeSection': '.employee_section',
+    'ReportsSection': '.reports_section',
+    'SupplierExpenseSection': '.supplier_expense_section',
+    'CampaignSection': '.campaign_section',
+    'SmsSection': '.sms_section',
+    'SmsService': '.sms_service',
+    'SettingsSection': '.settings_section',
+}
 
 __all__ = [
     'SalonSection',
@@ -34,3 +40,11 @@ __all__ = [
     'SmsService',
     'SettingsSection',
 ]
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
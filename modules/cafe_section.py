@@ -7,19 +7,26 @@ Manages cafe/bar orders, menu, and cafe-specific operations
 
 import customtkinter as ctk
 from tkinter import messagebox
-from datetime import datetime
-from database.models import Order, OrderItem, Product, Customer
+from database.models import OrderItem, Product, Customer
 from database.db_manager import get_db_manager
+from database import queries, dashboard
+from database.catalog import catalog
+from modules.data_loader import DataLoader, PagedListLoader, clear_frame
+from modules.virtual_list import VirtualList
 from utils import Validator, NumberFormatter
 
 
 class CafeSection(ctk.CTkFrame):
     """Cafe management section"""
     
+    # Tables whose changes make this section stale
+    WATCHED_TABLES = ('orders', 'products', 'daily_rollup')
+    
     def __init__(self, parent, current_user):
         super().__init__(parent, corner_radius=15, fg_color="white")
         self.current_user = current_user
         self.db_manager = get_db_manager()
+        self.loader = DataLoader(self)
         self.setup_ui()
     
     def setup_ui(self):
@@ -90,8 +97,20 @@ class CafeSection(ctk.CTkFrame):
         refresh_btn.pack(side="right", padx=5)
         
         # Orders list
-        self.orders_list_frame = ctk.CTkScrollableFrame(tab, label_text="سفارشات فعال")
+        self.orders_list_frame = VirtualList(
+            tab,
+            render_item=self.format_order,
+            label_text="سفارشات فعال",
+            empty_text="سفارشی یافت نشد"
+        )
         self.orders_list_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        self.orders_pager = PagedListLoader(
+            self.loader,
+            'orders',
+            self.orders_list_frame,
+            queries.active_orders_page,
+            error_text="خطا در بارگذاری سفارشات"
+        )
         
         self.refresh_orders()
     
@@ -113,8 +132,14 @@ class CafeSection(ctk.CTkFrame):
         add_btn.pack(side="right", padx=5)
         
         # Menu list
-        self.menu_list_frame = ctk.CTkScrollableFrame(tab, label_text="منوی کافه")
+        self.menu_list_frame = VirtualList(
+            tab,
+            render_item=self.format_menu_item,
+            label_text="منوی کافه",
+            empty_text="محصولی یافت نشد"
+        )
         self.menu_list_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        self.menu_version = None
         
         self.refresh_menu()
     
@@ -133,39 +158,18 @@ class CafeSection(ctk.CTkFrame):
         
         self.refresh_daily_report()
     
+    def refresh_data(self):
+        """Reload everything the section shows"""
+        self.refresh_orders()
+        self.refresh_menu()
+        self.refresh_daily_report()
+    
     def refresh_orders(self):
         """Refresh active orders list"""
-        # Clear existing items
-        for widget in self.orders_list_frame.winfo_children():
-            widget.destroy()
-        
-        try:
-            with self.db_manager.session_scope() as session:
-                # Get active orders
-                orders = session.query(Order).filter(
-                    Order.status.in_(['pending', 'preparing', 'ready'])
-                ).order_by(Order.created_at.desc()).limit(20).all()
-                
-                if not orders:
-                    no_data_label = ctk.CTkLabel(
-                        self.orders_list_frame,
-                        text="سفارشی یافت نشد",
-                        font=("Vazir", 12),
-                        text_color="gray"
-                    )
-                    no_data_label.pack(pady=20)
-                else:
-                    for order in orders:
-                        self.create_order_item(order)
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در بارگذاری سفارشات: {str(e)}")
+        self.orders_pager.reload()
     
-    def create_order_item(self, order):
-        """Create order list item"""
-        item_frame = ctk.CTkFrame(self.orders_list_frame, fg_color="#f8f9fa", corner_radius=10)
-        item_frame.pack(pady=5, padx=5, fill="x")
-        
-        # Order info
+    def format_order(self, order):
+        """Row text for an order"""
         table_info = f"میز: {order.table_number}" if order.table_number else "بدون میز"
         total_str = NumberFormatter.format_currency(order.total_amount, "تومان")
         status_map = {
@@ -177,111 +181,67 @@ class CafeSection(ctk.CTkFrame):
         }
         status = status_map.get(order.status, order.status)
         
-        info_text = f"سفارش #{order.id} - {table_info}\nمبلغ: {total_str} - وضعیت: {status}"
-        info_label = ctk.CTkLabel(
-            item_frame,
-            text=info_text,
-            font=("Vazir", 11),
-            anchor="e",
-            justify="right"
-        )
-        info_label.pack(side="right", padx=10, pady=10)
+        return f"سفارش #{order.id} - {table_info}\nمبلغ: {total_str} - وضعیت: {status}"
     
     def refresh_menu(self):
-        """Refresh menu items"""
-        # Clear existing items
-        for widget in self.menu_list_frame.winfo_children():
-            widget.destroy()
-        
-        try:
-            with self.db_manager.session_scope() as session:
-                # Get cafe products
-                products = session.query(Product).filter_by(
-                    category='cafe',
-                    is_active=True
-                ).all()
-                
-                if not products:
-                    no_data_label = ctk.CTkLabel(
-                        self.menu_list_frame,
-                        text="محصولی یافت نشد",
-                        font=("Vazir", 12),
-                        text_color="gray"
-                    )
-                    no_data_label.pack(pady=20)
-                else:
-                    for product in products:
-                        self.create_menu_item(product)
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در بارگذاری منو: {str(e)}")
+        """Refresh menu items from the reference catalog"""
+        if catalog.loaded:
+            # Redraw only if products changed since the last draw
+            if catalog.version != self.menu_version:
+                self.show_menu((catalog.version, catalog.by_group(Product, 'cafe')))
+            return
+        
+        self.loader.load(
+            'menu',
+            self.query_menu,
+            self.show_menu,
+            target=self.menu_list_frame,
+            error_text="خطا در بارگذاری منو"
+        )
     
-    def create_menu_item(self, product):
-        """Create menu list item"""
-        item_frame = ctk.CTkFrame(self.menu_list_frame, fg_color="#f8f9fa", corner_radius=10)
-        item_frame.pack(pady=5, padx=5, fill="x")
-        
-        # Product info
+    def query_menu(self, session):
+        """Load the reference catalog (runs on a loader thread)"""
+        catalog.ensure_loaded(session)
+        return catalog.version, catalog.by_group(Product, 'cafe')
+    
+    def show_menu(self, menu):
+        """Display menu items"""
+        self.menu_version, products = menu
+        self.menu_list_frame.set_items(products)
+    
+    def format_menu_item(self, product):
+        """Row text for a menu product"""
         price_str = NumberFormatter.format_currency(product.price, "تومان")
         stock_info = f"موجودی: {product.stock_quantity}"
         
-        info_text = f"{product.name}\nقیمت: {price_str} - {stock_info}"
-        info_label = ctk.CTkLabel(
-            item_frame,
-            text=info_text,
-            font=("Vazir", 11),
-            anchor="e",
-            justify="right"
-        )
-        info_label.pack(side="right", padx=10, pady=10)
+        return f"{product.name}\nقیمت: {price_str} - {stock_info}"
     
     def refresh_daily_report(self):
         """Refresh daily sales report"""
+        self.loader.load(
+            'daily_report',
+            dashboard.get_snapshot,
+            self.show_daily_report,
+            target=self.report_frame,
+            error_text="خطا در بارگذاری گزارش"
+        )
+    
+    def show_daily_report(self, snapshot):
+        """Display daily sales report"""
         # Clear existing widgets
-        for widget in self.report_frame.winfo_children():
-            widget.destroy()
+        clear_frame(self.report_frame)
+        
+        # Display stats
+        sales_str = NumberFormatter.format_currency(snapshot.order_total_today, "تومان")
+        stats_text = f"تعداد سفارشات: {snapshot.orders_today}\nفروش کل: {sales_str}\nپرداخت شده: {snapshot.paid_orders_today}"
         
-        try:
-            with self.db_manager.session_scope() as session:
-                # Get today's orders
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                
-                from sqlalchemy import func
-                
-                # Total orders
-                total_orders = session.query(Order).filter(
-                    Order.created_at >= today
-                ).count()
-                
-                # Total sales
-                total_sales = session.query(func.sum(Order.total_amount)).filter(
-                    Order.created_at >= today
-                ).scalar() or 0
-                
-                # Paid orders
-                paid_orders = session.query(Order).filter(
-                    Order.created_at >= today,
-                    Order.status == 'paid'
-                ).count()
-                
-                # Display stats
-                sales_str = NumberFormatter.format_currency(total_sales, "تومان")
-                stats_text = f"تعداد سفارشات: {total_orders}\nفروش کل: {sales_str}\nپرداخت شده: {paid_orders}"
-                
-                stats_label = ctk.CTkLabel(
-                    self.report_frame,
-                    text=stats_text,
-                    font=("Vazir", 14),
-                    justify="right"
-                )
-                stats_label.pack(pady=20, padx=20)
-        except Exception as e:
-            error_label = ctk.CTkLabel(
-                self.report_frame,
-                text=f"خطا در بارگذاری گزارش: {str(e)}",
-                font=("Vazir", 12),
-                text_color="red"
-            )
-            error_label.pack(pady=20)
+        stats_label = ctk.CTkLabel(
+            self.report_frame,
+            text=stats_text,
+            font=("Vazir", 14),
+            justify="right"
+        )
+        stats_label.pack(pady=20, padx=20)
     
     def show_new_order_dialog(self):
         """Show dialog to create new order"""
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Data Loader Module
+Runs section queries on worker threads and hands the results back to Tk
+"""
+
+import queue
+import logging
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import customtkinter as ctk
+from database.db_manager import get_db_manager
+from database import diagnostics
+
+logger = logging.getLogger(__name__)
+
+# Worker threads shared by every section
+MAX_WORKERS = 4
+
+# How often the Tk thread checks for finished loads
+POLL_INTERVAL_MS = 30
+
+_executor = None
+
+
+def get_executor():
+    """
+    Get the shared worker pool, creating it on first use
+    
+    Returns:
+        ThreadPoolExecutor: Worker pool for database loads
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="kagan-loader")
+    return _executor
+
+
+def clear_frame(frame):
+    """Destroy all child widgets of a frame"""
+    for widget in frame.winfo_children():
+        widget.destroy()
+
+
+def show_message(frame, text, text_color="gray"):
+    """
+    Replace a frame's content with a single message label
+    
+    Args:
+        frame: Target frame
+        text (str): Message text
+        text_color (str): Label color
+    """
+    # Widgets such as VirtualList manage their own message area
+    if hasattr(frame, 'show_message'):
+        frame.show_message(text, text_color)
+        return
+    
+    clear_frame(frame)
+    label = ctk.CTkLabel(
+        frame,
+        text=text,
+        font=("Vazir", 12),
+        text_color=text_color
+    )
+    label.pack(pady=20)
+
+
+class DataLoader:
+    """
+    Background loader bound to one section
+    
+    Each load has a key (e.g. 'orders'). Queries run on the shared worker
+    pool with their own session and must return plain data, never live ORM
+    objects. Results are delivered on the Tk thread by polling with after().
+    A load requested while the same key is still running is collapsed into
+    a single rerun, and results of cancelled loads are dropped.
+    """
+    
+    def __init__(self, widget):
+        self.widget = widget
+        self.db_manager = get_db_manager()
+        self._results = queue.Queue()
+        self._jobs = {}
+        self._cancelled = {}
+        self._generations = itertools.count()
+        self._polling = False
+    
+    def load(self, key, query, on_success, target=None, on_error=None,
+             error_text="خطا در بارگذاری اطلاعات"):
+        """
+        Start a background load
+        
+        Args:
+            key (str): Load identifier within the section
+            query (callable): query(session) -> plain data, runs on a worker thread
+            on_success (callable): on_success(data), runs on the Tk thread
+            target: Frame that shows the loading indicator and errors
+            on_error (callable): on_error(exception), replaces the default error display
+            error_text (str): Message prefix for the default error display
+        """
+        request = (query, on_success, target, on_error, error_text)
+        self._cancelled.pop(key, None)
+        
+        job = self._jobs.get(key)
+        if job is not None:
+            # Already loading: refresh once more when the current load ends
+            job['rerun'] = request
+            return
+        
+        self._start(key, request)
+    
+    def cancel(self, key, remember=False):
+        """
+        Cancel a load; a result that still arrives is discarded
+        
+        Args:
+            key (str): Load identifier
+            remember (bool): Keep the request so resume() starts it again
+        """
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            job['future'].cancel()
+            if remember:
+                self._cancelled[key] = job['rerun'] or job['request']
+    
+    def cancel_all(self):
+        """Cancel every in-flight load of this section until resume()"""
+        for key in list(self._jobs):
+            self.cancel(key, remember=True)
+    
+    def resume(self):
+        """Restart loads cancelled by cancel_all() (e.g. when the section is shown again)"""
+        cancelled, self._cancelled = self._cancelled, {}
+        for key, request in cancelled.items():
+            self._start(key, request)
+    
+    def is_loading(self, key=None):
+        """Check whether a load (or any load) is in flight"""
+        return key in self._jobs if key is not None else bool(self._jobs)
+    
+    def _start(self, key, request):
+        """Submit a load to the worker pool (Tk thread)"""
+        query, _on_success, target, _on_error, _error_text = request
+        generation = next(self._generations)
+        
+        if target is not None:
+            show_message(target, "در حال بارگذاری...")
+        
+        future = get_executor().submit(self._run, key, generation, query)
+        self._jobs[key] = {
+            'generation': generation,
+            'future': future,
+            'request': request,
+            'rerun': None,
+        }
+        self._schedule_poll()
+    
+    def _run(self, key, generation, query):
+        """Execute a query with its own session (worker thread)"""
+        try:
+            with diagnostics.action(f"{type(self.widget).__name__}.{key}"):
+                with self.db_manager.session_scope() as session:
+                    data = query(session)
+            self._results.put((key, generation, True, data))
+        except Exception as e:
+            logger.exception(f"Background load '{key}' failed")
+            self._results.put((key, generation, False, e))
+    
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(POLL_INTERVAL_MS, self._poll)
+    
+    def _poll(self):
+        """Deliver finished loads (Tk thread)"""
+        self._polling = False
+        
+        while True:
+            try:
+                key, generation, ok, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            
+            job = self._jobs.get(key)
+            if job is None or job['generation'] != generation:
+                continue  # cancelled or superseded
+            
+            del self._jobs[key]
+            if job['rerun'] is not None:
+                self._start(key, job['rerun'])
+                continue
+            
+            _query, on_success, target, on_error, error_text = job['request']
+            try:
+                if ok:
+                    on_success(payload)
+                elif on_error is not None:
+                    on_error(payload)
+                elif target is not None:
+                    show_message(target, f"{error_text}: {payload}", text_color="red")
+            except Exception:
+                logger.exception(f"Displaying load '{key}' failed")
+        
+        if self._jobs:
+            self._schedule_poll()
+
+
+class PagedListLoader:
+    """
+    Feeds a VirtualList one keyset page at a time
+    
+    The first page is shown as soon as it arrives and the following page is
+    fetched right away in the background, so scrolling to the end of the
+    list appends an already loaded page. If fetching the next page fails,
+    the error is shown in the list and the next scroll to the end tries
+    again from the same cursor.
+    
+    Args:
+        loader (DataLoader): The section's loader
+        key (str): Load identifier within the section
+        list_widget (VirtualList): List to fill
+        query_page (callable): query_page(session, cursor) -> Page, runs on a worker thread
+        error_text (str): Message prefix shown if a load fails
+    """
+    
+    def __init__(self, loader, key, list_widget, query_page, error_text="خطا در بارگذاری اطلاعات"):
+        self.loader = loader
+        self.key = key
+        self.next_key = f"{key}:next"
+        self.list_widget = list_widget
+        self.query_page = query_page
+        self.error_text = error_text
+        
+        self.generation = 0
+        self.cursor = None
+        self.has_more = False
+        self.prefetched = None
+        self.waiting = False
+        self.failed = False
+        
+        list_widget.on_scroll_end = self.on_scroll_end
+    
+    def reload(self):
+        """Start over from the first page"""
+        self.generation += 1
+        generation = self.generation
+        self.loader.cancel(self.next_key)
+        self.cursor = None
+        self.has_more = False
+        self.prefetched = None
+        self.waiting = False
+        self.failed = False
+        
+        self.loader.load(
+            self.key,
+            lambda session: self.query_page(session, None),
+            lambda page: self.show_first_page(generation, page),
+            target=self.list_widget,
+            error_text=self.error_text
+        )
+    
+    def show_first_page(self, generation, page):
+        if generation != self.generation:
+            return
+        self.list_widget.set_items(page.items)
+        self.list_widget.scroll_to(0)
+        self.set_position(page)
+    
+    def set_position(self, page):
+        """Remember where the next page starts and prefetch it"""
+        self.cursor = page.cursor
+        self.has_more = page.has_more
+        if self.has_more:
+            self.prefetch()
+    
+    def prefetch(self):
+        """Fetch the page after the cursor in the background"""
+        self.failed = False
+        generation = self.generation
+        cursor = self.cursor
+        self.loader.load(
+            self.next_key,
+            lambda session: self.query_page(session, cursor),
+            lambda next_page: self.store_prefetched(generation, next_page),
+            on_error=lambda error: self.prefetch_failed(generation, error)
+        )
+    
+    def prefetch_failed(self, generation, error):
+        if generation != self.generation:
+            return
+        self.failed = True
+        show_message(self.list_widget, f"{self.error_text}: {error}", text_color="red")
+    
+    def store_prefetched(self, generation, page):
+        if generation != self.generation:
+            return
+        self.prefetched = page
+        if self.waiting:
+            self.append_prefetched()
+    
+    def append_prefetched(self):
+        """Append the prefetched page and start fetching the one after"""
+        page, self.prefetched = self.prefetched, None
+        self.waiting = False
+        self.list_widget.append_items(page.items)
+        self.set_position(page)
+    
+    def on_scroll_end(self):
+        """Called by the list when its last rows become visible"""
+        if self.prefetched is not None:
+            self.append_prefetched()
+        elif self.has_more:
+            self.waiting = True
+            if self.failed:
+                show_message(self.list_widget, "در حال بارگذاری...")
+                self.prefetch()
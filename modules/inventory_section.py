@@ -7,18 +7,24 @@ Manages inventory, stock levels, and product management
 
 import customtkinter as ctk
 from tkinter import messagebox
-from database.models import Product
 from database.db_manager import get_db_manager
+from database import queries, dashboard
+from modules.data_loader import DataLoader, PagedListLoader, clear_frame
+from modules.virtual_list import VirtualList
 from utils import NumberFormatter, is_stock_low
 
 
 class InventorySection(ctk.CTkFrame):
     """Inventory management section"""
     
+    # Tables whose changes make this section stale
+    WATCHED_TABLES = ('products',)
+    
     def __init__(self, parent, current_user):
         super().__init__(parent, corner_radius=15, fg_color="white")
         self.current_user = current_user
         self.db_manager = get_db_manager()
+        self.loader = DataLoader(self)
         self.setup_ui()
     
     def setup_ui(self):
@@ -89,8 +95,20 @@ class InventorySection(ctk.CTkFrame):
         refresh_btn.pack(side="right", padx=5)
         
         # Products list
-        self.all_products_frame = ctk.CTkScrollableFrame(tab, label_text="لیست محصولات")
+        self.all_products_frame = VirtualList(
+            tab,
+            render_item=self.format_product,
+            label_text="لیست محصولات",
+            empty_text="محصولی یافت نشد"
+        )
         self.all_products_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        self.all_products_pager = PagedListLoader(
+            self.loader,
+            'all_products',
+            self.all_products_frame,
+            queries.products_page,
+            error_text="خطا در بارگذاری محصولات"
+        )
         
         self.refresh_all_products()
     
@@ -106,8 +124,22 @@ class InventorySection(ctk.CTkFrame):
         info_label.pack(pady=10)
         
         # Low stock list
-        self.low_stock_frame = ctk.CTkScrollableFrame(tab, label_text="هشدار موجودی کم")
+        self.low_stock_frame = VirtualList(
+            tab,
+            render_item=self.format_product,
+            row_color=lambda product: "#fff3cd",
+            label_text="هشدار موجودی کم",
+            empty_text="همه محصولات موجودی کافی دارند",
+            empty_color="green"
+        )
         self.low_stock_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        self.low_stock_pager = PagedListLoader(
+            self.loader,
+            'low_stock',
+            self.low_stock_frame,
+            queries.low_stock_page,
+            error_text="خطا در بارگذاری محصولات"
+        )
         
         self.refresh_low_stock()
     
@@ -126,123 +158,55 @@ class InventorySection(ctk.CTkFrame):
         
         self.refresh_report()
     
+    def refresh_data(self):
+        """Reload everything the section shows"""
+        self.refresh_all_products()
+        self.refresh_low_stock()
+        self.refresh_report()
+    
     def refresh_all_products(self):
         """Refresh all products list"""
-        # Clear existing items
-        for widget in self.all_products_frame.winfo_children():
-            widget.destroy()
-        
-        try:
-            with self.db_manager.session_scope() as session:
-                products = session.query(Product).filter_by(is_active=True).all()
-                
-                if not products:
-                    no_data_label = ctk.CTkLabel(
-                        self.all_products_frame,
-                        text="محصولی یافت نشد",
-                        font=("Vazir", 12),
-                        text_color="gray"
-                    )
-                    no_data_label.pack(pady=20)
-                else:
-                    for product in products:
-                        self.create_product_item(self.all_products_frame, product)
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در بارگذاری محصولات: {str(e)}")
+        self.all_products_pager.reload()
     
     def refresh_low_stock(self):
         """Refresh low stock items"""
-        # Clear existing items
-        for widget in self.low_stock_frame.winfo_children():
-            widget.destroy()
-        
-        try:
-            with self.db_manager.session_scope() as session:
-                products = session.query(Product).filter(
-                    Product.is_active == True,
-                    Product.stock_quantity <= Product.min_stock_level
-                ).all()
-                
-                if not products:
-                    no_data_label = ctk.CTkLabel(
-                        self.low_stock_frame,
-                        text="همه محصولات موجودی کافی دارند",
-                        font=("Vazir", 12),
-                        text_color="green"
-                    )
-                    no_data_label.pack(pady=20)
-                else:
-                    for product in products:
-                        self.create_product_item(self.low_stock_frame, product, highlight_low=True)
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در بارگذاری محصولات: {str(e)}")
+        self.low_stock_pager.reload()
     
-    def create_product_item(self, parent_frame, product, highlight_low=False):
-        """Create product list item"""
-        fg_color = "#fff3cd" if highlight_low else "#f8f9fa"
-        
-        item_frame = ctk.CTkFrame(parent_frame, fg_color=fg_color, corner_radius=10)
-        item_frame.pack(pady=5, padx=5, fill="x")
-        
-        # Product info
+    def format_product(self, product):
+        """Row text for a product"""
         price_str = NumberFormatter.format_currency(product.price, "تومان")
         stock_status = "⚠️ کم" if is_stock_low(product.stock_quantity, product.min_stock_level) else "✓ کافی"
         category_map = {'cafe': 'کافه', 'salon': 'آرایشگاه', 'general': 'عمومی'}
         category = category_map.get(product.category, product.category or 'عمومی')
         
-        info_text = f"{product.name} ({category})\nقیمت: {price_str} - موجودی: {product.stock_quantity} {product.unit or ''} - وضعیت: {stock_status}"
-        info_label = ctk.CTkLabel(
-            item_frame,
-            text=info_text,
-            font=("Vazir", 11),
-            anchor="e",
-            justify="right"
-        )
-        info_label.pack(side="right", padx=10, pady=10)
+        return f"{product.name} ({category})\nقیمت: {price_str} - موجودی: {product.stock_quantity} {product.unit or ''} - وضعیت: {stock_status}"
     
     def refresh_report(self):
         """Refresh inventory report"""
+        self.loader.load(
+            'report',
+            dashboard.get_snapshot,
+            self.show_report,
+            target=self.report_frame,
+            error_text="خطا در بارگذاری گزارش"
+        )
+    
+    def show_report(self, snapshot):
+        """Display inventory report"""
         # Clear existing widgets
-        for widget in self.report_frame.winfo_children():
-            widget.destroy()
+        clear_frame(self.report_frame)
+        
+        # Display stats
+        value_str = NumberFormatter.format_currency(snapshot.stock_value, "تومان")
+        stats_text = f"تعداد کل محصولات: {snapshot.product_count}\nموجودی کم: {snapshot.low_stock}\nارزش کل انبار: {value_str}"
         
-        try:
-            with self.db_manager.session_scope() as session:
-                from sqlalchemy import func
-                
-                # Total products
-                total_products = session.query(Product).filter_by(is_active=True).count()
-                
-                # Low stock count
-                low_stock_count = session.query(Product).filter(
-                    Product.is_active == True,
-                    Product.stock_quantity <= Product.min_stock_level
-                ).count()
-                
-                # Total inventory value
-                total_value = session.query(func.sum(Product.price * Product.stock_quantity)).filter_by(
-                    is_active=True
-                ).scalar() or 0
-                
-                # Display stats
-                value_str = NumberFormatter.format_currency(total_value, "تومان")
-                stats_text = f"تعداد کل محصولات: {total_products}\nموجودی کم: {low_stock_count}\nارزش کل انبار: {value_str}"
-                
-                stats_label = ctk.CTkLabel(
-                    self.report_frame,
-                    text=stats_text,
-                    font=("Vazir", 14),
-                    justify="right"
-                )
-                stats_label.pack(pady=20, padx=20)
-        except Exception as e:
-            error_label = ctk.CTkLabel(
-                self.report_frame,
-                text=f"خطا در بارگذاری گزارش: {str(e)}",
-                font=("Vazir", 12),
-                text_color="red"
-            )
-            error_label.pack(pady=20)
+        stats_label = ctk.CTkLabel(
+            self.report_frame,
+            text=stats_text,
+            font=("Vazir", 14),
+            justify="right"
+        )
+        stats_label.pack(pady=20, padx=20)
     
     def show_add_product_dialog(self):
         """Show dialog to add new product"""
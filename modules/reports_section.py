@@ -6,20 +6,24 @@ Manages financial and managerial reports with filters
 """
 
 import customtkinter as ctk
-from tkinter import messagebox
 from datetime import datetime, timedelta
-from database.models import Order, Appointment, Invoice, Expense
 from database.db_manager import get_db_manager
+from database import queries, dashboard
+from modules.data_loader import DataLoader, clear_frame
 from utils import NumberFormatter, DateFormatter
 
 
 class ReportsSection(ctk.CTkFrame):
     """Reports management section"""
     
+    # Tables whose changes make this section stale
+    WATCHED_TABLES = ('daily_rollup', 'customers', 'orders', 'products')
+    
     def __init__(self, parent, current_user):
         super().__init__(parent, corner_radius=15, fg_color="white")
         self.current_user = current_user
         self.db_manager = get_db_manager()
+        self.loader = DataLoader(self)
         self.setup_ui()
     
     def setup_ui(self):
@@ -129,6 +133,15 @@ class ReportsSection(ctk.CTkFrame):
                 col = 0
                 row += 1
         
+        # Loading and error messages for the dashboard
+        self.overview_status_label = ctk.CTkLabel(
+            tab,
+            text="",
+            font=("Vazir", 12),
+            text_color="gray"
+        )
+        self.overview_status_label.pack(pady=(0, 10))
+        
         self.refresh_overview()
     
     def create_dashboard_card(self, parent, title):
@@ -158,175 +171,137 @@ class ReportsSection(ctk.CTkFrame):
         
         return card
     
+    def refresh_data(self):
+        """Reload everything the section shows"""
+        self.refresh_sales_report()
+        self.refresh_financial_report()
+        self.refresh_overview()
+    
     def refresh_sales_report(self, *args):
         """Refresh sales report based on selected date range"""
+        # Read the filter on the Tk thread; the query runs on a loader thread
+        date_range = self.date_range_var.get()
+        start_date = self.get_start_date_for_range(date_range)
+        
+        self.loader.load(
+            'sales_report',
+            lambda session: queries.sales_summary(session, start_date),
+            lambda stats: self.show_sales_report(date_range, stats),
+            target=self.sales_report_frame,
+            error_text="خطا در بارگذاری گزارش"
+        )
+    
+    def show_sales_report(self, date_range, stats):
+        """Display sales report"""
         # Clear existing widgets
-        for widget in self.sales_report_frame.winfo_children():
-            widget.destroy()
+        clear_frame(self.sales_report_frame)
         
-        try:
-            # Get date range
-            date_range = self.date_range_var.get()
-            start_date = self.get_start_date_for_range(date_range)
-            
-            with self.db_manager.session_scope() as session:
-                from sqlalchemy import func
-                
-                # Get orders in date range
-                orders = session.query(Order).filter(
-                    Order.created_at >= start_date
-                ).all()
-                
-                # Calculate statistics
-                total_orders = len(orders)
-                total_revenue = sum(order.total_amount for order in orders)
-                paid_orders = len([o for o in orders if o.status == 'paid'])
-                
-                # Display statistics
-                stats_text = f"""
-                بازه زمانی: {date_range}
-                تعداد کل سفارشات: {total_orders}
-                درآمد کل: {NumberFormatter.format_currency(total_revenue, "تومان")}
-                سفارشات پرداخت شده: {paid_orders}
-                میانگین سفارش: {NumberFormatter.format_currency(total_revenue / total_orders if total_orders > 0 else 0, "تومان")}
-                """
-                
-                stats_label = ctk.CTkLabel(
-                    self.sales_report_frame,
-                    text=stats_text,
-                    font=("Vazir", 13),
-                    justify="right"
-                )
-                stats_label.pack(pady=20, padx=20)
-                
-        except Exception as e:
-            error_label = ctk.CTkLabel(
-                self.sales_report_frame,
-                text=f"خطا در بارگذاری گزارش: {str(e)}",
-                font=("Vazir", 12),
-                text_color="red"
-            )
-            error_label.pack(pady=20)
+        total_orders = stats.total_orders
+        total_revenue = stats.total_revenue
+        
+        # Display statistics
+        stats_text = f"""
+        بازه زمانی: {date_range}
+        تعداد کل سفارشات: {total_orders}
+        درآمد کل: {NumberFormatter.format_currency(total_revenue, "تومان")}
+        سفارشات پرداخت شده: {stats.paid_orders}
+        میانگین سفارش: {NumberFormatter.format_currency(total_revenue / total_orders if total_orders > 0 else 0, "تومان")}
+        """
+        
+        stats_label = ctk.CTkLabel(
+            self.sales_report_frame,
+            text=stats_text,
+            font=("Vazir", 13),
+            justify="right"
+        )
+        stats_label.pack(pady=20, padx=20)
     
     def refresh_financial_report(self):
         """Refresh financial report"""
+        self.loader.load(
+            'financial_report',
+            self.query_financial_report,
+            self.show_financial_report,
+            target=self.financial_report_frame,
+            error_text="خطا در بارگذاری گزارش"
+        )
+    
+    def query_financial_report(self, session):
+        """Get this month's revenue and expenses (runs on a loader thread)"""
+        start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        totals = queries.period_totals(session, start_of_month)
+        
+        return {
+            'order_revenue': totals.paid_revenue,
+            'invoice_revenue': totals.invoice_revenue,
+            'total_expenses': totals.expenses,
+        }
+    
+    def show_financial_report(self, stats):
+        """Display financial report"""
         # Clear existing widgets
-        for widget in self.financial_report_frame.winfo_children():
-            widget.destroy()
-        
-        try:
-            with self.db_manager.session_scope() as session:
-                from sqlalchemy import func
-                
-                # Get this month's data
-                start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                
-                # Calculate revenue (from orders and invoices)
-                order_revenue = session.query(func.sum(Order.total_amount)).filter(
-                    Order.created_at >= start_of_month,
-                    Order.status == 'paid'
-                ).scalar() or 0
-                
-                invoice_revenue = session.query(func.sum(Invoice.paid_amount)).filter(
-                    Invoice.invoice_date >= start_of_month
-                ).scalar() or 0
-                
-                total_revenue = order_revenue + invoice_revenue
-                
-                # Calculate expenses
-                total_expenses = session.query(func.sum(Expense.amount)).filter(
-                    Expense.expense_date >= start_of_month
-                ).scalar() or 0
-                
-                # Net profit
-                net_profit = total_revenue - total_expenses
-                
-                # Display financial summary
-                report_text = f"""
-                گزارش مالی ماه جاری
-                ────────────────────────────
-                
-                درآمد کل: {NumberFormatter.format_currency(total_revenue, "تومان")}
-                  - از سفارشات کافه: {NumberFormatter.format_currency(order_revenue, "تومان")}
-                  - از فاکتورها: {NumberFormatter.format_currency(invoice_revenue, "تومان")}
-                
-                هزینه‌های کل: {NumberFormatter.format_currency(total_expenses, "تومان")}
-                
-                سود خالص: {NumberFormatter.format_currency(net_profit, "تومان")}
-                """
-                
-                report_label = ctk.CTkLabel(
-                    self.financial_report_frame,
-                    text=report_text,
-                    font=("Vazir", 14),
-                    justify="right"
-                )
-                report_label.pack(pady=30, padx=30)
-                
-        except Exception as e:
-            error_label = ctk.CTkLabel(
-                self.financial_report_frame,
-                text=f"خطا در بارگذاری گزارش: {str(e)}",
-                font=("Vazir", 12),
-                text_color="red"
-            )
-            error_label.pack(pady=20)
+        clear_frame(self.financial_report_frame)
+        
+        order_revenue = stats['order_revenue']
+        invoice_revenue = stats['invoice_revenue']
+        total_revenue = order_revenue + invoice_revenue
+        total_expenses = stats['total_expenses']
+        
+        # Net profit
+        net_profit = total_revenue - total_expenses
+        
+        # Display financial summary
+        report_text = f"""
+        گزارش مالی ماه جاری
+        ────────────────────────────
+        
+        درآمد کل: {NumberFormatter.format_currency(total_revenue, "تومان")}
+          - از سفارشات کافه: {NumberFormatter.format_currency(order_revenue, "تومان")}
+          - از فاکتورها: {NumberFormatter.format_currency(invoice_revenue, "تومان")}
+        
+        هزینه‌های کل: {NumberFormatter.format_currency(total_expenses, "تومان")}
+        
+        سود خالص: {NumberFormatter.format_currency(net_profit, "تومان")}
+        """
+        
+        report_label = ctk.CTkLabel(
+            self.financial_report_frame,
+            text=report_text,
+            font=("Vazir", 14),
+            justify="right"
+        )
+        report_label.pack(pady=30, padx=30)
     
     def refresh_overview(self):
         """Refresh overview dashboard"""
-        try:
-            with self.db_manager.session_scope() as session:
-                from sqlalchemy import func
-                from database.models import Customer, Product
-                
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                week_ago = today - timedelta(days=7)
-                
-                # Sales today
-                sales_today = session.query(func.sum(Order.total_amount)).filter(
-                    Order.created_at >= today,
-                    Order.status == 'paid'
-                ).scalar() or 0
-                self.overview_cards['sales_today'].value_label.configure(
-                    text=NumberFormatter.format_currency(sales_today, "تومان")
-                )
-                
-                # Customers today
-                customers_today = session.query(Customer).filter(
-                    Customer.created_at >= today
-                ).count()
-                self.overview_cards['customers_today'].value_label.configure(text=str(customers_today))
-                
-                # Appointments today
-                appointments_today = session.query(Appointment).filter(
-                    Appointment.appointment_date >= today
-                ).count()
-                self.overview_cards['appointments_today'].value_label.configure(text=str(appointments_today))
-                
-                # Weekly revenue
-                weekly_revenue = session.query(func.sum(Order.total_amount)).filter(
-                    Order.created_at >= week_ago,
-                    Order.status == 'paid'
-                ).scalar() or 0
-                self.overview_cards['weekly_revenue'].value_label.configure(
-                    text=NumberFormatter.format_currency(weekly_revenue, "تومان")
-                )
-                
-                # Active orders
-                active_orders = session.query(Order).filter(
-                    Order.status.in_(['pending', 'preparing', 'ready'])
-                ).count()
-                self.overview_cards['active_orders'].value_label.configure(text=str(active_orders))
-                
-                # Low stock items
-                low_stock = session.query(Product).filter(
-                    Product.is_active == True,
-                    Product.stock_quantity <= Product.min_stock_level
-                ).count()
-                self.overview_cards['low_stock'].value_label.configure(text=str(low_stock))
-                
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در بارگذاری داشبورد: {str(e)}")
+        self.overview_status_label.configure(text="در حال بارگذاری...", text_color="gray")
+        self.loader.load(
+            'overview',
+            dashboard.get_snapshot,
+            self.show_overview,
+            on_error=self.show_overview_error
+        )
+    
+    def show_overview(self, snapshot):
+        """Display dashboard KPIs"""
+        self.overview_cards['sales_today'].value_label.configure(
+            text=NumberFormatter.format_currency(snapshot.sales_today, "تومان")
+        )
+        self.overview_cards['customers_today'].value_label.configure(text=str(snapshot.customers_today))
+        self.overview_cards['appointments_today'].value_label.configure(text=str(snapshot.appointments_today))
+        self.overview_cards['weekly_revenue'].value_label.configure(
+            text=NumberFormatter.format_currency(snapshot.weekly_revenue, "تومان")
+        )
+        self.overview_cards['active_orders'].value_label.configure(text=str(snapshot.active_orders))
+        self.overview_cards['low_stock'].value_label.configure(text=str(snapshot.low_stock))
+        self.overview_status_label.configure(text="")
+    
+    def show_overview_error(self, error):
+        """Display a dashboard loading error"""
+        self.overview_status_label.configure(
+            text=f"خطا در بارگذاری داشبورد: {str(error)}",
+            text_color="red"
+        )
     
     def get_start_date_for_range(self, date_range):
         """Get start date for the selected date range"""
@@ -335,8 +310,8 @@ class ReportsSection(ctk.CTkFrame):
         if date_range == "امروز":
             return now.replace(hour=0, minute=0, second=0, microsecond=0)
         elif date_range == "هفته جاری":
-            return now - timedelta(days=now.weekday())
+            return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
         elif date_range == "ماه جاری":
             return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         else:  # همه
-            return datetime(2000, 1, 1)
+            return None
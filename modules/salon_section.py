@@ -7,19 +7,27 @@ Manages salon services, appointments, and salon-specific operations
 
 import customtkinter as ctk
 from tkinter import messagebox
-from datetime import datetime, timedelta
-from database.models import Appointment, Service, Customer, Employee
+from datetime import datetime
+from database.models import Service, Customer, Employee
 from database.db_manager import get_db_manager
+from database import queries, dashboard
+from database.catalog import catalog
+from modules.data_loader import DataLoader, PagedListLoader, clear_frame
+from modules.virtual_list import VirtualList
 from utils import Validator, DateFormatter, NumberFormatter
 
 
 class SalonSection(ctk.CTkFrame):
     """Salon management section"""
     
+    # Tables whose changes make this section stale
+    WATCHED_TABLES = ('appointments', 'services', 'customers', 'employees', 'daily_rollup')
+    
     def __init__(self, parent, current_user):
         super().__init__(parent, corner_radius=15, fg_color="white")
         self.current_user = current_user
         self.db_manager = get_db_manager()
+        self.loader = DataLoader(self)
         self.setup_ui()
     
     def setup_ui(self):
@@ -94,10 +102,22 @@ class SalonSection(ctk.CTkFrame):
         refresh_btn.pack(side="right", padx=5)
         
         # Appointments list frame with scrollbar
-        list_frame = ctk.CTkScrollableFrame(tab, label_text="لیست نوبت‌ها")
+        list_frame = VirtualList(
+            tab,
+            render_item=self.format_appointment,
+            label_text="لیست نوبت‌ها",
+            empty_text="نوبتی یافت نشد"
+        )
         list_frame.pack(pady=10, padx=10, fill="both", expand=True)
         
         self.appointments_list_frame = list_frame
+        self.appointments_pager = PagedListLoader(
+            self.loader,
+            'appointments',
+            list_frame,
+            self.query_appointments,
+            error_text="خطا در بارگذاری نوبت‌ها"
+        )
         self.refresh_appointments()
     
     def setup_services_tab(self, tab):
@@ -118,10 +138,16 @@ class SalonSection(ctk.CTkFrame):
         add_btn.pack(side="right", padx=5)
         
         # Services list frame
-        list_frame = ctk.CTkScrollableFrame(tab, label_text="لیست خدمات")
+        list_frame = VirtualList(
+            tab,
+            render_item=self.format_service,
+            label_text="لیست خدمات",
+            empty_text="خدمتی یافت نشد"
+        )
         list_frame.pack(pady=10, padx=10, fill="both", expand=True)
         
         self.services_list_frame = list_frame
+        self.services_version = None
         self.refresh_services()
     
     def setup_report_tab(self, tab):
@@ -139,141 +165,91 @@ class SalonSection(ctk.CTkFrame):
         
         self.refresh_report()
     
+    def refresh_data(self):
+        """Reload everything the section shows"""
+        self.refresh_appointments()
+        self.refresh_services()
+        self.refresh_report()
+    
     def refresh_appointments(self):
         """Refresh appointments list"""
-        # Clear existing items
-        for widget in self.appointments_list_frame.winfo_children():
-            widget.destroy()
-        
-        try:
-            with self.db_manager.session_scope() as session:
-                # Get appointments for today and future
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                appointments = session.query(Appointment).filter(
-                    Appointment.appointment_date >= today
-                ).order_by(Appointment.appointment_date).limit(20).all()
-                
-                if not appointments:
-                    no_data_label = ctk.CTkLabel(
-                        self.appointments_list_frame,
-                        text="نوبتی یافت نشد",
-                        font=("Vazir", 12),
-                        text_color="gray"
-                    )
-                    no_data_label.pack(pady=20)
-                else:
-                    for appointment in appointments:
-                        self.create_appointment_item(appointment)
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در بارگذاری نوبت‌ها: {str(e)}")
+        self.appointments_pager.reload()
     
-    def create_appointment_item(self, appointment):
-        """Create appointment list item"""
-        item_frame = ctk.CTkFrame(self.appointments_list_frame, fg_color="#f8f9fa", corner_radius=10)
-        item_frame.pack(pady=5, padx=5, fill="x")
-        
-        # Get customer name
-        customer_name = appointment.customer.name if appointment.customer else "نامشخص"
-        service_name = appointment.service.name if appointment.service else "نامشخص"
-        stylist_name = appointment.stylist.name if appointment.stylist else "نامشخص"
+    def query_appointments(self, session, cursor):
+        """Get one page of today's and future appointments (runs on a loader thread)"""
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return queries.appointments_page(session, today, cursor)
+    
+    def format_appointment(self, appointment):
+        """Row text for an appointment"""
+        customer_name = appointment.customer_name or "نامشخص"
+        service_name = appointment.service_name or "نامشخص"
+        stylist_name = appointment.stylist_name or "نامشخص"
         
         # Date and time
         date_str = DateFormatter.format_datetime(appointment.appointment_date)
         
-        # Info label
-        info_text = f"{customer_name} - {service_name} - {stylist_name}\n{date_str} - وضعیت: {appointment.status}"
-        info_label = ctk.CTkLabel(
-            item_frame,
-            text=info_text,
-            font=("Vazir", 11),
-            anchor="e",
-            justify="right"
-        )
-        info_label.pack(side="right", padx=10, pady=10)
+        return f"{customer_name} - {service_name} - {stylist_name}\n{date_str} - وضعیت: {appointment.status}"
     
     def refresh_services(self):
-        """Refresh services list"""
-        # Clear existing items
-        for widget in self.services_list_frame.winfo_children():
-            widget.destroy()
+        """Refresh services list from the reference catalog"""
+        if catalog.loaded:
+            # Redraw only if services changed since the last draw
+            if catalog.version != self.services_version:
+                self.show_services((catalog.version, catalog.by_name(Service)))
+            return
         
-        try:
-            with self.db_manager.session_scope() as session:
-                services = session.query(Service).filter_by(is_active=True).all()
-                
-                if not services:
-                    no_data_label = ctk.CTkLabel(
-                        self.services_list_frame,
-                        text="خدمتی یافت نشد",
-                        font=("Vazir", 12),
-                        text_color="gray"
-                    )
-                    no_data_label.pack(pady=20)
-                else:
-                    for service in services:
-                        self.create_service_item(service)
-        except Exception as e:
-            messagebox.showerror("خطا", f"خطا در بارگذاری خدمات: {str(e)}")
+        self.loader.load(
+            'services',
+            self.query_services,
+            self.show_services,
+            target=self.services_list_frame,
+            error_text="خطا در بارگذاری خدمات"
+        )
     
-    def create_service_item(self, service):
-        """Create service list item"""
-        item_frame = ctk.CTkFrame(self.services_list_frame, fg_color="#f8f9fa", corner_radius=10)
-        item_frame.pack(pady=5, padx=5, fill="x")
-        
-        # Service info
+    def query_services(self, session):
+        """Load the reference catalog (runs on a loader thread)"""
+        catalog.ensure_loaded(session)
+        return catalog.version, catalog.by_name(Service)
+    
+    def show_services(self, services):
+        """Display services list"""
+        self.services_version, items = services
+        self.services_list_frame.set_items(items)
+    
+    def format_service(self, service):
+        """Row text for a service"""
         price_str = NumberFormatter.format_currency(service.price, "تومان")
         duration_str = f"{service.duration} دقیقه" if service.duration else "نامشخص"
         
-        info_text = f"{service.name}\nقیمت: {price_str} - مدت: {duration_str}"
-        info_label = ctk.CTkLabel(
-            item_frame,
-            text=info_text,
-            font=("Vazir", 11),
-            anchor="e",
-            justify="right"
-        )
-        info_label.pack(side="right", padx=10, pady=10)
+        return f"{service.name}\nقیمت: {price_str} - مدت: {duration_str}"
     
     def refresh_report(self):
         """Refresh daily report"""
+        self.loader.load(
+            'report',
+            dashboard.get_snapshot,
+            self.show_report,
+            target=self.report_frame,
+            error_text="خطا در بارگذاری گزارش"
+        )
+    
+    def show_report(self, snapshot):
+        """Display daily report"""
         # Clear existing widgets
-        for widget in self.report_frame.winfo_children():
-            widget.destroy()
+        clear_frame(self.report_frame)
         
-        try:
-            with self.db_manager.session_scope() as session:
-                # Get today's appointments
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                tomorrow = today + timedelta(days=1)
-                
-                total_appointments = session.query(Appointment).filter(
-                    Appointment.appointment_date >= today,
-                    Appointment.appointment_date < tomorrow
-                ).count()
-                
-                completed = session.query(Appointment).filter(
-                    Appointment.appointment_date >= today,
-                    Appointment.appointment_date < tomorrow,
-                    Appointment.status == 'completed'
-                ).count()
-                
-                # Display stats
-                stats_text = f"تعداد کل نوبت‌ها: {total_appointments}\nتکمیل شده: {completed}\nباقیمانده: {total_appointments - completed}"
-                stats_label = ctk.CTkLabel(
-                    self.report_frame,
-                    text=stats_text,
-                    font=("Vazir", 14),
-                    justify="right"
-                )
-                stats_label.pack(pady=20, padx=20)
-        except Exception as e:
-            error_label = ctk.CTkLabel(
-                self.report_frame,
-                text=f"خطا در بارگذاری گزارش: {str(e)}",
-                font=("Vazir", 12),
-                text_color="red"
-            )
-            error_label.pack(pady=20)
+        # Display stats
+        total_appointments = snapshot.appointments_today
+        completed = snapshot.completed_appointments_today
+        stats_text = f"تعداد کل نوبت‌ها: {total_appointments}\nتکمیل شده: {completed}\nباقیمانده: {total_appointments - completed}"
+        stats_label = ctk.CTkLabel(
+            self.report_frame,
+            text=stats_text,
+            font=("Vazir", 14),
+            justify="right"
+        )
+        stats_label.pack(pady=20, padx=20)
     
     def show_add_appointment_dialog(self):
         """Show dialog to add new appointment"""
@@ -7,11 +7,16 @@ Manages application settings and configuration
 
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
-import os
-import shutil
 from datetime import datetime
 from database.db_manager import get_db_manager
+from database.profiles import PERFORMANCE_PROFILES, PROFILE_LABELS, set_active_profile
 from auth import AuthService
+from database.diagnostics import query_stats
+from database.archive import SCHEDULES, SCHEDULE_LABELS, ARCHIVE_SUFFIX, get_backup_schedule, set_backup_schedule
+from modules.data_loader import get_executor
+
+# How often the backup progress bar is updated
+BACKUP_POLL_MS = 100
 
 
 class SettingsSection(ctk.CTkFrame):
@@ -57,11 +62,15 @@ class SettingsSection(ctk.CTkFrame):
         tabview.add("ظاهر")
         tabview.add("حساب کاربری")
         tabview.add("پشتیبان‌گیری")
+        tabview.add("پایگاه داده")
+        tabview.add("عیب‌یابی")
         
         # Setup tabs
         self.setup_appearance_tab(tabview.tab("ظاهر"))
         self.setup_account_tab(tabview.tab("حساب کاربری"))
         self.setup_backup_tab(tabview.tab("پشتیبان‌گیری"))
+        self.setup_database_tab(tabview.tab("پایگاه داده"))
+        self.setup_diagnostics_tab(tabview.tab("عیب‌یابی"))
     
     def setup_appearance_tab(self, tab):
         """Setup appearance settings tab"""
@@ -255,6 +264,48 @@ class SettingsSection(ctk.CTkFrame):
             command=self.create_backup
         )
         backup_btn.pack(pady=15, padx=20)
+        self.backup_btn = backup_btn
+        
+        # Shown while a backup runs
+        self.backup_progress = ctk.CTkProgressBar(backup_frame, width=400)
+        self.backup_progress.set(0)
+        self.backup_status = ctk.CTkLabel(
+            backup_frame,
+            text="",
+            font=("Vazir", 11),
+            text_color="gray"
+        )
+        
+        # Automatic backups
+        schedule_frame = ctk.CTkFrame(tab, fg_color="#f8f9fa", corner_radius=15)
+        schedule_frame.pack(pady=(0, 20), padx=20, fill="x")
+        
+        schedule_label = ctk.CTkLabel(
+            schedule_frame,
+            text="پشتیبان‌گیری خودکار",
+            font=("Vazir", 16, "bold")
+        )
+        schedule_label.pack(pady=15, anchor="e", padx=20)
+        
+        schedule_info = ctk.CTkLabel(
+            schedule_frame,
+            text="نسخه‌های فشرده در پوشه backups کنار پایگاه داده نگهداری و نسخه‌های قدیمی حذف می‌شوند",
+            font=("Vazir", 11),
+            text_color="gray"
+        )
+        schedule_info.pack(pady=5, padx=20)
+        
+        # Map display labels back to schedule names
+        self.schedule_names = {SCHEDULE_LABELS[name]: name for name in SCHEDULES}
+        self.schedule_var = ctk.StringVar(value=SCHEDULE_LABELS[get_backup_schedule()])
+        schedule_menu = ctk.CTkOptionMenu(
+            schedule_frame,
+            values=list(self.schedule_names.keys()),
+            variable=self.schedule_var,
+            font=("Vazir", 12),
+            command=self.change_backup_schedule
+        )
+        schedule_menu.pack(pady=15, padx=40, anchor="e")
         
         # Restore section
         restore_frame = ctk.CTkFrame(tab, fg_color="#f8f9fa", corner_radius=15)
@@ -284,6 +335,135 @@ class SettingsSection(ctk.CTkFrame):
             command=self.restore_backup
         )
         restore_btn.pack(pady=15, padx=20)
+        self.restore_btn = restore_btn
+        
+        # Shown while a restore runs
+        self.restore_status = ctk.CTkLabel(
+            restore_frame,
+            text="",
+            font=("Vazir", 11),
+            text_color="gray"
+        )
+    
+    def setup_database_tab(self, tab):
+        """Setup database performance settings tab"""
+        profile_frame = ctk.CTkFrame(tab, fg_color="#f8f9fa", corner_radius=15)
+        profile_frame.pack(pady=20, padx=20, fill="x")
+        
+        profile_label = ctk.CTkLabel(
+            profile_frame,
+            text="پروفایل عملکرد پایگاه داده",
+            font=("Vazir", 16, "bold")
+        )
+        profile_label.pack(pady=15, anchor="e", padx=20)
+        
+        profile_info = ctk.CTkLabel(
+            profile_frame,
+            text="تنظیمات حافظه نهان، ژورنال و زمان انتظار قفل برای نوع این دستگاه",
+            font=("Vazir", 11),
+            text_color="gray"
+        )
+        profile_info.pack(pady=5, padx=20)
+        
+        # Map display labels back to profile names
+        self.profile_names = {PROFILE_LABELS[name]: name for name in PERFORMANCE_PROFILES}
+        current = self.db_manager.profile
+        
+        self.profile_var = ctk.StringVar(value=PROFILE_LABELS.get(current, current or ""))
+        profile_menu = ctk.CTkOptionMenu(
+            profile_frame,
+            values=list(self.profile_names.keys()),
+            variable=self.profile_var,
+            font=("Vazir", 12),
+            command=self.change_db_profile
+        )
+        profile_menu.pack(pady=15, padx=40, anchor="e")
+    
+    def setup_diagnostics_tab(self, tab):
+        """Setup query diagnostics tab"""
+        buttons_frame = ctk.CTkFrame(tab, fg_color="transparent")
+        buttons_frame.pack(pady=10, padx=20, fill="x")
+        
+        refresh_btn = ctk.CTkButton(
+            buttons_frame,
+            text="🔄 به‌روزرسانی",
+            font=("Vazir", 12),
+            command=self.show_diagnostics
+        )
+        refresh_btn.pack(side="right", padx=5)
+        
+        export_btn = ctk.CTkButton(
+            buttons_frame,
+            text="💾 خروجی JSON",
+            font=("Vazir", 12),
+            fg_color="#27ae60",
+            hover_color="#229954",
+            command=self.export_diagnostics
+        )
+        export_btn.pack(side="right", padx=5)
+        
+        reset_btn = ctk.CTkButton(
+            buttons_frame,
+            text="🗑 پاک کردن",
+            font=("Vazir", 12),
+            fg_color="#95a5a6",
+            hover_color="#7f8c8d",
+            command=self.reset_diagnostics
+        )
+        reset_btn.pack(side="right", padx=5)
+        
+        self.diagnostics_text = ctk.CTkTextbox(tab, font=("Courier", 12), wrap="none")
+        self.diagnostics_text.pack(pady=10, padx=20, fill="both", expand=True)
+        
+        self.show_diagnostics()
+    
+    def show_diagnostics(self):
+        """Show the slowest UI actions, statements and recent slow queries"""
+        lines = [f"Since {query_stats.started_at:%Y-%m-%d %H:%M:%S}", "", "UI actions by database time:"]
+        for name, entry in query_stats.top_actions():
+            lines.append(
+                f"  {name}: {entry['queries'] / entry['runs']:.1f} queries, "
+                f"{entry['db_ms'] / entry['runs']:.0f} ms per run "
+                f"({entry['runs']} runs, worst {entry['max_queries']} queries / {entry['max_db_ms']:.0f} ms)"
+            )
+        
+        lines += ["", "Statements by total time:"]
+        for statement, entry in query_stats.top_statements():
+            lines.append(
+                f"  {entry['total_ms']:.0f} ms total, {entry['count']}x, "
+                f"max {entry['max_ms']:.0f} ms: {' '.join(statement.split())[:200]}"
+            )
+        
+        lines += ["", f"Slow queries (≥ {query_stats.slow_ms:.0f} ms):"]
+        for entry in reversed(query_stats.slow_queries()):
+            lines.append(f"  {entry['at']} {entry['ms']:.0f} ms [{entry['action']}]: {' '.join(entry['statement'].split())[:200]}")
+            for step in entry['plan'] or ():
+                lines.append(f"      {step}")
+        
+        self.diagnostics_text.configure(state="normal")
+        self.diagnostics_text.delete("1.0", "end")
+        self.diagnostics_text.insert("1.0", "\n".join(lines))
+        self.diagnostics_text.configure(state="disabled")
+    
+    def export_diagnostics(self):
+        """Save the collected query statistics as JSON"""
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            initialfile=f"kagan_diagnostics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        if not path:
+            return
+        try:
+            query_stats.export_json(path)
+            messagebox.showinfo("موفق", f"گزارش عیب‌یابی ذخیره شد:\n{path}")
+        except Exception as e:
+            messagebox.showerror("خطا", f"خطا در ذخیره گزارش:\n{str(e)}")
+    
+    def reset_diagnostics(self):
+        """Start collecting query statistics afresh"""
+        query_stats.reset()
+        self.show_diagnostics()
     
     def change_theme(self, mode):
         """Change application theme"""
@@ -322,39 +502,83 @@ class SettingsSection(ctk.CTkFrame):
             self.confirm_password_entry.delete(0, 'end')
             
             messagebox.showinfo("موفق", "رمز عبور با موفقیت تغییر یافت")
-            
+        
         except Exception as e:
             messagebox.showerror("خطا", str(e))
     
+    def change_db_profile(self, label):
+        """Change and save the database performance profile"""
+        name = self.profile_names[label]
+        try:
+            set_active_profile(name)
+            self.db_manager.set_profile(name)
+            messagebox.showinfo("موفق", f"پروفایل عملکرد به «{label}» تغییر یافت")
+        except Exception as e:
+            messagebox.showerror("خطا", f"خطا در تغییر پروفایل:\n{str(e)}")
+    
+    def change_backup_schedule(self, label):
+        """Change and save the automatic backup schedule"""
+        try:
+            set_backup_schedule(self.schedule_names[label])
+            messagebox.showinfo("موفق", f"پشتیبان‌گیری خودکار: «{label}»")
+        except Exception as e:
+            messagebox.showerror("خطا", f"خطا در ذخیره زمان‌بندی:\n{str(e)}")
+    
     def create_backup(self):
-        """Create database backup"""
+        """Create database backup on a worker thread while the app keeps running"""
+        # Ask user for backup location
+        backup_file = filedialog.asksaveasfilename(
+            defaultextension=".db",
+            filetypes=[("Database files", "*.db *.sqlite"), ("All files", "*.*")],
+            initialfile=f"kagan_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+        )
+        if not backup_file:
+            return
+        
+        # Written by the worker, read by the Tk thread
+        self.backup_pages = (0, 0)
+        
+        def on_progress(copied, total):
+            self.backup_pages = (copied, total)
+        
+        self.backup_btn.configure(state="disabled")
+        self.backup_progress.set(0)
+        self.backup_progress.pack(pady=(0, 5), padx=20)
+        self.backup_status.configure(text="در حال تهیه نسخه پشتیبان...")
+        self.backup_status.pack(pady=(0, 15), padx=20)
+        
+        future = get_executor().submit(self.db_manager.backup, backup_file, on_progress)
+        self.after(BACKUP_POLL_MS, self.poll_backup, future)
+    
+    def poll_backup(self, future):
+        """Update the progress bar until the backup finishes"""
+        if not self.winfo_exists():
+            return
+        
+        copied, total = self.backup_pages
+        if total:
+            self.backup_progress.set(copied / total)
+            self.backup_status.configure(text=f"در حال تهیه نسخه پشتیبان... {copied}/{total} صفحه")
+        
+        if not future.done():
+            self.after(BACKUP_POLL_MS, self.poll_backup, future)
+            return
+        
+        self.backup_btn.configure(state="normal")
+        self.backup_progress.pack_forget()
+        self.backup_status.pack_forget()
+        
         try:
-            # Ask user for backup location
-            backup_file = filedialog.asksaveasfilename(
-                defaultextension=".db",
-                filetypes=[("Database files", "*.db *.sqlite"), ("All files", "*.*")],
-                initialfile=f"kagan_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+            backup_file = future.result()
+            messagebox.showinfo(
+                "موفق",
+                f"نسخه پشتیبان با موفقیت ایجاد شد:\n{backup_file}"
             )
-            
-            if backup_file:
-                # Get database file path
-                db_file = os.path.join(
-                    os.path.dirname(os.path.dirname(__file__)),
-                    'kagan_db.sqlite'
-                )
-                
-                # Copy database file
-                shutil.copy2(db_file, backup_file)
-                
-                messagebox.showinfo(
-                    "موفق",
-                    f"نسخه پشتیبان با موفقیت ایجاد شد:\n{backup_file}"
-                )
         except Exception as e:
             messagebox.showerror("خطا", f"خطا در ایجاد نسخه پشتیبان:\n{str(e)}")
     
     def restore_backup(self):
-        """Restore database from backup"""
+        """Restore database from backup while the app keeps running"""
         # Confirm action
         if not messagebox.askyesno(
             "تأیید",
@@ -362,25 +586,36 @@ class SettingsSection(ctk.CTkFrame):
         ):
             return
         
+        # Ask user for backup file
+        backup_file = filedialog.askopenfilename(
+            filetypes=[
+                ("Backup files", f"*.db *.sqlite *{ARCHIVE_SUFFIX}"),
+                ("All files", "*.*")
+            ]
+        )
+        if not backup_file:
+            return
+        
+        self.restore_btn.configure(state="disabled")
+        self.restore_status.configure(text="در حال بازیابی...")
+        self.restore_status.pack(pady=(0, 15), padx=20)
+        
+        future = get_executor().submit(self.db_manager.restore, backup_file)
+        self.after(BACKUP_POLL_MS, self.poll_restore, future)
+    
+    def poll_restore(self, future):
+        """Wait for the restore to finish, then report the result"""
+        if not self.winfo_exists():
+            return
+        if not future.done():
+            self.after(BACKUP_POLL_MS, self.poll_restore, future)
+            return
+        
+        self.restore_btn.configure(state="normal")
+        self.restore_status.pack_forget()
+        
         try:
-            # Ask user for backup file
-            backup_file = filedialog.askopenfilename(
-                filetypes=[("Database files", "*.db *.sqlite"), ("All files", "*.*")]
-            )
-            
-            if backup_file:
-                # Get database file path
-                db_file = os.path.join(
-                    os.path.dirname(os.path.dirname(__file__)),
-                    'kagan_db.sqlite'
-                )
-                
-                # Copy backup file to database location
-                shutil.copy2(backup_file, db_file)
-                
-                messagebox.showinfo(
-                    "موفق",
-                    "بازیابی با موفقیت انجام شد. لطفا برنامه را مجددا راه‌اندازی کنید."
-                )
+            future.result()
+            messagebox.showinfo("موفق", "بازیابی با موفقیت انجام شد")
         except Exception as e:
             messagebox.showerror("خطا", f"خطا در بازیابی:\n{str(e)}")
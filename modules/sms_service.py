@@ -5,6 +5,10 @@ SMS Service Module
 Backend service for sending SMS messages and managing SMS operations
 """
 
+from database.models import Customer
+from database.phones import normalize_phone, is_valid_phone
+from database.catalog import catalog
+
 
 class SmsService:
     """Service class for SMS operations"""
@@ -32,25 +36,60 @@ class SmsService:
         Returns:
             bool: True if successful, False otherwise
         """
+        if not is_valid_phone(recipient):
+            return False
+        
         # Placeholder implementation
         # In production, integrate with actual SMS API
-        print(f"Sending SMS to {recipient}: {message}")
+        print(f"Sending SMS to {normalize_phone(recipient)}: {message}")
         return True
     
+    def resolve_recipient(self, recipient):
+        """
+        Number to send to for a phone number or a customer id
+        
+        Customers are found through the reference catalog's phone index,
+        the same one caller lookup and duplicate checks use, so a number
+        registered to a customer is sent to exactly as the index holds it.
+        
+        Args:
+            recipient: Phone number as typed, or a customer id (needs the catalog loaded)
+        
+        Returns:
+            str: Normalized number, or the recipient itself if it is no number
+        """
+        if isinstance(recipient, int):
+            customer = catalog.get(Customer, recipient)
+            return customer.phone_normalized if customer else None
+        
+        if catalog.loaded:
+            customers = catalog.by_phone(recipient)
+            if customers:
+                return customers[0].phone_normalized
+        return normalize_phone(recipient) or recipient
+    
     def send_bulk_sms(self, recipients, message):
         """
         Send SMS to multiple recipients
         
+        Recipients are resolved first (see resolve_recipient), so a customer
+        listed twice, by id or with the number written differently, gets
+        one message.
+        
         Args:
-            recipients (list): List of phone numbers
+            recipients (list): Phone numbers and/or customer ids
             message (str): Message text to send
         
         Returns:
-            dict: Status for each recipient
+            dict: Status for each normalized number (False for invalid ones)
         """
         results = {}
         for recipient in recipients:
-            results[recipient] = self.send_sms(recipient, message)
+            number = self.resolve_recipient(recipient)
+            if number is None:
+                results[recipient] = False
+            elif number not in results:
+                results[number] = self.send_sms(number, message)
         return results
     
     def get_balance(self):
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Virtual List Module
+Scrollable list that keeps only the visible rows alive and recycles them
+"""
+
+import math
+import customtkinter as ctk
+
+
+class VirtualList(ctk.CTkFrame):
+    """
+    Row-recycling list for large data sets
+    
+    Replaces a CTkScrollableFrame holding one frame per record. Only enough
+    row widgets to fill the visible area are created; scrolling rebinds them
+    to other records instead of creating new widgets, so the widget count
+    stays constant no matter how many items the list holds.
+    
+    Args:
+        parent: Parent widget
+        render_item (callable): render_item(item) -> row text
+        key_func (callable): key_func(item) -> unique key, used by update_item()
+        row_color (callable): row_color(item) -> row background color
+        row_height (int): Fixed row height in pixels, including spacing
+        label_text (str): Optional header text
+        empty_text (str): Message shown when the list is empty
+        empty_color (str): Color of the empty message
+    
+    Set on_scroll_end to a callable to be told when the last rows come
+    into view (used to load the next page).
+    """
+    
+    ROW_COLOR = "#f8f9fa"
+    ROW_SPACING = 10
+    
+    # Rows before the end at which on_scroll_end fires
+    SCROLL_END_THRESHOLD = 10
+    
+    def __init__(self, parent, render_item, key_func=None, row_color=None, row_height=64,
+                 label_text=None, empty_text="موردی یافت نشد", empty_color="gray", **kwargs):
+        super().__init__(parent, **kwargs)
+        
+        self.render_item = render_item
+        self.key_func = key_func or (lambda item: item.id)
+        self.row_color = row_color
+        self.row_height = row_height
+        self.empty_text = empty_text
+        self.empty_color = empty_color
+        
+        self.items = []
+        self.index_by_key = {}
+        self.rows = []
+        self.offset = 0
+        self.on_scroll_end = None
+        
+        # Header, like CTkScrollableFrame's label_text
+        if label_text:
+            header = ctk.CTkLabel(
+                self,
+                text=label_text,
+                font=("Vazir", 12, "bold"),
+                fg_color=("gray78", "gray23"),
+                corner_radius=6
+            )
+            header.pack(fill="x", padx=5, pady=(5, 0))
+        
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 3), pady=5)
+        
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+        self.body.bind("<Configure>", lambda e: self.redraw())
+        
+        self.message_label = ctk.CTkLabel(
+            self.body,
+            text="",
+            font=("Vazir", 12),
+            text_color="gray"
+        )
+        
+        self.bind_mousewheel(self.body)
+    
+    def set_items(self, items):
+        """
+        Replace all items
+        
+        Args:
+            items (list): Items to display
+        """
+        self.items = list(items)
+        self.index_by_key = {self.key_func(item): i for i, item in enumerate(self.items)}
+        self.offset = min(self.offset, self.max_offset())
+        
+        if self.items:
+            self.message_label.place_forget()
+        else:
+            self.show_message(self.empty_text, self.empty_color)
+        self.redraw()
+    
+    def append_items(self, items):
+        """
+        Add items to the end of the list without touching existing rows
+        
+        Args:
+            items (list): Items to append
+        """
+        for item in items:
+            self.index_by_key[self.key_func(item)] = len(self.items)
+            self.items.append(item)
+        
+        if self.items:
+            self.message_label.place_forget()
+        self.redraw()
+    
+    def update_item(self, item):
+        """
+        Replace one item by key, redrawing only its row if visible
+        
+        Args:
+            item: Updated item
+        
+        Returns:
+            bool: True if an item with the same key was found
+        """
+        index = self.index_by_key.get(self.key_func(item))
+        if index is None:
+            return False
+        
+        self.items[index] = item
+        row_index = index - self.first_visible_index()
+        if 0 <= row_index < len(self.rows):
+            self.bind_row(self.rows[row_index], item)
+        return True
+    
+    def show_message(self, text, text_color="gray"):
+        """
+        Show a message (loading, empty, error) instead of the rows
+        
+        Args:
+            text (str): Message text
+            text_color (str): Label color
+        """
+        for row in self.rows:
+            row.place_forget()
+        self.message_label.configure(text=text, text_color=text_color)
+        self.message_label.place(relx=0.5, y=20, anchor="n")
+    
+    def first_visible_index(self):
+        """Index of the item shown in the top row"""
+        return self.offset // self.row_height
+    
+    def max_offset(self):
+        """Largest valid scroll offset in pixels"""
+        return max(0, len(self.items) * self.row_height - self.visible_height())
+    
+    def visible_height(self):
+        """Height of the row area in unscaled pixels (the units place() expects)"""
+        return self.body.winfo_height() / self._get_widget_scaling()
+    
+    def create_row(self):
+        """Create one reusable row widget"""
+        row = ctk.CTkFrame(
+            self.body,
+            fg_color=self.ROW_COLOR,
+            corner_radius=10,
+            height=self.row_height - self.ROW_SPACING
+        )
+        row.pack_propagate(False)
+        
+        row.label = ctk.CTkLabel(
+            row,
+            text="",
+            font=("Vazir", 11),
+            anchor="e",
+            justify="right"
+        )
+        row.label.pack(side="right", padx=10, pady=5)
+        row.bound = None
+        
+        self.bind_mousewheel(row)
+        self.bind_mousewheel(row.label)
+        return row
+    
+    def bind_row(self, row, item):
+        """Show an item in a row widget, skipping Tk calls when nothing changed"""
+        text = self.render_item(item)
+        color = self.row_color(item) if self.row_color else self.ROW_COLOR
+        
+        if row.bound != (text, color):
+            row.label.configure(text=text)
+            row.configure(fg_color=color)
+            row.bound = (text, color)
+    
+    def redraw(self):
+        """Bind the visible slice of items to the row pool"""
+        height = self.visible_height()
+        needed = math.ceil(height / self.row_height) + 1
+        
+        while len(self.rows) < needed:
+            self.rows.append(self.create_row())
+        
+        first = self.first_visible_index()
+        shift = self.offset % self.row_height
+        
+        for i, row in enumerate(self.rows):
+            index = first + i
+            if i < needed and index < len(self.items):
+                self.bind_row(row, self.items[index])
+                row.place(relx=0.5, y=i * self.row_height - shift, anchor="n", relwidth=1.0)
+            else:
+                row.place_forget()
+        
+        self.update_scrollbar()
+        
+        if self.on_scroll_end and self.items and first + needed >= len(self.items) - self.SCROLL_END_THRESHOLD:
+            self.on_scroll_end()
+    
+    def update_scrollbar(self):
+        """Sync the scrollbar thumb with the scroll offset"""
+        total = len(self.items) * self.row_height
+        height = self.visible_height()
+        
+        if total <= height or total == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + height) / total)
+    
+    def scroll_to(self, offset):
+        """Scroll to a pixel offset"""
+        offset = int(max(0, min(offset, self.max_offset())))
+        if offset != self.offset:
+            self.offset = offset
+            self.redraw()
+    
+    def on_scrollbar(self, action, value, unit=None):
+        """Scrollbar command callback ('moveto' or 'scroll')"""
+        if action == 'moveto':
+            self.scroll_to(float(value) * len(self.items) * self.row_height)
+        elif action == 'scroll':
+            step = self.row_height if unit == 'units' else self.visible_height()
+            self.scroll_to(self.offset + int(value) * step)
+    
+    def on_mousewheel(self, event):
+        """Scroll one row per wheel step"""
+        if event.num == 4:
+            direction = -1
+        elif event.num == 5:
+            direction = 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        self.scroll_to(self.offset + direction * self.row_height)
+    
+    def bind_mousewheel(self, widget):
+        """Route mouse wheel events on a widget to the list"""
+        widget.bind("<MouseWheel>", self.on_mousewheel, add="+")
+        widget.bind("<Button-4>", self.on_mousewheel, add="+")
+        widget.bind("<Button-5>", self.on_mousewheel, add="+")
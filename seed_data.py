@@ -8,9 +8,10 @@ Populate database with sample data for demonstration
 import logging
 from datetime import datetime, timedelta
 from database.db_manager import initialize_database, get_db_manager
+from database.bulk import write_orders
 from database.models import (
     User, UserRole, Customer, Employee, Service, Product, 
-    Appointment, Order, OrderItem, GamingSession, Supplier, 
+    Appointment, Order, GamingSession, Supplier, 
     Expense, Campaign, Invoice, InvoiceItem
 )
 from auth import AuthService
@@ -220,35 +221,19 @@ def seed_orders():
             logger.warning("No customers or cafe products found, skipping orders")
             return
         
-        # Create 5 sample orders
+        # Create 5 sample orders with 2-3 items each
+        orders = []
         for i in range(5):
-            order = Order(
-                customer_id=customers[i % len(customers)].id if i % 2 == 0 else None,
-                table_number=f"میز {i+1}",
-                status=['pending', 'preparing', 'ready', 'paid'][i % 4],
-                total_amount=0
-            )
-            session.add(order)
-            session.flush()
-            
-            # Add 2-3 items to each order
-            total = 0
-            for j in range(2 + (i % 2)):
-                product = cafe_products[j % len(cafe_products)]
-                quantity = 1 + (i % 3)
-                subtotal = product.price * quantity
-                
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=product.id,
-                    quantity=quantity,
-                    price=product.price,
-                    subtotal=subtotal
-                )
-                session.add(order_item)
-                total += subtotal
-            
-            order.total_amount = total
+            orders.append({
+                'customer_id': customers[i % len(customers)].id if i % 2 == 0 else None,
+                'table_number': f"میز {i+1}",
+                'status': ['pending', 'preparing', 'ready', 'paid'][i % 4],
+                'items': [
+                    {'product_id': cafe_products[j % len(cafe_products)].id, 'quantity': 1 + (i % 3)}
+                    for j in range(2 + (i % 2))
+                ],
+            })
+        write_orders(session, orders)
         
         logger.info("Created sample orders")
 
@@ -129,6 +129,1545 @@ def test_sms_service():
         return False
 
 
+def test_database_indexes():
+    """Test that missing indexes are added to an existing database"""
+    print("\nTesting database indexes...")
+    try:
+        import sqlite3
+        import tempfile
+        from database.db_manager import DatabaseManager
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'indexes.sqlite')
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{db_path}')
+            
+            # Simulate a database created before the indexes were declared
+            conn = sqlite3.connect(db_path)
+            conn.execute("DROP INDEX ix_orders_active")
+            conn.execute("DROP INDEX ix_order_items_order_id")
+            conn.commit()
+            conn.close()
+            
+            created = db_manager.ensure_indexes()
+            assert sorted(created) == ['ix_order_items_order_id', 'ix_orders_active']
+            assert db_manager.ensure_indexes() == []
+            db_manager._engine.dispose()
+        
+        print("✓ Missing indexes created in place")
+        return True
+    except Exception as e:
+        print(f"✗ Database index test failed: {e}")
+        return False
+
+
+def test_database_profiles():
+    """Test that performance profile PRAGMAs are applied to connections"""
+    print("\nTesting database performance profiles...")
+    try:
+        import tempfile
+        from sqlalchemy import text
+        from database.db_manager import DatabaseManager
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "profiles.sqlite")}', profile='back-office')
+            
+            with db_manager.session_scope() as session:
+                assert session.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+                assert session.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+                assert session.execute(text("PRAGMA busy_timeout")).scalar() == 10000
+            
+            db_manager.set_profile('bulk-import')
+            with db_manager.session_scope() as session:
+                assert session.execute(text("PRAGMA synchronous")).scalar() == 0  # OFF
+            
+            db_manager.dispose()
+        
+        print("✓ Profile PRAGMAs applied")
+        return True
+    except Exception as e:
+        print(f"✗ Database profile test failed: {e}")
+        return False
+
+
+def test_schema_migrations():
+    """Test versioned schema upgrades of an unversioned database"""
+    print("\nTesting schema migrations...")
+    try:
+        import sqlite3
+        import tempfile
+        from sqlalchemy import create_engine
+        from database.models import Base
+        from database.migrate import upgrade, get_version, LATEST_VERSION
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'legacy.sqlite')
+            
+            # Database created by the old create_all() startup, without indexes
+            engine = create_engine(f'sqlite:///{db_path}')
+            Base.metadata.create_all(engine)
+            conn = sqlite3.connect(db_path)
+            for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'").fetchall():
+                conn.execute(f"DROP INDEX {name}")
+            # ... and without AUTOINCREMENT
+            (orders_sql,) = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'orders'").fetchone()
+            conn.execute("DROP TABLE orders")
+            conn.execute(orders_sql.replace(" AUTOINCREMENT", ""))
+            conn.execute("INSERT INTO orders (id, status) VALUES (5, 'paid')")
+            conn.commit()
+            
+            applied = upgrade(engine)
+            assert applied == list(range(2, LATEST_VERSION + 1))
+            assert conn.execute("SELECT count(*) FROM sqlite_master WHERE name = 'ix_orders_active'").fetchone()[0] == 1
+            (orders_sql,) = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'orders'").fetchone()
+            assert "AUTOINCREMENT" in orders_sql
+            assert conn.execute("SELECT id, status FROM orders").fetchall() == [(5, 'paid')]
+            assert conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'orders'").fetchone() == (5,)
+            
+            # Already current: nothing to do
+            assert upgrade(engine) == []
+            with engine.connect() as db_conn:
+                assert get_version(db_conn) == LATEST_VERSION
+            
+            conn.close()
+            engine.dispose()
+        
+        print(f"✓ Database upgraded to schema version {LATEST_VERSION}")
+        return True
+    except Exception as e:
+        print(f"✗ Schema migration test failed: {e}")
+        return False
+
+
+def test_data_loader():
+    """Test background loads, request collapsing and cancellation"""
+    print("\nTesting background data loader...")
+    try:
+        import time
+        import tempfile
+        import threading
+        from database.db_manager import DatabaseManager
+        from database.models import Customer
+        from modules.data_loader import DataLoader, PagedListLoader
+        from database.pagination import Page
+        
+        class FakeWidget:
+            """Stands in for a Tk widget; runs after() callbacks on demand"""
+            def __init__(self):
+                self.callbacks = []
+            
+            def after(self, ms, callback):
+                self.callbacks.append(callback)
+            
+            def run_pending(self, timeout=5):
+                deadline = time.time() + timeout
+                while self.callbacks and time.time() < deadline:
+                    time.sleep(0.01)
+                    callbacks, self.callbacks = self.callbacks, []
+                    for callback in callbacks:
+                        callback()
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "loader.sqlite")}')
+            with db_manager.session_scope() as session:
+                session.add(Customer(name="علی", phone="09121111111"))
+            
+            widget = FakeWidget()
+            loader = DataLoader(widget)
+            results = []
+            threads = []
+            
+            def query(session):
+                threads.append(threading.current_thread().name)
+                return session.query(Customer.name).all()
+            
+            # Three rapid requests collapse into at most two executions
+            for _ in range(3):
+                loader.load('customers', query, results.append)
+            widget.run_pending()
+            assert results == [[("علی",)]]
+            assert len(threads) <= 2 and all(name.startswith('kagan-loader') for name in threads)
+            
+            # Cancelled loads are not delivered until resumed
+            loader.load('customers', query, results.append)
+            loader.cancel_all()
+            widget.run_pending()
+            assert len(results) == 1
+            loader.resume()
+            widget.run_pending()
+            assert len(results) == 2
+            
+            class FakeList:
+                """Stands in for a VirtualList"""
+                def __init__(self):
+                    self.items = []
+                    self.message = None
+                
+                def set_items(self, items):
+                    self.items = list(items)
+                    self.message = None
+                
+                def append_items(self, items):
+                    self.items.extend(items)
+                    self.message = None
+                
+                def scroll_to(self, index):
+                    pass
+                
+                def show_message(self, text, text_color="gray"):
+                    self.message = text
+            
+            # A failed prefetch is shown, and the next scroll to the end retries it
+            failures = [RuntimeError("database is locked")]
+            
+            def query_page(session, cursor):
+                if cursor is not None and failures:
+                    raise failures.pop()
+                start = cursor or 0
+                return Page(list(range(start, start + 2)), start + 2, start + 2 < 6)
+            
+            fake_list = FakeList()
+            pager = PagedListLoader(loader, 'numbers', fake_list, query_page)
+            pager.reload()
+            widget.run_pending()
+            assert fake_list.items == [0, 1] and "database is locked" in fake_list.message
+            fake_list.on_scroll_end()
+            widget.run_pending()
+            assert fake_list.items == [0, 1, 2, 3] and fake_list.message is None
+            fake_list.on_scroll_end()
+            widget.run_pending()
+            assert fake_list.items == list(range(6)) and not pager.has_more
+            
+            db_manager.dispose()
+        
+        print("✓ Loads run on worker threads and deliver once")
+        return True
+    except Exception as e:
+        print(f"✗ Data loader test failed: {e}")
+        return False
+
+
+def test_keyset_pagination():
+    """Test that keyset pages cover every row exactly once"""
+    print("\nTesting keyset pagination...")
+    try:
+        import tempfile
+        from datetime import datetime, timedelta
+        from database.db_manager import DatabaseManager
+        from database.models import Order
+        from database.pagination import keyset_page
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "pages.sqlite")}')
+            
+            # Pairs of orders share a timestamp so the id tie-breaker matters
+            base = datetime(2024, 1, 1)
+            with db_manager.session_scope() as session:
+                for i in range(25):
+                    session.add(Order(
+                        status='pending' if i % 5 else 'paid',
+                        total_amount=1000,
+                        created_at=base + timedelta(minutes=i // 2)
+                    ))
+            
+            seen = []
+            cursor = None
+            pages = 0
+            with db_manager.session_scope() as session:
+                query = session.query(Order.id, Order.created_at).filter(Order.active_filter())
+                while True:
+                    page = keyset_page(query, (Order.created_at, Order.id), cursor, limit=6, descending=True)
+                    seen.extend(page.items)
+                    cursor = page.cursor
+                    pages += 1
+                    if not page.has_more:
+                        break
+                
+                expected = query.order_by(Order.created_at.desc(), Order.id.desc()).all()
+            
+            assert [row.id for row in seen] == [row.id for row in expected]
+            assert len(expected) == 20 and pages == 4
+            
+            db_manager.dispose()
+        
+        print("✓ Pages are complete, ordered and free of duplicates")
+        return True
+    except Exception as e:
+        print(f"✗ Keyset pagination test failed: {e}")
+        return False
+
+
+def test_read_queries():
+    """Test that list queries return projected rows in a single statement"""
+    print("\nTesting read queries...")
+    try:
+        import tempfile
+        from datetime import datetime, timedelta
+        from sqlalchemy import event
+        from database.db_manager import DatabaseManager
+        from database.models import Customer, Service, Employee, Appointment, Order
+        from database import queries
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "queries.sqlite")}')
+            
+            start = datetime(2024, 1, 1, 9)
+            with db_manager.session_scope() as session:
+                service = Service(name="کوتاهی مو", price=200000)
+                stylist = Employee(name="مریم")
+                session.add_all([service, stylist])
+                for i in range(20):
+                    customer = Customer(name=f"مشتری {i}", phone=f"0912000{i:04d}")
+                    session.add(Appointment(
+                        customer=customer,
+                        service=service,
+                        stylist=stylist if i % 2 else None,
+                        appointment_date=start + timedelta(hours=i)
+                    ))
+                session.add_all([
+                    Order(status='paid', total_amount=1000, created_at=start),
+                    Order(status='pending', total_amount=500, created_at=start),
+                ])
+            
+            statements = []
+            def count_statement(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            event.listen(db_manager.engine, 'before_cursor_execute', count_statement)
+            
+            with db_manager.session_scope() as session:
+                page = queries.appointments_page(session, start)
+            
+            event.remove(db_manager.engine, 'before_cursor_execute', count_statement)
+            
+            assert len(statements) == 1, f"{len(statements)} statements"
+            assert len(page.items) == 20 and not page.has_more
+            assert isinstance(page.items[0], queries.AppointmentRow)
+            assert page.items[0].customer_name == "مشتری 0" and page.items[0].stylist_name is None
+            assert page.items[1].service_name == "کوتاهی مو" and page.items[1].stylist_name == "مریم"
+            
+            with db_manager.session_scope() as session:
+                summary = queries.sales_summary(session, start)
+            assert summary == (2, 1500, 1)
+            
+            db_manager.dispose()
+        
+        print("✓ Appointment list loads in one query")
+        return True
+    except Exception as e:
+        print(f"✗ Read queries test failed: {e}")
+        return False
+
+
+def test_daily_rollup():
+    """Test that the daily rollup follows order and expense changes"""
+    print("\nTesting daily rollup...")
+    try:
+        import tempfile
+        from datetime import datetime, timedelta
+        from database.db_manager import DatabaseManager
+        from database.models import Order, Expense, DailyRollup
+        from database import queries, rollup
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "rollup.sqlite")}')
+            
+            day = datetime(2024, 3, 10, 12)
+            with db_manager.session_scope() as session:
+                session.add_all([
+                    Order(status='paid', total_amount=1000, created_at=day),
+                    Order(status='pending', total_amount=400, created_at=day),
+                    Expense(category='rent', description='اجاره', amount=300, expense_date=day),
+                ])
+            
+            with db_manager.session_scope() as session:
+                totals = queries.period_totals(session)
+            assert (totals.order_count, totals.order_total, totals.paid_revenue, totals.expenses) == (2, 1400, 1000, 300)
+            
+            # Paying an order and moving another to the next day
+            with db_manager.session_scope() as session:
+                pending = session.query(Order).filter_by(status='pending').one()
+                pending.status = 'paid'
+                pending.created_at = day + timedelta(days=1)
+            
+            with db_manager.session_scope() as session:
+                first_day = queries.period_totals(session, day - timedelta(hours=12), day + timedelta(hours=12))
+                assert (first_day.order_count, first_day.paid_revenue) == (1, 1000)
+                assert queries.sales_summary(session, day + timedelta(days=1)) == (1, 400, 1)
+                session.delete(session.query(Expense).one())
+            
+            # Rolled back changes leave the rollup alone
+            try:
+                with db_manager.session_scope() as session:
+                    session.add(Order(status='paid', total_amount=50, created_at=day))
+                    session.flush()
+                    raise ValueError("abort")
+            except ValueError:
+                pass
+            
+            with db_manager.session_scope() as session:
+                maintained = sorted((r.day, r.unit, r.paid_revenue, r.expenses) for r in session.query(DailyRollup))
+                rollup.rebuild(session)
+                rebuilt = sorted((r.day, r.unit, r.paid_revenue, r.expenses) for r in session.query(DailyRollup))
+            assert maintained == rebuilt, f"{maintained} != {rebuilt}"
+            assert queries.period_totals(db_manager.get_session()).paid_revenue == 1400
+            
+            db_manager.dispose()
+        
+        print("✓ Rollup matches a full rebuild")
+        return True
+    except Exception as e:
+        print(f"✗ Daily rollup test failed: {e}")
+        return False
+
+
+def test_dashboard_snapshot():
+    """Test that the dashboard KPIs come from one shared query"""
+    print("\nTesting dashboard snapshot...")
+    try:
+        import tempfile
+        from datetime import datetime
+        from sqlalchemy import event
+        from database.db_manager import DatabaseManager
+        from database.models import Order, Product, Customer
+        from database import dashboard
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "dashboard.sqlite")}')
+            dashboard.invalidate()
+            
+            now = datetime.now()
+            with db_manager.session_scope() as session:
+                session.add_all([
+                    Order(status='paid', total_amount=1000, created_at=now),
+                    Order(status='pending', total_amount=400, created_at=now),
+                    Product(name="قهوه", price=100, stock_quantity=2, min_stock_level=5),
+                    Customer(name="علی", phone="09121111111", created_at=now),
+                ])
+            
+            statements = []
+            def count_statement(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            event.listen(db_manager.engine, 'before_cursor_execute', count_statement)
+            
+            with db_manager.session_scope() as session:
+                first = dashboard.get_snapshot(session)
+                second = dashboard.get_snapshot(session)
+            assert len(statements) == 1 and first is second
+            assert (first.orders_today, first.order_total_today, first.sales_today) == (2, 1400, 1000)
+            assert (first.active_orders, first.low_stock, first.stock_value, first.customers_today) == (1, 1, 200, 1)
+            
+            # Committed changes replace the shared snapshot
+            with db_manager.session_scope() as session:
+                session.query(Order).filter_by(status='pending').one().status = 'paid'
+            with db_manager.session_scope() as session:
+                assert dashboard.get_snapshot(session).sales_today == 1400
+            
+            event.remove(db_manager.engine, 'before_cursor_execute', count_statement)
+            db_manager.dispose()
+        
+        print("✓ KPIs read in one statement and shared")
+        return True
+    except Exception as e:
+        print(f"✗ Dashboard snapshot test failed: {e}")
+        return False
+
+
+def test_query_cache():
+    """Test cache hits, commit invalidation and LRU limits"""
+    print("\nTesting query cache...")
+    try:
+        import tempfile
+        from database.db_manager import DatabaseManager
+        from database.models import Product, Service
+        from database.cache import QueryCache, query_cache
+        from database import queries
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "cache.sqlite")}')
+            with db_manager.session_scope() as session:
+                session.add(Product(name="چای", category='cafe', price=50))
+                session.add(Service(name="اصلاح", price=100))
+            
+            def menu_names():
+                with db_manager.session_scope() as session:
+                    return [row.name for row in queries.cafe_menu_page(session).items]
+            
+            query_cache.clear()
+            assert menu_names() == ["چای"] and menu_names() == ["چای"]
+            with db_manager.session_scope() as session:
+                queries.services_page(session)
+            assert (query_cache.hits, query_cache.misses) == (1, 2)
+            
+            # A commit on products drops the menu but not the services list
+            with db_manager.session_scope() as session:
+                session.add(Product(name="قهوه", category='cafe', price=80))
+            assert query_cache.stats()['entries'] == 1
+            assert menu_names() == ["قهوه", "چای"]
+            
+            # Rolled back writes keep the cache
+            try:
+                with db_manager.session_scope() as session:
+                    session.query(Product).filter_by(name="چای").delete()
+                    raise ValueError("abort")
+            except ValueError:
+                pass
+            assert menu_names() == ["قهوه", "چای"] and query_cache.stats()['entries'] == 2
+            
+            # Oldest entries are evicted first
+            small = QueryCache(max_entries=2)
+            with db_manager.session_scope() as session:
+                for name in ["a", "b", "a", "c"]:
+                    small.fetch_query(session.query(Product.id).filter(Product.name == name))
+            assert (small.hits, small.misses, small.evictions) == (1, 3, 1)
+            
+            db_manager.dispose()
+        
+        print("✓ Cached results reused until their tables change")
+        return True
+    except Exception as e:
+        print(f"✗ Query cache test failed: {e}")
+        return False
+
+
+def test_reference_catalog():
+    """Test that the reference catalog follows committed changes"""
+    print("\nTesting reference catalog...")
+    try:
+        import tempfile
+        from database.db_manager import DatabaseManager
+        from database.models import Product, Service, Customer
+        from database.catalog import catalog
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "catalog.sqlite")}')
+            with db_manager.session_scope() as session:
+                session.add_all([
+                    Product(name="کیک", category='cafe', price=90),
+                    Product(name="اسپرسو", category='cafe', price=60),
+                    Product(name="شامپو", category='salon', price=150),
+                    Service(name="رنگ مو", price=500),
+                ])
+            
+            with db_manager.session_scope() as session:
+                catalog.ensure_loaded(session)
+            version = catalog.version
+            assert [p.name for p in catalog.by_group(Product, 'cafe')] == ["اسپرسو", "کیک"]
+            
+            with db_manager.session_scope() as session:
+                cake = session.query(Product).filter_by(name="کیک").one()
+                cake.price = 95
+                session.query(Product).filter_by(name="اسپرسو").one().is_active = False
+                session.add(Customer(name="سارا", phone="09130000000"))
+            
+            assert catalog.version > version
+            assert [(p.name, p.price) for p in catalog.by_group(Product, 'cafe')] == [("کیک", 95)]
+            assert [c.name for c in catalog.by_name(Customer)] == ["سارا"]
+            
+            # Rolled back changes are not applied
+            version = catalog.version
+            try:
+                with db_manager.session_scope() as session:
+                    session.add(Service(name="ماساژ", price=300))
+                    session.flush()
+                    raise ValueError("abort")
+            except ValueError:
+                pass
+            assert catalog.version == version and len(catalog.by_name(Service)) == 1
+            
+            db_manager.dispose()
+        
+        print("✓ Catalog stays in sync with commits")
+        return True
+    except Exception as e:
+        print(f"✗ Reference catalog test failed: {e}")
+        return False
+
+
+def test_change_detection():
+    """Test that polls report local table changes and outside writes"""
+    print("\nTesting change detection...")
+    try:
+        import sqlite3
+        import tempfile
+        import threading
+        from database.db_manager import DatabaseManager
+        from database.models import Product, Customer
+        from database.changes import ChangeTracker, ALL_TABLES, change_tracker
+        from database.cache import query_cache
+        from database import queries
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "changes.sqlite")
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{db_path}')
+            engine = db_manager.engine
+            
+            tracker = ChangeTracker()
+            assert tracker.poll(engine) == frozenset()
+            
+            # Local commits are counted per table
+            commits = change_tracker.counter('products')
+            with db_manager.session_scope() as session:
+                session.add(Product(name="نوشابه", price=30))
+            tracker.record_commit({'products'})
+            assert tracker.poll(engine) == {'products'}
+            assert change_tracker.counter('products') == commits + 1
+            assert tracker.poll(engine) == frozenset()
+            
+            # A write by another program is seen through data_version
+            with db_manager.session_scope() as session:
+                queries.products_page(session)
+            assert query_cache.stats()['entries'] == 1
+            other = sqlite3.connect(db_path)
+            other.execute("UPDATE products SET price = 35")
+            other.commit()
+            other.close()
+            assert tracker.poll(engine) == ALL_TABLES
+            assert query_cache.stats()['entries'] == 0
+            assert tracker.poll(engine) == frozenset()
+            tracker.reset()
+            
+            # Outside writes are not mistaken for a local commit in the same poll window
+            def outside_write(price):
+                other = sqlite3.connect(db_path)
+                other.execute("UPDATE products SET price = ?", (price,))
+                other.commit()
+                other.close()
+            
+            def local_commit():
+                with db_manager.session_scope() as session:
+                    session.add(Customer(name="مینا", phone="09121112233"))
+            
+            change_tracker.poll(engine)
+            worker = threading.Thread(target=local_commit)
+            worker.start()
+            worker.join()
+            assert change_tracker.poll(engine) == {'customers'}
+            for price in (36, 37):
+                if price == 36:
+                    outside_write(price)
+                local_commit()
+                if price == 37:
+                    outside_write(price)
+                assert change_tracker.poll(engine) == ALL_TABLES, price
+                assert change_tracker.poll(engine) == frozenset()
+            
+            db_manager.dispose()
+        
+        print("✓ Local and outside changes detected")
+        return True
+    except Exception as e:
+        print(f"✗ Change detection test failed: {e}")
+        return False
+
+
+def test_online_backup():
+    """Test that backups are consistent copies made while the database is in use"""
+    print("\nTesting online backup...")
+    try:
+        import sqlite3
+        import tempfile
+        from database.db_manager import DatabaseManager
+        from database.models import Product
+        from database.backup import backup_database, copy_database, integrity_check, MAX_RESTARTS
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "live.sqlite")
+            backup_path = os.path.join(tmp_dir, "backup.db")
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{db_path}')
+            
+            with db_manager.session_scope() as session:
+                for i in range(500):
+                    session.add(Product(name=f"کالا {i}", price=i, description="x" * 200))
+            
+            # Write to the database between backup steps
+            steps = []
+            
+            def on_progress(copied, total):
+                steps.append((copied, total))
+                if len(steps) == 2:
+                    with db_manager.session_scope() as session:
+                        session.add(Product(name="کالای جدید", price=1))
+            
+            backup_database(db_path, backup_path, on_progress, pages_per_step=4)
+            assert len(steps) > 2
+            assert steps[-1][0] == steps[-1][1]
+            assert not os.path.exists(backup_path + '.part')
+            
+            assert integrity_check(backup_path) == 'ok'
+            copy = sqlite3.connect(backup_path)
+            count = copy.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+            copy.close()
+            assert count in (500, 501)
+            
+            # A till writing on every step would restart the copy for ever; VACUUM INTO takes over
+            writer = sqlite3.connect(db_path)
+            
+            def keep_writing(copied, total):
+                writer.execute("UPDATE products SET price = price + 1 WHERE id = 1")
+                writer.commit()
+            
+            restarted_path = os.path.join(tmp_dir, "restarted.db")
+            assert copy_database(db_path, restarted_path, keep_writing, pages_per_step=4) == MAX_RESTARTS + 1
+            writer.close()
+            assert integrity_check(restarted_path) == 'ok'
+            copy = sqlite3.connect(restarted_path)
+            assert copy.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 501
+            copy.close()
+            
+            # The manager-level entry point writes a verified copy too
+            db_manager.backup(backup_path)
+            copy = sqlite3.connect(backup_path)
+            assert copy.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 501
+            copy.close()
+            
+            db_manager.dispose()
+        
+        print("✓ Backup copied a live database consistently")
+        return True
+    except Exception as e:
+        print(f"✗ Online backup test failed: {e}")
+        return False
+
+
+def test_backup_archives():
+    """Test archive manifests, checksum verification, rotation and scheduling"""
+    print("\nTesting backup archives...")
+    try:
+        import tempfile
+        from datetime import datetime, timedelta
+        from database.db_manager import DatabaseManager
+        from database.models import Product
+        from database.migrate import LATEST_VERSION
+        from database.backup import BackupError
+        from database.archive import (
+            BackupScheduler, read_manifest, verify_archive, extract_archive, select_kept, list_archives
+        )
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "shop.sqlite")
+            archive_dir = os.path.join(tmp_dir, "backups")
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{db_path}')
+            with db_manager.session_scope() as session:
+                for i in range(200):
+                    session.add(Product(name=f"کالا {i}", price=i, description="توضیحات " * 20))
+            
+            scheduler = BackupScheduler(db_path, archive_dir)
+            now = datetime(2024, 3, 10, 14, 30)
+            assert scheduler.is_due(now, schedule='hourly')
+            assert not scheduler.is_due(now, schedule='off')
+            
+            path = scheduler.run(now)
+            manifest = read_manifest(path)
+            assert manifest['schema_version'] == LATEST_VERSION
+            assert manifest['row_counts']['products'] == 200
+            assert os.path.getsize(path) < manifest['size'] / 2
+            
+            # Due again only once the period has passed
+            assert not scheduler.is_due(now + timedelta(minutes=20), schedule='hourly')
+            assert scheduler.is_due(now + timedelta(hours=1), schedule='hourly')
+            assert not scheduler.is_due(now + timedelta(hours=5), schedule='daily')
+            assert scheduler.is_due(now.replace(hour=23), schedule='day-close')
+            
+            # The checksum is checked before the copy is used
+            verify_archive(path)
+            restored = os.path.join(tmp_dir, "restored.sqlite")
+            assert extract_archive(path, restored)['sha256'] == manifest['sha256']
+            with open(path, 'r+b') as f:
+                f.seek(os.path.getsize(path) // 2)
+                f.write(b"damage" * 8)
+            try:
+                verify_archive(path)
+                assert False, "damaged archive accepted"
+            except BackupError:
+                pass
+            
+            # Grandfather-father-son: newest per hour/day/week/month
+            start = datetime(2024, 1, 1)
+            times = [start + timedelta(hours=6 * i) for i in range(4 * 60)]
+            kept = select_kept(times, {'hourly': 2, 'daily': 3, 'weekly': 2, 'monthly': 2})
+            newest = max(times)
+            assert newest in kept
+            assert len([t for t in kept if t.date() == newest.date()]) == 2
+            assert len({t.month for t in kept}) == 2
+            assert len(kept) <= 2 + 3 + 2 + 2
+            
+            # Rotation deletes the archives the policy drops
+            scheduler.policy = {'hourly': 2, 'daily': 1, 'weekly': 1, 'monthly': 1}
+            for hour in range(15, 19):
+                scheduler.run(now.replace(hour=hour))
+            assert len(list_archives(archive_dir)) == 2
+            
+            db_manager.dispose()
+        
+        print("✓ Archives verified, rotated and scheduled")
+        return True
+    except Exception as e:
+        print(f"✗ Backup archive test failed: {e}")
+        return False
+
+
+def test_hot_restore():
+    """Test restoring a backup into the running manager without a restart"""
+    print("\nTesting hot restore...")
+    try:
+        import time
+        import threading
+        import tempfile
+        from database.db_manager import DatabaseManager
+        from database.models import Product
+        from database.changes import change_tracker, ALL_TABLES
+        from database.cache import query_cache
+        from database.archive import create_archive
+        from database import queries
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "live.sqlite")
+            backup_path = os.path.join(tmp_dir, "backup.db")
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{db_path}')
+            with db_manager.session_scope() as session:
+                for i in range(20):
+                    session.add(Product(name=f"کالا {i}", price=i))
+            db_manager.backup(backup_path)
+            archive_path = create_archive(db_path, tmp_dir)
+            
+            with db_manager.session_scope() as session:
+                session.add(Product(name="بعد از پشتیبان", price=1))
+                assert len(queries.products_page(session).items) == 21
+            
+            change_tracker.poll(db_manager.engine)
+            
+            # A scope that is still open delays the swap until it ends
+            released = threading.Event()
+            
+            def busy_reader():
+                with db_manager.session_scope() as session:
+                    session.query(Product).count()
+                    released.wait(5)
+            
+            reader = threading.Thread(target=busy_reader)
+            reader.start()
+            time.sleep(0.05)
+            restorer = threading.Thread(target=db_manager.restore, args=(backup_path,))
+            restorer.start()
+            time.sleep(0.2)
+            assert restorer.is_alive() and db_manager.restoring
+            released.set()
+            reader.join()
+            restorer.join(10)
+            assert not db_manager.restoring
+            
+            with db_manager.session_scope() as session:
+                assert session.query(Product).count() == 20
+            assert query_cache.stats()['entries'] == 0
+            assert change_tracker.poll(db_manager.engine) == ALL_TABLES
+            
+            # Archives are verified and restored the same way
+            with db_manager.session_scope() as session:
+                session.add(Product(name="دوباره", price=2))
+            db_manager.restore(archive_path)
+            with db_manager.session_scope() as session:
+                assert session.query(Product).count() == 20
+            
+            db_manager.dispose()
+        
+        print("✓ Backup restored into the running application")
+        return True
+    except Exception as e:
+        print(f"✗ Hot restore test failed: {e}")
+        return False
+
+
+def test_query_diagnostics():
+    """Test statement timings, the slow-query log and per-action totals"""
+    print("\nTesting query diagnostics...")
+    try:
+        import json
+        import tempfile
+        from database.db_manager import DatabaseManager
+        from database.models import Product
+        from database.diagnostics import query_stats, action
+        from database import queries
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "diag.sqlite")}')
+            with db_manager.session_scope() as session:
+                session.add(Product(name="چای", price=10))
+            
+            query_stats.reset()
+            slow_ms, query_stats.slow_ms = query_stats.slow_ms, 0
+            try:
+                with action('TestSection.products') as run:
+                    with db_manager.session_scope() as session:
+                        queries.products_page(session)
+                        session.query(Product).filter(Product.name == "چای").count()
+            finally:
+                query_stats.slow_ms = slow_ms
+            
+            assert run.queries == 2
+            name, entry = query_stats.top_actions()[0]
+            assert name == 'TestSection.products' and entry['runs'] == 1 and entry['queries'] == 2
+            
+            statements = query_stats.top_statements()
+            assert sum(entry['count'] for _statement, entry in statements) >= 2
+            assert all(sum(entry['histogram']) == entry['count'] for _statement, entry in statements)
+            
+            # Slow queries carry their parameters and query plan
+            slow = [entry for entry in query_stats.slow_queries() if 'products' in entry['statement']]
+            assert slow and all(entry['action'] == 'TestSection.products' for entry in slow)
+            assert any(entry['plan'] and 'products' in ' '.join(entry['plan']) for entry in slow)
+            
+            export_path = os.path.join(tmp_dir, "diag.json")
+            query_stats.export_json(export_path)
+            with open(export_path, encoding='utf-8') as f:
+                exported = json.load(f)
+            assert exported['actions']['TestSection.products']['queries'] == 2
+            
+            db_manager.dispose()
+        
+        print("✓ Queries timed and attributed to actions")
+        return True
+    except Exception as e:
+        print(f"✗ Query diagnostics test failed: {e}")
+        return False
+
+
+def test_n_plus_one_detector():
+    """Test that repeated lazy loads in one action are reported and budgeted"""
+    print("\nTesting N+1 detector...")
+    saved = {name: os.environ.get(name) for name in ('KAGAN_N1_DETECT', 'KAGAN_N1_MAX_LAZY_LOADS')}
+    try:
+        import tempfile
+        from database.db_manager import DatabaseManager
+        from database.models import Customer, Order
+        from database.diagnostics import action
+        from database import nplusone
+        
+        os.environ['KAGAN_N1_DETECT'] = '1'
+        os.environ['KAGAN_N1_MAX_LAZY_LOADS'] = '3'
+        findings_before = len(nplusone.findings())
+        violations_before = len(nplusone.violations())
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "n1.sqlite")}')
+            with db_manager.session_scope() as session:
+                for i in range(5):
+                    customer = Customer(name=f"مشتری {i}", phone=f"0912000000{i}")
+                    session.add(Order(table_number=str(i), customer=customer, total_amount=10))
+            
+            # One lazy load per order: reported with its call site, over budget
+            try:
+                with action('TestSection.orders'):
+                    with db_manager.session_scope() as session:
+                        names = [order.customer.name for order in session.query(Order).all()]
+                assert False, "budget not enforced"
+            except nplusone.LazyLoadBudgetError:
+                pass
+            assert len(names) == 5
+            
+            finding = nplusone.findings()[findings_before]
+            assert finding['relationship'] == 'Order.customer' and finding['count'] == 5
+            assert 'test_app.py' in finding['call_site']
+            
+            # The same data loaded eagerly stays within budget
+            from sqlalchemy.orm import joinedload
+            with action('TestSection.orders'):
+                with db_manager.session_scope() as session:
+                    orders = session.query(Order).options(joinedload(Order.customer)).all()
+                    names = [order.customer.name for order in orders]
+            assert len(nplusone.findings()) == findings_before + 1
+            
+            # Keep this deliberate violation from failing the run
+            del nplusone._violations[violations_before:]
+            db_manager.dispose()
+        
+        print("✓ Repeated lazy loads reported with their call site")
+        return True
+    except Exception as e:
+        print(f"✗ N+1 detector test failed: {e}")
+        return False
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_screen_lazy_loads():
+    """Test every section's background loads against the lazy-load budget"""
+    print("\nTesting screen lazy loads...")
+    saved = os.environ.get('KAGAN_N1_MAX_LAZY_LOADS')
+    try:
+        import tempfile
+        from datetime import date, datetime, timedelta
+        from database.db_manager import DatabaseManager
+        from database.synthetic import generate
+        from database import diagnostics, queries, dashboard, nplusone
+        from modules.cafe_section import CafeSection
+        from modules.salon_section import SalonSection
+        from modules.inventory_section import InventorySection
+        from modules.reports_section import ReportsSection
+        
+        # Without a budget from the environment, a loop lazy-loading per row goes over
+        if not saved:
+            os.environ['KAGAN_N1_MAX_LAZY_LOADS'] = str(nplusone.REPEAT_THRESHOLD - 1)
+        
+        # The query functions the sections hand to DataLoader, keyed like its actions
+        week_ago = datetime.now() - timedelta(days=7)
+        loads = {
+            (CafeSection, 'orders'): lambda session: queries.active_orders_page(session, None),
+            (CafeSection, 'menu'): lambda session: CafeSection.query_menu(None, session),
+            (CafeSection, 'daily_report'): dashboard.get_snapshot,
+            (SalonSection, 'appointments'): lambda session: SalonSection.query_appointments(None, session, None),
+            (SalonSection, 'services'): lambda session: SalonSection.query_services(None, session),
+            (SalonSection, 'report'): dashboard.get_snapshot,
+            (InventorySection, 'all_products'): lambda session: queries.products_page(session, None),
+            (InventorySection, 'low_stock'): lambda session: queries.low_stock_page(session, None),
+            (InventorySection, 'report'): dashboard.get_snapshot,
+            (ReportsSection, 'sales_report'): lambda session: queries.sales_summary(session, week_ago),
+            (ReportsSection, 'financial_report'): lambda session: ReportsSection.query_financial_report(None, session),
+            (ReportsSection, 'overview'): dashboard.get_snapshot,
+        }
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "screens.sqlite")}')
+            generate(db_manager.engine, scale=0.05, seed=7, days=14, end=date.today() + timedelta(days=3))
+            
+            # As DataLoader._run does; an action over budget raises LazyLoadBudgetError
+            for (section, key), query in loads.items():
+                with diagnostics.action(f"{section.__name__}.{key}"):
+                    with db_manager.session_scope() as session:
+                        query(session)
+            db_manager.dispose()
+        
+        print(f"✓ {len(loads)} screen loads within the lazy-load budget")
+        return True
+    except Exception as e:
+        print(f"✗ Screen lazy-load test failed: {e}")
+        return False
+    finally:
+        if not saved:
+            os.environ.pop('KAGAN_N1_MAX_LAZY_LOADS', None)
+
+
+def test_synthetic_data():
+    """Test that the generator is deterministic and writes realistic rows"""
+    print("\nTesting synthetic data generator...")
+    try:
+        import re
+        import sqlite3
+        import tempfile
+        from datetime import date
+        from database.db_manager import DatabaseManager
+        from database.synthetic import generate, HOUR_WEIGHTS
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dumps = []
+            for name in ("a.sqlite", "b.sqlite"):
+                db_path = os.path.join(tmp_dir, name)
+                db_manager = DatabaseManager()
+                db_manager.initialize(f'sqlite:///{db_path}')
+                counts = generate(db_manager.engine, scale=0.05, seed=7, days=28, end=date(2024, 3, 20))
+                db_manager.dispose()
+                
+                conn = sqlite3.connect(db_path)
+                dumps.append([
+                    conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+                    for table in ('customers', 'orders', 'order_items', 'appointments', 'sms_messages')
+                ])
+                phones = [row[0] for row in conn.execute("SELECT phone FROM customers")]
+                hours = {int(row[0]) for row in conn.execute("SELECT strftime('%H', created_at) FROM orders")}
+                item_totals = conn.execute(
+                    "SELECT COUNT(*) FROM orders o WHERE total_amount != "
+                    "(SELECT SUM(subtotal) FROM order_items i WHERE i.order_id = o.id)"
+                ).fetchone()[0]
+                rollup_orders = conn.execute("SELECT SUM(order_count) FROM daily_rollup").fetchone()[0]
+                conn.close()
+            
+            # Same seed and end date, same rows
+            assert dumps[0] == dumps[1]
+            assert counts['customers'] == 100 and counts['orders'] > 150
+            assert counts['order_items'] >= counts['orders']
+            
+            assert all(re.fullmatch(r"09\d{9}", phone) for phone in phones) and len(set(phones)) == len(phones)
+            assert hours <= set(HOUR_WEIGHTS['cafe'])
+            assert item_totals == 0
+            assert rollup_orders == counts['orders']
+        
+        print("✓ Deterministic synthetic data generated")
+        return True
+    except Exception as e:
+        print(f"✗ Synthetic data test failed: {e}")
+        return False
+
+
+def test_benchmark_suite():
+    """Test that the benchmark suite times scenarios and flags regressions"""
+    print("\nTesting benchmark suite...")
+    try:
+        import copy
+        import tempfile
+        import benchmark
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            only = ['cafe.active_orders', 'reports.overview', 'login']
+            results = benchmark.run_benchmarks(
+                scales=[0.02], repeat=3, days=14, data_dir=tmp_dir, only=only
+            )
+            scenarios = results['results']['0.02x']
+            assert sorted(scenarios) == sorted(only)
+            for result in scenarios.values():
+                assert result['runs'] == 3 and result['queries'] >= 1
+                assert result['min_ms'] <= result['median_ms'] <= result['p95_ms']
+            
+            # The generated database is reused by the next run
+            assert len([name for name in os.listdir(tmp_dir) if name.endswith('.sqlite')]) == 1
+            
+            # Against itself nothing regresses; a faster or leaner baseline is flagged
+            assert benchmark.compare(results, results) == []
+            baseline = copy.deepcopy(results)
+            baseline['results']['0.02x']['login']['median_ms'] /= 10
+            baseline['results']['0.02x']['cafe.active_orders']['queries'] -= 1
+            regressions = benchmark.compare(baseline, results, min_delta_ms=0)
+            assert len(regressions) == 2
+            assert any('login' in message for message in regressions)
+            assert any('queries' in message for message in regressions)
+        
+        print("✓ Benchmark suite works")
+        return True
+    except Exception as e:
+        print(f"✗ Benchmark suite test failed: {e}")
+        return False
+
+
+def test_startup_imports():
+    """Test that the login dialog needs no section modules or heavy libraries"""
+    print("\nTesting startup imports...")
+    try:
+        import subprocess
+        
+        script = (
+            "import sys, main\n"
+            "from utils import StartupProfile\n"
+            "profile = StartupProfile()\n"
+            "main.import_startup_modules(profile)\n"
+            "print(profile.report())\n"
+            "print(sorted(m for m in sys.modules if m.startswith(('modules.', 'matplotlib', 'reportlab'))))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.splitlines()
+        
+        assert output[-1] == "['modules.data_loader']", output[-1]
+        assert any(line.strip().startswith('import gui') for line in output)
+        
+        # Sections still resolve through the package on first access
+        import modules
+        assert modules.CafeSection.__name__ == 'CafeSection'
+        
+        print("✓ Sections and heavy libraries are imported on first use")
+        return True
+    except Exception as e:
+        print(f"✗ Startup imports test failed: {e}")
+        return False
+
+
+def test_bulk_order_writes():
+    """Test that bulk order writes validate, stay O(1) per batch and keep derived data in sync"""
+    print("\nTesting bulk order writes...")
+    try:
+        import sqlite3
+        import tempfile
+        from database.db_manager import DatabaseManager
+        from database.models import Product, Order, OrderItem, DailyRollup
+        from database.catalog import catalog
+        from database.changes import change_tracker
+        from database.bulk import write_orders, create_orders, OrderValidationError
+        from database import diagnostics
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "bulk.sqlite")}')
+            with db_manager.session_scope() as session:
+                session.add_all([
+                    Product(name="اسپرسو", category='cafe', price=60, stock_quantity=1000),
+                    Product(name="کیک", category='cafe', price=90, stock_quantity=1000),
+                ])
+            with db_manager.session_scope() as session:
+                catalog.ensure_loaded(session)
+            counter = change_tracker.counter('orders')
+            
+            def table_orders(count):
+                return [
+                    {'table_number': f"میز {i}", 'status': 'paid', 'items': [
+                        {'product_id': 1, 'quantity': 2},
+                        {'product_id': 2, 'quantity': 1, 'price': 80},
+                    ]}
+                    for i in range(count)
+                ]
+            
+            # Same number of statements for 10 and 100 orders
+            queries = []
+            for count in (10, 100):
+                with diagnostics.action('test.bulk_orders') as run:
+                    ids = create_orders(table_orders(count))
+                assert len(ids) == count == len(set(ids))
+                queries.append(run.queries)
+            assert queries[0] == queries[1], queries
+            
+            with db_manager.session_scope() as session:
+                assert session.query(Order).count() == 110
+                assert session.query(OrderItem).count() == 220
+                order = session.get(Order, ids[0])
+                assert order.total_amount == 200 and sorted(i.subtotal for i in order.items) == [80, 120]
+                assert session.get(Product, 1).stock_quantity == 1000 - 220
+                assert session.query(DailyRollup.order_count).scalar() == 110
+            
+            # Derived data follows the commit
+            assert catalog.get(Product, 1).stock_quantity == 1000 - 220
+            assert change_tracker.counter('orders') > counter
+            
+            # One invalid order rejects the whole batch
+            for bad in (
+                {'items': [{'product_id': 1, 'quantity': 0}]},
+                {'items': [{'product_id': 99, 'quantity': 1}]},
+                {'items': []},
+                {'status': 'lost', 'items': [{'product_id': 1, 'quantity': 1}]},
+                {'customer_id': 42, 'items': [{'product_id': 1, 'quantity': 1}]},
+            ):
+                try:
+                    with db_manager.session_scope() as session:
+                        write_orders(session, table_orders(2) + [bad])
+                    raise AssertionError(f"accepted {bad}")
+                except OrderValidationError as e:
+                    assert e.index == 2
+            with db_manager.session_scope() as session:
+                assert session.query(Order).count() == 110
+                assert session.get(Product, 1).stock_quantity == 1000 - 220
+            
+            # Stock is taken from the stored level, not from a stale read
+            with db_manager.session_scope() as session:
+                stale = session.get(Product, 2)
+                other = sqlite3.connect(os.path.join(tmp_dir, "bulk.sqlite"))
+                other.execute("UPDATE products SET stock_quantity = stock_quantity - 30 WHERE id = 2")
+                other.commit()
+                other.close()
+                write_orders(session, [{'items': [{'product_id': 2, 'quantity': 5}]}])
+                assert stale.stock_quantity == 1000 - 110 - 35
+            assert catalog.get(Product, 2).stock_quantity == 1000 - 110 - 35
+            
+            db_manager.dispose()
+        
+        print("✓ Bulk order writes work")
+        return True
+    except Exception as e:
+        print(f"✗ Bulk order write test failed: {e}")
+        return False
+
+
+def test_search_index():
+    """Test the full-text search index, its triggers and Persian normalization"""
+    print("\nTesting search index...")
+    try:
+        import tempfile
+        from database.db_manager import DatabaseManager
+        from database.models import Customer, Product, Service, Invoice
+        from database.search import search, rebuild, normalize, match_expression
+        
+        assert normalize("علي‌كَريمي ۰۹۱۲") == "علیکریمی 0912"
+        assert match_expression("  محمد رض ") == '"محمد"* "رض"*'
+        assert match_expression("- * ") == ''
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{os.path.join(tmp_dir, "search.sqlite")}')
+            with db_manager.session_scope() as session:
+                session.add_all([
+                    Customer(name="علي كريمي", phone="۰۹۱۲-۳۴۵ ۶۷۸۹"),
+                    Customer(name="سارا محمدی", phone="09351112233"),
+                    Product(name="کیک شکلاتی", category='cafe', price=90, description="دسر"),
+                    Product(name="دسر روز", category='cafe', price=70),
+                    Product(name="کیک قدیمی", category='cafe', price=50, is_active=False),
+                    Service(name="کوتاهی مو", price=200),
+                    Invoice(invoice_number="INV-1402-0042"),
+                ])
+            
+            def kinds_ids(query, kinds=None):
+                with db_manager.session_scope() as session:
+                    return [(hit.kind, hit.id) for hit in search(session, query, kinds)]
+            
+            # Arabic letters, ZWNJ, digits and prefixes all match
+            assert kinds_ids("علی") == [('customer', 1)]
+            assert kinds_ids("کری") == [('customer', 1)]
+            assert kinds_ids("۰۹۱۲۳۴") == [('customer', 1)]
+            assert kinds_ids("سار محم") == [('customer', 2)]
+            assert kinds_ids("inv 0042") == [('invoice', 1)]
+            assert kinds_ids("کوتا") == [('service', 1)]
+            
+            # Inactive products are not listed; title matches rank first
+            assert kinds_ids("کیک") == [('product', 1)]
+            assert kinds_ids("دسر") == [('product', 2), ('product', 1)]
+            assert kinds_ids("دسر", kinds=['customer']) == []
+            
+            # Triggers follow edits and deletes
+            with db_manager.session_scope() as session:
+                session.get(Customer, 1).name = "رضا کریمی"
+                session.get(Product, 3).is_active = True
+                session.get(Product, 1).stock_quantity = 5
+                session.delete(session.get(Service, 1))
+            assert kinds_ids("علی") == [] and kinds_ids("رضا") == [('customer', 1)]
+            assert sorted(kinds_ids("کیک")) == [('product', 1), ('product', 3)]
+            assert kinds_ids("کوتا") == []
+            
+            with db_manager.session_scope() as session:
+                assert rebuild(session) == 6
+            assert kinds_ids("رضا") == [('customer', 1)]
+            
+            db_manager.dispose()
+        
+        print("✓ Search index works")
+        return True
+    except Exception as e:
+        print(f"✗ Search index test failed: {e}")
+        return False
+
+
+def test_phone_lookup():
+    """Test normalized phones, the phone prefix index and the phone column migration"""
+    print("\nTesting phone lookup...")
+    try:
+        import sqlite3
+        import tempfile
+        from sqlalchemy import insert
+        from database.db_manager import DatabaseManager
+        from database.models import Customer
+        from database.migrate import get_version, LATEST_VERSION
+        from database.phones import normalize_phone
+        from database.queries import customers_with_phone
+        from database.catalog import catalog
+        from modules.sms_service import SmsService
+        from utils import Validator
+        
+        for typed in ("0912 123 4567", "+98 912-123-4567", "00989121234567", "۰۹۱۲۱۲۳۴۵۶۷", "٩١٢١٢٣٤٥٦٧"):
+            assert normalize_phone(typed) == "+989121234567", typed
+        assert normalize_phone("۰۹۱") == "+9891" and normalize_phone("") is None
+        assert Validator.validate_phone("۰۲۱-۳۳۳۳-۴۴۴۴") and not Validator.validate_phone("0912123")
+        
+        results = SmsService().send_bulk_sms(["09121234567", "+98 912 123 4567", "123"], "سلام")
+        assert results == {"+989121234567": True, "123": False}
+        assert normalize_phone("9121234567") == "+989121234567"
+        for typed in ("1234567890", "2133334444", "۲۱۳۳۳۳۴۴۴۴", "+981234567890", "+98 20 3333 4444"):
+            assert not Validator.validate_phone(typed), typed
+        assert Validator.validate_phone("+98 31 3333 4444")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "phones.sqlite")
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{db_path}')
+            with db_manager.session_scope() as session:
+                session.add_all([
+                    Customer(name="علی", phone="0912 123 4567"),
+                    Customer(name="سارا", phone="۰۹۳۵۱۱۱۲۲۳۳"),
+                ])
+                session.flush()
+                # Core inserts get the column from its default
+                session.execute(insert(Customer.__table__), [{'name': "رضا", 'phone': "+98-912-123-9999"}])
+            
+            with db_manager.session_scope() as session:
+                assert [c.id for c in customers_with_phone(session, "+989121234567")] == [1]
+                assert [c.id for c in customers_with_phone(session, "09121239999")] == [3]
+                session.get(Customer, 2).phone = "09121234567"
+            
+            # Every typed digit narrows the matches
+            with db_manager.session_scope() as session:
+                catalog.ensure_loaded(session)
+                assert [c.id for c in customers_with_phone(session, "۰۹۱۲۱۲۳۴۵۶۷")] == [1, 2]
+            assert [c.id for c in catalog.by_phone_prefix("09")] == [1, 2, 3]
+            assert [c.id for c in catalog.by_phone_prefix("0912123 9")] == [3]
+            assert [c.id for c in catalog.by_phone_prefix("۰۹۱۲۱۲۳۴", limit=1)] == [1]
+            assert [c.id for c in catalog.by_phone("+989121234567")] == [1, 2]
+            
+            # The prefix index follows commits without a reload
+            with db_manager.session_scope() as session:
+                session.add(Customer(name="مینا", phone="09121230000"))
+                session.get(Customer, 3).phone = "09350000000"
+            assert [c.name for c in catalog.by_phone_prefix("0912123")] == ["مینا", "علی", "سارا"]
+            assert [c.name for c in catalog.by_phone_prefix("0935")] == ["رضا"]
+            
+            # Bulk SMS resolves customers and numbers through the same index, one message each
+            results = SmsService().send_bulk_sms([4, "۰۹۳۵ ۰۰۰ ۰۰۰۰", 3, "0912-123-0000", 99], "سلام")
+            assert results == {"+989121230000": True, "+989350000000": True, 99: False}
+            db_manager.dispose()
+            
+            # Databases from before the column are backfilled on upgrade
+            conn = sqlite3.connect(db_path)
+            conn.execute("DROP INDEX ix_customers_phone_normalized")
+            conn.execute("ALTER TABLE customers DROP COLUMN phone_normalized")
+            conn.execute("UPDATE schema_version SET version = 5")
+            conn.commit()
+            conn.close()
+            db_manager.initialize(f'sqlite:///{db_path}')
+            with db_manager.engine.connect() as db_conn:
+                assert get_version(db_conn) == LATEST_VERSION
+            with db_manager.session_scope() as session:
+                assert [c.id for c in customers_with_phone(session, "0912-123-0000")] == [4]
+                plan = session.connection().exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT id FROM customers WHERE phone_normalized = '+989121230000'"
+                ).fetchall()
+                assert 'ix_customers_phone_normalized' in plan[0][-1]
+            db_manager.dispose()
+        
+        print("✓ Phone numbers are normalized and indexed")
+        return True
+    except Exception as e:
+        print(f"✗ Phone lookup test failed: {e}")
+        return False
+
+
+def test_history_archival():
+    """Test moving old closed rows into per-year history files and reading them back through the views"""
+    print("\nTesting history archival...")
+    try:
+        import tempfile
+        from datetime import datetime
+        from sqlalchemy import text, func
+        from database.db_manager import DatabaseManager
+        from database.models import Product, Order, OrderItem, Invoice, InvoiceItem, GamingSession, SmsMessage
+        from database.bulk import create_orders
+        from database.queries import period_totals
+        from database.archive import create_archive, read_manifest, verify_archive
+        from database import history, rollup
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "hot.sqlite")
+            db_manager = DatabaseManager()
+            db_manager.initialize(f'sqlite:///{db_path}')
+            with db_manager.session_scope() as session:
+                session.add(Product(name="چای", category='cafe', price=50, stock_quantity=100))
+            
+            def order(created_at, status='paid'):
+                return {'status': status, 'created_at': created_at, 'items': [{'product_id': 1, 'quantity': 2}]}
+            
+            create_orders([order(datetime(2023, 3, 1))] * 3 + [order(datetime(2024, 5, 1))] * 2 + [
+                order(datetime(2024, 6, 1), 'delivered'), order(datetime(2025, 2, 1)),
+            ])
+            with db_manager.session_scope() as session:
+                invoice = Invoice(invoice_number="INV-1", invoice_date=datetime(2024, 1, 5), status='paid',
+                                  total_amount=300, paid_amount=300)
+                invoice.items.append(InvoiceItem(description="کوتاهی مو", quantity=1, price=300, subtotal=300))
+                session.add_all([
+                    invoice,
+                    GamingSession(system_number="PC-1", start_time=datetime(2024, 2, 1), rate=40, status='completed'),
+                    SmsMessage(recipient="+989121234567", message="سلام", status='sent', created_at=datetime(2024, 3, 1)),
+                    SmsMessage(recipient="+989121234567", message="سلام", status='pending', created_at=datetime(2024, 3, 1)),
+                ])
+            with db_manager.session_scope() as session:
+                totals = period_totals(session)
+            archive_dir = os.path.join(tmp_dir, "backups")
+            before_archival = create_archive(db_path, archive_dir, taken_at=datetime(2025, 1, 1, 10))
+            
+            moved = history.move_to_history(db_manager.engine, datetime(2025, 1, 1), batch_size=2)
+            assert moved == {'orders': 5, 'order_items': 5, 'gaming_sessions': 1, 'invoices': 1,
+                             'invoice_items': 1, 'sms_messages': 1}, moved
+            assert [year for year, _path in history.list_history_files(db_path)] == [2023, 2024]
+            
+            with db_manager.session_scope() as session:
+                # The live tables keep open and recent rows only
+                assert sorted(session.query(Order.status).all()) == [('delivered',), ('paid',)]
+                assert session.query(OrderItem).count() == 2 and session.query(Invoice).count() == 0
+                assert session.query(SmsMessage.status).all() == [('pending',)]
+                
+                # The views read both, and report totals survive a rollup rebuild
+                assert history.attached_years(session) == [2023, 2024]
+                assert session.execute(text("SELECT COUNT(*) FROM orders_all")).scalar() == 7
+                assert session.execute(text("SELECT SUM(subtotal) FROM order_items_all")).scalar() == 700
+                rollup.rebuild(session)
+            with db_manager.session_scope() as session:
+                assert period_totals(session) == totals
+                orders = history.with_history(session, Order)
+                assert session.query(orders).filter(orders.created_at < datetime(2024, 1, 1)).count() == 3
+            
+            # Nothing left to move on a second run
+            assert not any(history.move_to_history(db_manager.engine, datetime(2025, 1, 1)).values())
+            counts = {year: rows for year, _path, rows in history.history_counts(db_path)}
+            assert counts[2023]['orders'] == 3 and counts[2024]['invoice_items'] == 1
+            
+            # Backups carry the history files, and a restore brings back the set it was taken with
+            after_archival = create_archive(db_path, archive_dir, taken_at=datetime(2025, 1, 1, 11))
+            assert sorted(read_manifest(after_archival)['history']) == ["hot_2023.sqlite", "hot_2024.sqlite"]
+            verify_archive(after_archival)
+            plain_path = os.path.join(tmp_dir, "plain.db")
+            db_manager.backup(plain_path)
+            assert sorted(os.listdir(history.backup_history_dir(plain_path))) == ["hot_2023.sqlite", "hot_2024.sqlite"]
+            
+            def restored_counts():
+                with db_manager.session_scope() as session:
+                    assert period_totals(session) == totals
+                    return (history.attached_years(session),
+                            session.execute(text("SELECT COUNT(*) FROM orders_all")).scalar(),
+                            session.query(Order).count())
+            
+            db_manager.restore(before_archival)
+            assert history.list_history_files(db_path) == []
+            assert restored_counts() == ([], 7, 7)
+            db_manager.restore(after_archival)
+            assert restored_counts() == ([2023, 2024], 7, 2)
+            db_manager.restore(before_archival)
+            db_manager.restore(plain_path)
+            assert restored_counts() == ([2023, 2024], 7, 2)
+            
+            # Archiving the newest order does not free its id
+            assert history.move_to_history(db_manager.engine, datetime(2026, 1, 1))['orders'] == 1
+            assert create_orders([order(datetime(2025, 3, 1))]) == [8]
+            with db_manager.session_scope() as session:
+                session.add(Order(status='pending'))
+                session.flush()
+                assert session.query(func.max(Order.id)).scalar() == 9
+            
+            # A live row reusing an archived id is refused instead of overwriting the archived one
+            with db_manager.session_scope() as session:
+                session.add(Order(id=1, status='paid', created_at=datetime(2023, 9, 1), total_amount=1))
+            try:
+                history.move_to_history(db_manager.engine, datetime(2025, 1, 1))
+                assert False, "reused id was archived"
+            except history.HistoryError:
+                pass
+            with db_manager.session_scope() as session:
+                assert session.execute(text(
+                    "SELECT created_at FROM orders_all WHERE id = 1 ORDER BY created_at"
+                )).scalars().all() == ['2023-03-01 00:00:00.000000', '2023-09-01 00:00:00.000000']
+            
+            # Resetting the database sets the history files aside with the rows
+            db_manager.reset_database()
+            assert history.list_history_files(db_path) == []
+            with db_manager.session_scope() as session:
+                assert history.attached_years(session) == []
+                assert session.execute(text("SELECT COUNT(*) FROM orders_all")).scalar() == 0
+            db_manager.dispose()
+        
+        print("✓ Old closed rows are archived by year and still reported")
+        return True
+    except Exception as e:
+        print(f"✗ History archival test failed: {e}")
+        return False
+
+
 def test_dependencies():
     """Test that CustomTkinter is installed correctly"""
     print("\nTesting dependencies...")
@@ -160,6 +1699,30 @@ def main():
         test_main_window,
         test_modules,
         test_sms_service,
+        test_database_indexes,
+        test_database_profiles,
+        test_schema_migrations,
+        test_data_loader,
+        test_keyset_pagination,
+        test_read_queries,
+        test_daily_rollup,
+        test_dashboard_snapshot,
+        test_query_cache,
+        test_reference_catalog,
+        test_change_detection,
+        test_online_backup,
+        test_backup_archives,
+        test_hot_restore,
+        test_query_diagnostics,
+        test_n_plus_one_detector,
+        test_synthetic_data,
+        test_screen_lazy_loads,
+        test_benchmark_suite,
+        test_startup_imports,
+        test_bulk_order_writes,
+        test_search_index,
+        test_phone_lookup,
+        test_history_archival,
     ]
     
     results = []
@@ -172,6 +1735,14 @@ def main():
             traceback.print_exc()
             results.append(False)
     
+    # With KAGAN_N1_MAX_LAZY_LOADS set, any screen over budget fails the run
+    from database import nplusone
+    if nplusone.violations():
+        print("\n✗ Lazy-load budget exceeded:")
+        for message in nplusone.violations():
+            print(f"  - {message}")
+        results.append(False)
+    
     print("\n" + "=" * 60)
     print(f"Test Results: {sum(results)}/{len(results)} passed")
     print("=" * 60)
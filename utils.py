@@ -6,8 +6,11 @@ Common utilities, logging, validation, and helper functions
 """
 
 import os
+import sys
+import time
 import logging
 import re
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
@@ -37,6 +40,53 @@ def setup_logging():
     logger.info("Logging initialized")
 
 
+class StartupProfile:
+    """
+    Wall-clock breakdown of application startup
+    
+    Each phase() block is timed along with the number of modules it
+    imported, so slow imports and slow initialization steps show up
+    side by side.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self._reported = 0
+    
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a startup phase
+        
+        Args:
+            name (str): Phase name, e.g. 'import gui'
+        """
+        modules_before = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.phases.append((name, elapsed_ms, len(sys.modules) - modules_before))
+    
+    def report(self):
+        """
+        Format the phases timed since the last report
+        
+        Returns:
+            str: One line per phase, then the time since the profile started
+        """
+        lines = []
+        for name, elapsed_ms, modules in self.phases[self._reported:]:
+            imported = f"  ({modules} modules)" if modules else ""
+            lines.append(f"  {name:<28} {elapsed_ms:8.1f} ms{imported}")
+        self._reported = len(self.phases)
+        total_ms = (time.perf_counter() - self.started) * 1000
+        lines.append(f"  {'since start':<28} {total_ms:8.1f} ms")
+        return "\n".join(lines)
+
+
 class Validator:
     """Input validation utilities"""
     
@@ -45,25 +95,18 @@ class Validator:
         """
         Validate Iranian phone number
         
+        Accepts mobile and landline numbers with or without the +98 or 0098
+        prefix, in Persian or ASCII digits, with spaces or dashes.
+        
         Args:
             phone (str): Phone number to validate
             
         Returns:
             bool: True if valid, False otherwise
         """
-        if not phone:
-            return False
-        
-        # Remove spaces and dashes
-        phone = phone.replace(' ', '').replace('-', '')
-        
-        # Check Iranian mobile number format (09xx-xxx-xxxx)
-        mobile_pattern = r'^09\d{9}$'
-        
-        # Check Iranian landline format (0xx-xxxx-xxxx)
-        landline_pattern = r'^0\d{10}$'
+        from database.phones import is_valid_phone
         
-        return bool(re.match(mobile_pattern, phone) or re.match(landline_pattern, phone))
+        return is_valid_phone(phone)
     
     @staticmethod
     def validate_email(email):